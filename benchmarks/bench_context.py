@@ -0,0 +1,89 @@
+"""
+Benchmark: context store writes and reads on large payloads
+
+Compares the original pydantic + msgpack ContextItem round-trip with the
+current OptimizedContextManager, uncompressed and with zlib tiers, on 1 MB+
+string and bytes payloads, reporting
+wall time and peak allocation (tracemalloc) for the read path the engine
+exercises: one get_context per input key per node plus the final result.
+
+    python benchmarks/bench_context.py
+"""
+
+import time
+import tracemalloc
+from typing import Any, List
+
+import msgpack
+from pydantic import BaseModel
+
+from scriptchain.core.context import CompressionPolicy, OptimizedContextManager
+
+READS = 50
+
+class LegacyContextItem(BaseModel):
+    data: Any
+    dependencies: List[str] = []
+    compressed: bool = False
+
+class LegacyContextManager:
+    def __init__(self):
+        self.context = {}
+
+    def add_context(self, key, data, dependencies=[], compress=True):
+        if compress and isinstance(data, (str, bytes)):
+            self.context[key] = LegacyContextItem(
+                data=msgpack.packb(data), dependencies=dependencies, compressed=True
+            )
+        else:
+            self.context[key] = LegacyContextItem(
+                data=data, dependencies=dependencies, compressed=False
+            )
+
+    def get_context(self, key):
+        item = self.context.get(key)
+        if not item:
+            return None
+        if item.compressed:
+            return msgpack.unpackb(item.data)
+        return item.data
+
+def measure(manager, payloads):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for key, value in payloads.items():
+        manager.add_context(key, value, dependencies=["input"])
+    write = time.perf_counter() - start
+    _, write_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    for _ in range(READS):
+        for key in payloads:
+            manager.get_context(key)
+    read = time.perf_counter() - start
+    _, read_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return write, write_peak, read, read_peak
+
+def main():
+    payloads = {
+        "document": "The quarterly report shows steady growth. " * 50_000,
+        "summary": "Résumé with non-ASCII text — naïve café. " * 30_000,
+        "attachment": bytes(range(256)) * 8_192,
+    }
+    size = sum(len(v) for v in payloads.values()) / 1e6
+    print(f"payloads: {size:.1f} MB, {READS} reads per key\n")
+    print(f"{'store':<10}{'write ms':>10}{'write peak MB':>15}"
+          f"{'read ms':>10}{'read peak MB':>14}")
+    for name, manager in (
+        ("legacy", LegacyContextManager()),
+        ("raw", OptimizedContextManager(compression=None)),
+        ("zlib", OptimizedContextManager(CompressionPolicy(codec="zlib"))),
+    ):
+        write, write_peak, read, read_peak = measure(manager, payloads)
+        print(f"{name:<10}{write * 1e3:>10.2f}{write_peak / 1e6:>15.2f}"
+              f"{read * 1e3:>10.2f}{read_peak / 1e6:>14.2f}")
+
+if __name__ == "__main__":
+    main()
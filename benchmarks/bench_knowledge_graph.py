@@ -0,0 +1,146 @@
+"""
+Benchmark: KnowledgeGraph memory and traversal
+
+Compares the original storage (a dataclass per node plus the same fields
+copied into networkx attribute dicts, edges kept only as networkx attribute
+dicts) with the current single-copy KnowledgeGraph on both backends. Ids,
+contents and metadata are built before measuring, so the memory figures are
+the graph's own overhead as seen by tracemalloc. Build times are taken
+under tracemalloc too, which inflates them (the csr backend's array
+compactions most). Traversal times cover shortest paths and 1-hop
+neighborhood subgraphs from random nodes. Bulk load times cover
+add_nodes_bulk and add_edges_bulk with the same data, outside tracemalloc.
+
+    python benchmarks/bench_knowledge_graph.py [nodes]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict
+
+import networkx as nx
+
+from scriptchain.core.knowledge_graph import BACKENDS, KnowledgeGraph
+
+EDGES_PER_NODE = 2
+QUERIES = 200
+
+@dataclass
+class LegacyNode:
+    id: str
+    type: str
+    content: Any
+    metadata: Dict[str, Any]
+    created_at: datetime
+    updated_at: datetime
+
+class LegacyKnowledgeGraph:
+    def __init__(self):
+        self.graph = nx.DiGraph()
+        self.nodes = {}
+
+    def add_node(self, node_id, node_type, content, metadata=None):
+        now = datetime.now()
+        self.nodes[node_id] = LegacyNode(
+            node_id, node_type, content, metadata or {}, now, now
+        )
+        self.graph.add_node(node_id, **{
+            'type': node_type,
+            'content': content,
+            'metadata': metadata or {},
+            'created_at': now,
+            'updated_at': now
+        })
+
+    def add_edge(self, source_id, target_id, edge_type, metadata=None):
+        if source_id not in self.nodes or target_id not in self.nodes:
+            raise ValueError("Source or target node does not exist")
+        self.graph.add_edge(source_id, target_id, **{
+            'type': edge_type,
+            'metadata': metadata or {},
+            'created_at': datetime.now()
+        })
+
+def measure(graph, ids, contents, metadata, edges):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for node_id, content, meta in zip(ids, contents, metadata):
+        graph.add_node(node_id, "entity", content, meta)
+    node_time = time.perf_counter() - start
+    node_bytes, _ = tracemalloc.get_traced_memory()
+
+    start = time.perf_counter()
+    for source, target in edges:
+        graph.add_edge(source, target, "related_to")
+    edge_time = time.perf_counter() - start
+    total_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return node_bytes, node_time, total_bytes - node_bytes, edge_time
+
+def traverse(graph, ids):
+    rng = random.Random(0)
+    pairs = [(rng.choice(ids), rng.choice(ids)) for _ in range(QUERIES)]
+    graph.get_path(*pairs[0])  # warm up
+    start = time.perf_counter()
+    for source, target in pairs:
+        graph.get_path(source, target)
+    paths = time.perf_counter() - start
+    start = time.perf_counter()
+    for source, _ in pairs:
+        neighborhood = [source] + [n.id for n in graph.get_connected_nodes(source, "out")]
+        graph.get_subgraph(neighborhood)
+    subgraphs = time.perf_counter() - start
+    return paths, subgraphs
+
+def bulk_load(backend, ids, contents, metadata, edges):
+    sources, targets = zip(*edges)
+    graph = KnowledgeGraph(backend=backend)
+    start = time.perf_counter()
+    graph.add_nodes_bulk(ids, "entity", contents, metadata)
+    node_time = time.perf_counter() - start
+    start = time.perf_counter()
+    graph.add_edges_bulk(sources, targets, "related_to")
+    return node_time, time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ids = [f"entity-{i}" for i in range(count)]
+    contents = [f"Entity number {i}" for i in range(count)]
+    metadata = [{"source": "doc-%d" % (i % 1000)} for i in range(count)]
+    edges = [
+        (ids[i], ids[(i * 7 + k * 13 + 1) % count])
+        for i in range(count) for k in range(EDGES_PER_NODE)
+    ]
+    print(f"{count:,} nodes, {len(edges):,} edges\n")
+    print(f"{'graph':<10}{'B/node':>10}{'node s':>10}{'B/edge':>10}{'edge s':>10}"
+          f"{'paths s':>10}{'subgr s':>10}")
+    results = {}
+    for name, factory in (
+        ("legacy", LegacyKnowledgeGraph),
+        ("networkx", KnowledgeGraph),
+        ("csr", lambda: KnowledgeGraph(backend="csr")),
+    ):
+        graph = factory()
+        node_bytes, node_time, edge_bytes, edge_time = measure(
+            graph, ids, contents, metadata, edges
+        )
+        results[name] = node_bytes / count
+        line = (f"{name:<10}{node_bytes / count:>10.0f}{node_time:>10.2f}"
+                f"{edge_bytes / len(edges):>10.0f}{edge_time:>10.2f}")
+        if isinstance(graph, KnowledgeGraph):
+            paths, subgraphs = traverse(graph, ids)
+            line += f"{paths:>10.2f}{subgraphs:>10.2f}"
+        print(line)
+        del graph
+    saved = 1 - results["networkx"] / results["legacy"]
+    print(f"\nper-node memory reduced by {saved:.0%}\n")
+    for backend in BACKENDS:
+        node_time, edge_time = bulk_load(backend, ids, contents, metadata, edges)
+        print(f"bulk load ({backend}): nodes {node_time:.2f}s, edges {edge_time:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Micro-benchmark: per-call cost of EnhancedPromptTemplate.format
+
+Compares the original rendering path (langchain PromptTemplate.format plus
+re-joining the few-shot block on every call) with the precompiled template.
+
+    python benchmarks/bench_prompts.py
+"""
+
+import timeit
+from scriptchain.core.prompts import EnhancedPromptTemplate, FewShotExample
+
+CALLS = 20000
+
+def legacy_format(template: EnhancedPromptTemplate, **kwargs) -> str:
+    base_result = template.base_template.format(**kwargs)
+    if not template.examples:
+        return base_result
+    example_str = "\n\n".join(
+        [f"Input: {ex.input}\nOutput: {ex.output}\nReasoning: {ex.reasoning}"
+         for ex in template.examples]
+    )
+    return f"{template.example_header}\n{example_str}\n\n{base_result}"
+
+def main():
+    template = EnhancedPromptTemplate(
+        template="Classify the sentiment of: {text}\nAudience: {audience}",
+        input_variables=["text", "audience"],
+        examples=[
+            FewShotExample(
+                input=f"Example sentence number {i}",
+                output="neutral",
+                reasoning="No strong emotional words"
+            )
+            for i in range(8)
+        ]
+    )
+    inputs = {"text": "The release went smoothly. " * 20, "audience": "support"}
+    assert legacy_format(template, **inputs) == template.format(**inputs)
+
+    legacy = timeit.timeit(lambda: legacy_format(template, **inputs), number=CALLS)
+    compiled = timeit.timeit(lambda: template.format(**inputs), number=CALLS)
+
+    print(f"legacy:   {legacy / CALLS * 1e6:8.2f} us/call")
+    print(f"compiled: {compiled / CALLS * 1e6:8.2f} us/call")
+    print(f"speedup:  {legacy / compiled:8.1f}x")
+
+if __name__ == "__main__":
+    main()
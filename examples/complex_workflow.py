@@ -63,7 +63,7 @@ class SummaryGeneratorNode(BaseLLMNode):
 
 async def main():
     # Create engine
-    engine = ChainEngine(mode="linear")
+    engine = ChainEngine(mode="dag")
     
     # Create prompt templates
     topic_template = EnhancedPromptTemplate(
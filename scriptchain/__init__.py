@@ -1,17 +1,25 @@
 from .core.engine import ChainEngine
-from .core.nodes import BaseNode
+from .core.nodes import BaseNode, IncrementalNode, LLMResponse, MapReduceNode
 from .core.prompts import EnhancedPromptTemplate
-from .core.context import OptimizedContextManager, ContextItem
+from .core.context import OptimizedContextManager, ContextItem, CompressionPolicy
 from .core.token_tracker import TokenTracker
-from .core.knowledge_graph import KnowledgeGraph
+from .core.knowledge_graph import KnowledgeGraph, SubgraphView
+from .core.cache import ResponseCache
 
 __version__ = "0.1.0"
 __all__ = [
     "ChainEngine",
     "BaseNode",
+    "LLMResponse",
+    "MapReduceNode",
+    "IncrementalNode",
     "EnhancedPromptTemplate",
     "OptimizedContextManager",
     "ContextItem",
+    "CompressionPolicy",
     "TokenTracker",
     "KnowledgeGraph",
-] 
\ No newline at end of file
+    "SubgraphView",
+    "ResponseCache",
+]
+ 
\ No newline at end of file
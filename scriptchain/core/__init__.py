@@ -4,9 +4,30 @@ ScriptChain - A lightweight, efficient chain execution framework
 
 __version__ = "0.1.0"
 
-from .engine import ChainEngine
-from .nodes import BaseNode
-from .context import OptimizedContextManager
+from .engine import ChainEngine, ExecutionPlan, RunStats, StreamEvent
+from .nodes import BaseNode, IncrementalNode, LLMResponse, MapReduceNode
+from .context import OptimizedContextManager, CompressionPolicy, ContextView
 from .prompts import EnhancedPromptTemplate
+from .cache import ResponseCache
+from .example_selector import SimilarityExampleSelector
+from .tokenizer import TokenCounter, PromptTooLargeError
 
-__all__ = ["ChainEngine", "BaseNode", "OptimizedContextManager", "EnhancedPromptTemplate"] 
\ No newline at end of file
+__all__ = [
+    "ChainEngine",
+    "ExecutionPlan",
+    "RunStats",
+    "StreamEvent",
+    "BaseNode",
+    "LLMResponse",
+    "MapReduceNode",
+    "IncrementalNode",
+    "OptimizedContextManager",
+    "CompressionPolicy",
+    "ContextView",
+    "EnhancedPromptTemplate",
+    "ResponseCache",
+    "SimilarityExampleSelector",
+    "TokenCounter",
+    "PromptTooLargeError",
+]
+ 
\ No newline at end of file
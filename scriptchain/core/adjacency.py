@@ -0,0 +1,629 @@
+"""
+Node and edge records, and the adjacency storage backends for KnowledgeGraph
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import repeat
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+import networkx as nx
+import numpy as np
+
+class _Attributes(Mapping):
+    """Read-only mapping over a record's ``_attributes`` fields, so the
+    record can stand in for a networkx attribute dict"""
+
+    __slots__ = ()
+    _attributes: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._attributes:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._attributes)
+
+    def __len__(self) -> int:
+        return len(self._attributes)
+
+@dataclass(slots=True)
+class Node(_Attributes):
+    id: str
+    type: str
+    content: Any
+    metadata: Dict[str, Any]
+    created_at: datetime
+    updated_at: datetime
+
+    # The keys of the original networkx node attribute dicts
+    _attributes = ("type", "content", "metadata", "created_at", "updated_at")
+
+@dataclass(slots=True)
+class Edge(_Attributes):
+    source: str
+    target: str
+    type: str
+    metadata: Mapping[str, Any]
+    created_at: datetime
+
+    _attributes = ("type", "metadata", "created_at")
+
+# Metadata of every bulk-loaded edge without any; read-only since it is shared
+_NO_METADATA: Mapping[str, Any] = MappingProxyType({})
+
+# Adjacency entry of every node without edges in one direction, replaced by
+# a dict of its own on the first edge; read-only so it can't be filled in by
+# mistake
+_NO_EDGES: Mapping[str, Edge] = MappingProxyType({})
+
+class _GraphView(nx.DiGraph):
+    """Read-only networkx graph over a KnowledgeGraph's own storage.
+
+    Node and edge data are the Node and Edge records themselves, which read
+    as attribute dicts with the keys the graph used to store ("type",
+    "content", "metadata", "created_at", "updated_at" for nodes; "type",
+    "metadata", "created_at" for edges); nothing is copied. Algorithms and
+    views work directly (``nx.shortest_path`` with or without ``weight``,
+    ``subgraph``, ``reverse(copy=False)``, ``ego_graph``). ``copy``,
+    ``reverse``, ``to_directed``, ``to_undirected``, pickling and deepcopy
+    give ordinary mutable graphs with plain dict data. Mutating the view itself raises
+    NetworkXError.
+    """
+
+    def __init__(
+        self,
+        nodes: Optional[Dict[str, Node]] = None,
+        succ: Optional[Dict[str, Mapping[str, Edge]]] = None,
+        pred: Optional[Dict[str, Mapping[str, Edge]]] = None
+    ):
+        super().__init__()
+        if nodes is None:
+            # networkx builds views and copies through the class with no
+            # arguments; those start as plain empty graphs
+            return
+        self._node = nodes
+        self._adj = succ
+        self._pred = pred
+        nx.freeze(self)
+
+    def copy(self, as_view: bool = False) -> nx.DiGraph:
+        if as_view:
+            return nx.graphviews.generic_graph_view(self)
+        graph = nx.DiGraph()
+        graph.graph.update(self.graph)
+        graph.add_nodes_from((node_id, dict(data)) for node_id, data in self._node.items())
+        graph.add_edges_from(
+            (source, target, dict(data))
+            for source, targets in self._adj.items()
+            for target, data in targets.items()
+        )
+        return graph
+
+    def __reduce__(self):
+        # Pickle (and deepcopy) as a plain copy; the shared read-only
+        # adjacency entries don't pickle
+        return nx.DiGraph, (self.copy(),)
+
+    def reverse(self, copy: bool = True) -> nx.DiGraph:
+        if not copy:
+            return nx.reverse_view(self)
+        return self.copy().reverse()
+
+class DictAdjacency:
+    """Node id -> {neighbor id: Edge} dicts in both directions.
+
+    ``graph`` is a read-only networkx view over them, so networkx algorithms
+    run on the graph without copying it.
+    """
+
+    def __init__(self, nodes: Dict[str, Node]):
+        self._nodes = nodes
+        self._succ: Dict[str, Mapping[str, Edge]] = {}
+        self._pred: Dict[str, Mapping[str, Edge]] = {}
+        self.graph = _GraphView(nodes, self._succ, self._pred)
+
+    def add_node(self, node_id: str) -> None:
+        self._succ[node_id] = _NO_EDGES
+        self._pred[node_id] = _NO_EDGES
+
+    def add_nodes(self, node_ids: List[str]) -> None:
+        empty = dict.fromkeys(node_ids, _NO_EDGES)
+        self._succ.update(empty)
+        self._pred.update(empty)
+
+    def add_edge(self, edge: Edge) -> None:
+        targets = self._succ[edge.source]
+        if targets is _NO_EDGES:
+            targets = self._succ[edge.source] = {}
+        targets[edge.target] = edge
+        sources = self._pred[edge.target]
+        if sources is _NO_EDGES:
+            sources = self._pred[edge.target] = {}
+        sources[edge.source] = edge
+
+    def add_edges(
+        self,
+        source_ids: Sequence[str],
+        target_ids: Sequence[str],
+        types: Union[str, Sequence[str]],
+        metadata: Optional[Sequence[Optional[Mapping[str, Any]]]],
+        created_at: datetime
+    ) -> None:
+        """Add a batch of edges given as columns, checking every endpoint
+        before adding any"""
+        nodes = self._nodes
+        try:
+            sources = list(map(nodes.__getitem__, source_ids))
+            targets = list(map(nodes.__getitem__, target_ids))
+        except KeyError:
+            _check_endpoints(
+                source_ids, map(nodes.__contains__, source_ids),
+                target_ids, map(nodes.__contains__, target_ids)
+            )
+            raise
+        types = repeat(types) if isinstance(types, str) else types
+        metadata = repeat(None) if metadata is None else metadata
+        succ, pred = self._succ, self._pred
+        for source, target, edge_type, meta in zip(sources, targets, types, metadata):
+            # Reference the stored ids rather than keeping equal copies
+            source_id, target_id = source.id, target.id
+            edge = Edge(source_id, target_id, edge_type, meta or _NO_METADATA, created_at)
+            out = succ[source_id]
+            if out is _NO_EDGES:
+                out = succ[source_id] = {}
+            out[target_id] = edge
+            into = pred[target_id]
+            if into is _NO_EDGES:
+                into = pred[target_id] = {}
+            into[source_id] = edge
+
+    def get_edge(self, source_id: str, target_id: str) -> Optional[Edge]:
+        return self._succ.get(source_id, _NO_EDGES).get(target_id)
+
+    def iter_edges(self) -> Iterator[Edge]:
+        for targets in self._succ.values():
+            yield from targets.values()
+
+    def successors(self, node_id: str) -> List[str]:
+        return list(self._succ[node_id])
+
+    def predecessors(self, node_id: str) -> List[str]:
+        return list(self._pred[node_id])
+
+    def shortest_path(self, source_id: str, target_id: str) -> Optional[List[str]]:
+        try:
+            return nx.shortest_path(self.graph, source_id, target_id)
+        except nx.NetworkXNoPath:
+            return None
+
+    def subgraph_edges(self, node_ids: Iterable[str]) -> Iterator[Edge]:
+        """Edges between ``node_ids``, found through their out-edges only"""
+        selected = set(node_ids)
+        for source_id in selected:
+            for target_id, edge in self._succ.get(source_id, _NO_EDGES).items():
+                if target_id in selected:
+                    yield edge
+
+class CSRAdjacency:
+    """Integer node handles with NumPy CSR arrays in both directions.
+
+    Edges are stored as columns indexed by edge id: source and target
+    handles, a type code, a batch code (edges added together share one
+    timestamp) and sparse metadata. Edge records are built from them when
+    read, so changing a returned Edge doesn't change the graph.
+
+    Out-edges of handle ``h`` are ``out_targets[out_ptr[h]:out_ptr[h + 1]]``
+    (sorted), with their edge ids at the same offsets of ``out_edges``;
+    in-edges mirror that. Edges added one at a time go to a delta buffer of
+    dicts, which ``compact`` folds into the arrays once it outgrows both
+    ``compact_threshold`` edges and ``compact_ratio`` of the arrays. Lookups
+    and traversals read the buffer alongside the arrays, so queries between
+    single adds stay cheap. Bulk batches, like compaction, are merged into
+    the sorted arrays in O(E + B) rather than re-sorting every edge.
+    """
+
+    def __init__(self, compact_threshold: int = 65536, compact_ratio: float = 0.25):
+        self.compact_threshold = compact_threshold
+        self.compact_ratio = compact_ratio
+        self.graph = None
+        self._handles: Dict[str, int] = {}
+        self._ids: List[str] = []
+        # Edge columns, grown by doubling; the first _edge_count are in use
+        self._edge_count = 0
+        self._edge_sources = np.zeros(0, dtype=np.int32)
+        self._edge_targets = np.zeros(0, dtype=np.int32)
+        self._edge_types = np.zeros(0, dtype=np.int32)
+        self._edge_batches = np.zeros(0, dtype=np.int32)
+        self._type_names: List[str] = []
+        self._type_codes: Dict[str, int] = {}
+        self._timestamps: List[datetime] = []
+        self._edge_metadata: Dict[int, Mapping[str, Any]] = {}
+        self._out_ptr = np.zeros(1, dtype=np.int64)
+        self._out_targets = np.zeros(0, dtype=np.int32)
+        self._out_edges = np.zeros(0, dtype=np.int64)
+        self._in_ptr = np.zeros(1, dtype=np.int64)
+        self._in_sources = np.zeros(0, dtype=np.int32)
+        self._in_edges = np.zeros(0, dtype=np.int64)
+        # Edges not yet compacted: handle -> {neighbor handle: edge id}
+        self._delta_out: Dict[int, Dict[int, int]] = {}
+        self._delta_in: Dict[int, Dict[int, int]] = {}
+        self._delta_size = 0
+        # Parent arrays reused by every search; entries are reset after use
+        self._parents: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def add_node(self, node_id: str) -> None:
+        self._handles[node_id] = len(self._ids)
+        self._ids.append(node_id)
+
+    def add_nodes(self, node_ids: List[str]) -> None:
+        start = len(self._ids)
+        self._handles.update(zip(node_ids, range(start, start + len(node_ids))))
+        self._ids.extend(node_ids)
+
+    def _type_code(self, edge_type: str) -> int:
+        code = self._type_codes.get(edge_type)
+        if code is None:
+            code = self._type_codes[edge_type] = len(self._type_names)
+            self._type_names.append(edge_type)
+        return code
+
+    def _batch_code(self, created_at: datetime) -> int:
+        if not self._timestamps or self._timestamps[-1] != created_at:
+            self._timestamps.append(created_at)
+        return len(self._timestamps) - 1
+
+    def _reserve(self, count: int) -> int:
+        """Make room for ``count`` more edges; returns the first new edge id"""
+        first = self._edge_count
+        needed = first + count
+        if needed > len(self._edge_sources):
+            capacity = max(needed, 2 * len(self._edge_sources), 1024)
+            self._edge_sources = _grown(self._edge_sources, capacity, first)
+            self._edge_targets = _grown(self._edge_targets, capacity, first)
+            self._edge_types = _grown(self._edge_types, capacity, first)
+            self._edge_batches = _grown(self._edge_batches, capacity, first)
+        self._edge_count = needed
+        return first
+
+    def _records(self, edge_ids: np.ndarray) -> Iterator[Edge]:
+        """Edge records for ``edge_ids``, with columns gathered in one step"""
+        ids, names, timestamps = self._ids, self._type_names, self._timestamps
+        metadata = self._edge_metadata
+        columns = zip(
+            self._edge_sources[edge_ids].tolist(),
+            self._edge_targets[edge_ids].tolist(),
+            self._edge_types[edge_ids].tolist(),
+            self._edge_batches[edge_ids].tolist(),
+            edge_ids.tolist()
+        )
+        for source, target, edge_type, batch, edge_id in columns:
+            yield Edge(
+                ids[source],
+                ids[target],
+                names[edge_type],
+                metadata.get(edge_id, _NO_METADATA),
+                timestamps[batch]
+            )
+
+    def add_edge(self, edge: Edge) -> None:
+        source = self._handles[edge.source]
+        target = self._handles[edge.target]
+        edge_id = self._find(source, target)
+        if edge_id is None:
+            edge_id = self._reserve(1)
+            self._edge_sources[edge_id] = source
+            self._edge_targets[edge_id] = target
+            self._delta_out.setdefault(source, {})[target] = edge_id
+            self._delta_in.setdefault(target, {})[source] = edge_id
+            self._delta_size += 1
+        self._edge_types[edge_id] = self._type_code(edge.type)
+        self._edge_batches[edge_id] = self._batch_code(edge.created_at)
+        if edge.metadata:
+            self._edge_metadata[edge_id] = edge.metadata
+        else:
+            self._edge_metadata.pop(edge_id, None)
+        if self._delta_size > max(
+            self.compact_threshold, self.compact_ratio * len(self._out_targets)
+        ):
+            self.compact()
+
+    def add_edges(
+        self,
+        source_ids: Sequence[str],
+        target_ids: Sequence[str],
+        types: Union[str, Sequence[str]],
+        metadata: Optional[Sequence[Optional[Mapping[str, Any]]]],
+        created_at: datetime
+    ) -> None:
+        """Merge a batch of edges given as columns straight into the arrays,
+        checking every endpoint before adding any.
+
+        Edges already in the graph, and earlier duplicates within the
+        batch, are replaced as with ``add_edge``.
+        """
+        count = len(source_ids)
+        handles = self._handles
+        try:
+            sources = np.fromiter(map(handles.__getitem__, source_ids), np.int64, count)
+            targets = np.fromiter(map(handles.__getitem__, target_ids), np.int64, count)
+        except KeyError:
+            _check_endpoints(
+                source_ids, map(handles.__contains__, source_ids),
+                target_ids, map(handles.__contains__, target_ids)
+            )
+            raise
+        if not count:
+            return
+        if isinstance(types, str):
+            codes = np.full(count, self._type_code(types), dtype=np.int32)
+        else:
+            codes = np.fromiter(map(self._type_code, types), np.int32, count)
+        self.compact()
+
+        # The last occurrence of every (source, target) pair wins
+        nodes = len(self._ids)
+        keys, last = np.unique((sources * nodes + targets)[::-1], return_index=True)
+        batch = count - 1 - last
+        existing = np.repeat(np.arange(nodes, dtype=np.int64), np.diff(self._out_ptr))
+        existing = existing * nodes + self._out_targets
+        positions = np.asarray(existing.searchsorted(keys))
+        found: np.ndarray = positions < len(existing)
+        found[found] = existing[positions[found]] == keys[found]
+        # Replaced edges keep their ids; new ones get ids in batch order
+        edge_ids = np.empty(count, dtype=np.int64)
+        replaced = self._out_edges[positions[found]]
+        edge_ids[batch[found]] = replaced
+        added = np.sort(batch[~found])
+        first = self._reserve(len(added))
+        edge_ids[added] = np.arange(first, first + len(added))
+
+        kept = np.sort(batch)
+        ids = edge_ids[kept]
+        self._edge_sources[ids] = sources[kept]
+        self._edge_targets[ids] = targets[kept]
+        self._edge_types[ids] = codes[kept]
+        self._edge_batches[ids] = self._batch_code(created_at)
+        if self._edge_metadata:
+            for edge_id in replaced.tolist():
+                self._edge_metadata.pop(edge_id, None)
+        if metadata is not None:
+            for index, edge_id in zip(kept.tolist(), ids.tolist()):
+                if metadata[index]:
+                    self._edge_metadata[edge_id] = metadata[index]
+        if added.size:
+            self._merge(sources[added], targets[added], edge_ids[added])
+
+    def _find(self, source: int, target: int) -> Optional[int]:
+        delta = self._delta_out.get(source)
+        if delta is not None and target in delta:
+            return delta[target]
+        if source >= len(self._out_ptr) - 1:
+            return None
+        start, end = int(self._out_ptr[source]), int(self._out_ptr[source + 1])
+        if start == end:
+            return None
+        offset = start + int(self._out_targets[start:end].searchsorted(target))
+        if offset < end and self._out_targets[offset] == target:
+            return int(self._out_edges[offset])
+        return None
+
+    def get_edge(self, source_id: str, target_id: str) -> Optional[Edge]:
+        source = self._handles.get(source_id)
+        target = self._handles.get(target_id)
+        if source is None or target is None:
+            return None
+        edge_id = self._find(source, target)
+        return None if edge_id is None else next(self._records(np.array([edge_id])))
+
+    def iter_edges(self) -> Iterator[Edge]:
+        for start in range(0, self._edge_count, 65536):
+            stop = min(start + 65536, self._edge_count)
+            yield from self._records(np.arange(start, stop))
+
+    def successors(self, node_id: str) -> List[str]:
+        return self._neighbors(
+            self._handles[node_id], self._out_ptr, self._out_targets, self._delta_out
+        )
+
+    def predecessors(self, node_id: str) -> List[str]:
+        return self._neighbors(
+            self._handles[node_id], self._in_ptr, self._in_sources, self._delta_in
+        )
+
+    def _neighbors(
+        self,
+        handle: int,
+        ptr: np.ndarray,
+        neighbors: np.ndarray,
+        delta: Dict[int, Dict[int, int]]
+    ) -> List[str]:
+        ids = self._ids
+        found = []
+        if handle < len(ptr) - 1:
+            found = [ids[h] for h in neighbors[ptr[handle]:ptr[handle + 1]].tolist()]
+        found.extend(ids[h] for h in delta.get(handle, ()))
+        return found
+
+    def compact(self) -> None:
+        """Fold the delta buffer into the CSR arrays"""
+        if not self._delta_size:
+            # Still gives nodes added since the last compaction their rows
+            empty = np.zeros(0, dtype=np.int64)
+            self._merge(empty, empty, empty)
+            return
+        buffered = np.array([
+            (source, target, edge_id)
+            for source, row in self._delta_out.items()
+            for target, edge_id in row.items()
+        ], dtype=np.int64)
+        self._delta_out = {}
+        self._delta_in = {}
+        self._delta_size = 0
+        self._merge(buffered[:, 0], buffered[:, 1], buffered[:, 2])
+
+    def _merge(self, sources: np.ndarray, targets: np.ndarray, edges: np.ndarray) -> None:
+        """Insert edges that aren't in the CSR arrays yet, in both directions"""
+        nodes = len(self._ids)
+        self._out_ptr, self._out_targets, self._out_edges = _csr_merge(
+            self._out_ptr, self._out_targets, self._out_edges,
+            sources, targets, edges, nodes
+        )
+        self._in_ptr, self._in_sources, self._in_edges = _csr_merge(
+            self._in_ptr, self._in_sources, self._in_edges,
+            targets, sources, edges, nodes
+        )
+
+    def _expand(
+        self,
+        frontier: np.ndarray,
+        incoming: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Out-edges (or in-edges) of every handle in ``frontier`` as
+        (handles, neighbors, edge ids).
+
+        CSR rows are gathered without a Python loop; buffered edges are
+        looked up per handle, so traversals don't have to compact first.
+        """
+        if incoming:
+            ptr, neighbors, edges, delta = (
+                self._in_ptr, self._in_sources, self._in_edges, self._delta_in
+            )
+        else:
+            ptr, neighbors, edges, delta = (
+                self._out_ptr, self._out_targets, self._out_edges, self._delta_out
+            )
+        # Handles added since the last compaction have no CSR row
+        rows = frontier[frontier < len(ptr) - 1]
+        starts = ptr[rows]
+        counts = ptr[rows + 1] - starts
+        total = int(counts.sum())
+        # Offset of every edge: its row start plus its position in the row
+        row_base = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        offsets = row_base + np.arange(total)
+        handles, found, ids = np.repeat(rows, counts), neighbors[offsets], edges[offsets]
+        if delta:
+            buffered = [
+                (handle, neighbor, edge_id)
+                for handle in frontier.tolist()
+                for neighbor, edge_id in delta.get(handle, {}).items()
+            ]
+            if buffered:
+                extra = np.array(buffered, dtype=np.int64)
+                handles = np.concatenate((handles, extra[:, 0]))
+                found = np.concatenate((found, extra[:, 1]))
+                ids = np.concatenate((ids, extra[:, 2]))
+        return handles, found, ids
+
+    def shortest_path(self, source_id: str, target_id: str) -> Optional[List[str]]:
+        """Bidirectional breadth-first search, a whole level at a time"""
+        source = self._handles[source_id]
+        target = self._handles[target_id]
+        if source == target:
+            return [source_id]
+        count = len(self._ids)
+        if self._parents is None or len(self._parents[0]) < count:
+            self._parents = (
+                np.full(count, -1, dtype=np.int64), np.full(count, -1, dtype=np.int64)
+            )
+        forward, backward = self._parents
+        forward[source] = source
+        backward[target] = target
+        touched = [np.array([source]), np.array([target])]
+        frontiers = [touched[0], touched[1]]
+        try:
+            while frontiers[0].size and frontiers[1].size:
+                # Grow the smaller side: out-edges forward, in-edges backward
+                side = 0 if frontiers[0].size <= frontiers[1].size else 1
+                parents, others = (forward, backward) if side == 0 else (backward, forward)
+                handles, found, _ = self._expand(frontiers[side], incoming=side == 1)
+                unseen = parents[found] < 0
+                found, first = np.unique(found[unseen], return_index=True)
+                parents[found] = handles[unseen][first]
+                touched.append(found)
+                frontiers[side] = found.astype(np.int64)
+                meet = found[others[found] >= 0]
+                if meet.size:
+                    # Every meeting node is one level deep on this side;
+                    # take the one closest to the other end
+                    middle = min(meet.tolist(), key=lambda h: len(_chain(others, h)))
+                    path = _chain(forward, middle)[::-1] + _chain(backward, middle)[1:]
+                    return [self._ids[handle] for handle in path]
+            return None
+        finally:
+            for handles in touched:
+                forward[handles] = -1
+                backward[handles] = -1
+
+    def subgraph_edges(self, node_ids: Iterable[str]) -> Iterator[Edge]:
+        """Edges between ``node_ids``, filtered from the out-edges of those
+        nodes in one vectorized pass"""
+        handles = np.fromiter(
+            (self._handles[node_id] for node_id in node_ids if node_id in self._handles),
+            dtype=np.int64
+        )
+        if not handles.size:
+            return iter(())
+        handles = np.unique(handles)
+        _, targets, edges = self._expand(handles)
+        return self._records(edges[np.isin(targets, handles)])
+
+def _check_endpoints(
+    source_ids: Sequence[str],
+    sources: Iterable[Any],
+    target_ids: Sequence[str],
+    targets: Iterable[Any]
+) -> None:
+    """Raise ValueError naming the endpoints not found in the graph"""
+    missing = {node_id for node_id, found in zip(source_ids, sources) if not found}
+    missing.update(node_id for node_id, found in zip(target_ids, targets) if not found)
+    if missing:
+        raise ValueError(
+            f"{len(missing)} edge endpoints do not exist, e.g. {sorted(missing)[:5]}"
+        )
+
+def _grown(column: np.ndarray, capacity: int, used: int) -> np.ndarray:
+    """A copy of the first ``used`` entries of ``column`` with room for ``capacity``"""
+    grown = np.zeros(capacity, dtype=column.dtype)
+    grown[:used] = column[:used]
+    return grown
+
+def _csr_merge(
+    ptr: np.ndarray,
+    columns: np.ndarray,
+    edges: np.ndarray,
+    new_rows: np.ndarray,
+    new_columns: np.ndarray,
+    new_edges: np.ndarray,
+    count: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR arrays for ``count`` rows with the new entries merged in, each
+    row still sorted by column.
+
+    Only the new entries are sorted; they are inserted with one linear
+    pass over the existing arrays.
+    """
+    if len(ptr) - 1 < count:
+        # Rows added since the arrays were built have no entries yet
+        ptr = np.append(ptr, np.repeat(ptr[-1], count + 1 - len(ptr)))
+    if not new_rows.size:
+        return ptr, columns, edges
+    new_keys = new_rows * count + new_columns
+    order = np.argsort(new_keys)
+    rows = np.repeat(np.arange(count, dtype=np.int64), np.diff(ptr))
+    positions = np.searchsorted(rows * count + columns, new_keys[order])
+    merged_ptr = ptr.copy()
+    merged_ptr[1:] += np.cumsum(np.bincount(new_rows, minlength=count))
+    return (
+        merged_ptr,
+        np.insert(columns, positions, new_columns[order]),
+        np.insert(edges, positions, new_edges[order])
+    )
+
+def _chain(parents: np.ndarray, handle: int) -> List[int]:
+    """Handles from ``handle`` back to the root of its search"""
+    chain = [handle]
+    while parents[chain[-1]] != chain[-1]:
+        chain.append(int(parents[chain[-1]]))
+    return chain
@@ -0,0 +1,306 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import msgpack
+
+_MISSING = object()
+
+class ResponseCache:
+    """Content-addressed cache of LLM responses.
+
+    Entries live in an in-memory LRU bounded by ``max_size`` and optionally
+    expire after ``ttl`` seconds. Passing ``path`` adds a sqlite-backed disk
+    tier so responses survive restarts; memory misses fall through to disk and
+    disk hits are promoted back into memory. The disk tier keeps at most
+    ``disk_max_size`` entries, dropping the oldest first, and expires them
+    with the same ``ttl``.
+
+    All sqlite work runs on one background thread. Writes are queued and
+    committed in batches, and ``aget`` waits for a disk lookup without
+    blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        disk_max_size: int = 65536
+    ):
+        if max_size < 1 or disk_max_size < 1:
+            raise ValueError("max_size and disk_max_size must be at least 1")
+        self.max_size = max_size
+        self.disk_max_size = disk_max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Opened on the disk thread, which is the only one to use it
+        self._db: sqlite3.Connection
+        self._disk: Optional[ThreadPoolExecutor] = None
+        # Packed responses waiting for the next batched commit
+        self._unwritten: Dict[str, Tuple[float, bytes]] = {}
+        self._unwritten_lock = threading.Lock()
+        self._flush_queued = False
+        if path is not None:
+            self._disk = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="response-cache"
+            )
+            self._disk.submit(self._open, path).result()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    @staticmethod
+    def make_key(
+        node_id: str,
+        prompt: str,
+        model_params: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Hash a node id, fully formatted prompt and model parameters"""
+        payload = json.dumps(
+            [node_id, prompt, model_params or {}],
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached response for ``key`` or ``default``.
+
+        A memory miss waits for the disk tier; async code should use ``aget``.
+        """
+        value = self._recall(key)
+        if value is not _MISSING:
+            return value
+        row = self._unwritten_row(key)
+        if row is None and self._disk is not None:
+            row = self._disk.submit(self._load, key).result()
+        return self._promote(key, row, default)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        """``get`` that looks up the disk tier off the event loop"""
+        value = self._recall(key)
+        if value is not _MISSING:
+            return value
+        row = self._unwritten_row(key)
+        if row is None and self._disk is not None:
+            loop = asyncio.get_running_loop()
+            row = await loop.run_in_executor(self._disk, self._load, key)
+        return self._promote(key, row, default)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a response in memory and queue it for the disk tier"""
+        created_at = time.time()
+        self._remember(key, created_at, value)
+        if self._disk is None:
+            return
+        try:
+            packed = msgpack.packb(value)
+        except TypeError:
+            # Responses msgpack can't represent stay memory-only
+            return
+        with self._unwritten_lock:
+            self._unwritten[key] = (created_at, packed)
+            if self._flush_queued:
+                return
+            self._flush_queued = True
+        self._disk.submit(self._flush)
+
+    def flush(self) -> None:
+        """Wait until every response stored so far is committed to disk"""
+        if self._disk is not None:
+            self._disk.submit(self._flush).result()
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers"""
+        self._entries.clear()
+        if self._disk is not None:
+            with self._unwritten_lock:
+                self._unwritten.clear()
+            self._disk.submit(self._execute, "DELETE FROM responses").result()
+
+    def close(self) -> None:
+        """Commit queued responses and close the disk tier"""
+        if self._disk is not None:
+            self._disk.submit(self._close).result()
+            self._disk.shutdown()
+            self._disk = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "size": len(self._entries)
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _recall(self, key: str) -> Any:
+        """The response for ``key`` from memory, or _MISSING"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        created_at, value = entry
+        if self._expired(created_at):
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.memory_hits += 1
+        return value
+
+    def _promote(
+        self,
+        key: str,
+        row: Optional[Tuple[float, bytes]],
+        default: Any
+    ) -> Any:
+        """Move a disk row into memory, counting the lookup"""
+        if row is None or self._expired(row[0]):
+            self.misses += 1
+            return default
+        value = msgpack.unpackb(row[1])
+        self._remember(key, row[0], value)
+        self.disk_hits += 1
+        return value
+
+    def _remember(self, key: str, created_at: float, value: Any) -> None:
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _unwritten_row(self, key: str) -> Optional[Tuple[float, bytes]]:
+        with self._unwritten_lock:
+            return self._unwritten.get(key)
+
+    # The methods below run on the disk thread only
+
+    def _open(self, path: str) -> None:
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)"
+        )
+        self._db.commit()
+
+    def _load(self, key: str) -> Optional[Tuple[float, bytes]]:
+        row: Optional[Tuple[float, bytes]] = self._db.execute(
+            "SELECT created_at, value FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None and self._expired(row[0]):
+            self._execute("DELETE FROM responses WHERE key = ?", key)
+            return None
+        return row
+
+    def _flush(self) -> None:
+        with self._unwritten_lock:
+            rows = [
+                (key, packed, created_at)
+                for key, (created_at, packed) in self._unwritten.items()
+            ]
+            self._unwritten = {}
+            self._flush_queued = False
+        if not rows:
+            return
+        self._db.executemany(
+            "INSERT OR REPLACE INTO responses (key, value, created_at) "
+            "VALUES (?, ?, ?)",
+            rows
+        )
+        if self.ttl is not None:
+            self._db.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+        excess = (
+            self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            - self.disk_max_size
+        )
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY created_at, rowid LIMIT ?)",
+                (excess,)
+            )
+            self.disk_evictions += excess
+        self._db.commit()
+
+    def _execute(self, statement: str, *params: Any) -> None:
+        self._db.execute(statement, params)
+        self._db.commit()
+
+    def _close(self) -> None:
+        self._flush()
+        self._db.close()
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key starts the call in a task of its own; anyone
+    arriving while it is still running awaits the same task instead of
+    issuing a duplicate request. Cancelling a caller only stops it waiting;
+    the call itself is cancelled once no caller is left. Nothing is
+    remembered once the call settles.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Flight] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = self._inflight[key] = _Flight(asyncio.ensure_future(call()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            # Shield so a cancelled caller doesn't cancel the shared call
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # The last caller gave up; later ones start afresh
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
@@ -1,56 +1,718 @@
-from pydantic import BaseModel
-from typing import Dict, Any, List
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import (
+    Dict, Any, AsyncIterable, AsyncIterator, FrozenSet, Iterator, List, Optional,
+    Sequence, Set, Tuple
+)
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import uuid
+import weakref
+import zlib
 import msgpack
 
-class ContextItem(BaseModel):
-    data: Any
-    dependencies: List[str] = []
-    compressed: bool = False
+try:
+    import zstandard
+except ImportError:  # optional, install scriptchain[zstd]
+    zstandard = None
+
+CODECS = ("zlib", "zstd")
+
+# (minimum payload size in bytes, compression level); sizes below the first
+# tier are stored raw and very large payloads trade ratio for speed
+DEFAULT_TIERS = {
+    "zlib": ((32 * 1024, 6), (1 << 20, 1)),
+    "zstd": ((32 * 1024, 9), (1 << 20, 3)),
+}
+
+class CompressionPolicy:
+    """Size-thresholded compression settings for context payloads.
+
+    ``tiers`` picks the compression level from the payload size. With
+    ``dictionary_size`` set, the first ``dictionary_samples`` compressed
+    payloads train a shared dictionary used for everything compressed after
+    them; a dictionary trained elsewhere can be passed in as ``dictionary``.
+    """
+
+    def __init__(
+        self,
+        codec: Optional[str] = None,
+        tiers: Optional[Sequence[Tuple[int, int]]] = None,
+        dictionary: Optional[bytes] = None,
+        dictionary_size: int = 0,
+        dictionary_samples: int = 16,
+        decoded_cache_size: int = 8
+    ):
+        codec = codec or ("zstd" if zstandard is not None else "zlib")
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}', expected one of {CODECS}")
+        if codec == "zstd" and zstandard is None:
+            raise ImportError("zstd compression requires the 'zstandard' package")
+        self.codec = codec
+        self.tiers = sorted(tiers or DEFAULT_TIERS[codec])
+        if not self.tiers:
+            raise ValueError("At least one compression tier is required")
+        self.dictionary = dictionary
+        self.dictionary_size = dictionary_size
+        self.dictionary_samples = dictionary_samples
+        self.decoded_cache_size = decoded_cache_size
+
+    @property
+    def threshold(self) -> int:
+        return self.tiers[0][0]
+
+    def level_for(self, size: int) -> Optional[int]:
+        """Compression level for a payload of ``size`` bytes, None to skip"""
+        level = None
+        for min_size, tier_level in self.tiers:
+            if size < min_size:
+                break
+            level = tier_level
+        return level
+
+DEFAULT_COMPRESSION = CompressionPolicy(codec="zlib")
+
+class ContextItem:
+    """A single context value and the keys it was derived from.
+
+    Values are held by reference: strings and bytes are immutable, so readers
+    share one copy with the writer. Mutable buffers are frozen into ``bytes``
+    once on the way in so that views handed out later can't change under the
+    reader. Compressed items hold the compressed bytes in ``data`` and are
+    decoded by the owning ``OptimizedContextManager``, which also sets
+    ``spill_path`` when the payload has been moved to disk. ``fingerprint``
+    identifies the inputs and node definition a node output was computed
+    from.
+    """
+
+    __slots__ = (
+        "data", "dependencies", "compressed", "codec", "dictionary_id",
+        "raw_size", "is_text", "fingerprint", "spill_path", "_buffer", "_nbytes"
+    )
+
+    def __init__(
+        self,
+        data: Any,
+        dependencies: Sequence[str] = (),
+        compressed: bool = False,
+        codec: Optional[str] = None,
+        dictionary_id: Optional[int] = None,
+        raw_size: int = 0,
+        is_text: bool = False,
+        fingerprint: Optional[str] = None
+    ):
+        if isinstance(data, (bytearray, memoryview)):
+            data = bytes(data)
+        self.data = data
+        self.dependencies = tuple(dependencies)
+        self.compressed = compressed
+        self.codec = codec
+        self.dictionary_id = dictionary_id
+        self.raw_size = raw_size
+        self.is_text = is_text
+        self.fingerprint = fingerprint
+        self.spill_path: Optional[str] = None
+        self._buffer: Optional[bytes] = None
+        self._nbytes: Optional[int] = None
+
+    def view(self) -> memoryview:
+        """Zero-copy read-only view of the payload bytes.
+
+        Bytes payloads are viewed directly; strings are UTF-8 encoded on the
+        first call only and the encoded buffer is reused afterwards.
+        """
+        if isinstance(self.data, bytes):
+            return memoryview(self.data)
+        if self._buffer is None:
+            if not isinstance(self.data, str):
+                raise TypeError(
+                    f"Context payload of type {type(self.data).__name__} "
+                    "has no byte representation"
+                )
+            self._buffer = self.data.encode("utf-8")
+        return memoryview(self._buffer)
+
+    @property
+    def nbytes(self) -> int:
+        """Uncompressed payload size in bytes (UTF-8 for strings, shallow
+        ``sys.getsizeof`` for other objects)"""
+        if self._nbytes is None:
+            self._nbytes = self._measure()
+        return self._nbytes
+
+    def _measure(self) -> int:
+        if self.compressed:
+            return self.raw_size
+        if isinstance(self.data, bytes):
+            return len(self.data)
+        if isinstance(self.data, str):
+            if self._buffer is not None:
+                return len(self._buffer)
+            if self.data.isascii():
+                return len(self.data)
+            return len(self.data.encode("utf-8"))
+        return sys.getsizeof(self.data)
+
+    @property
+    def stored_bytes(self) -> int:
+        """Bytes held in memory for the payload"""
+        if self.spill_path is not None:
+            return 0
+        if self.compressed:
+            return len(self.data)
+        return self.nbytes
+
+class ContextView(Mapping):
+    """Read-only mapping over a fixed set of context keys.
+
+    Values are fetched from the manager only when looked up, so building a
+    view costs nothing for keys the caller never reads.
+    """
+
+    __slots__ = ("_manager", "_keys")
+
+    def __init__(self, manager: "OptimizedContextManager", keys: FrozenSet[str]):
+        self._manager = manager
+        self._keys = keys
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys:
+            raise KeyError(key)
+        return self._manager.get_context(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return f"ContextView({sorted(self._keys)!r})"
+
+# How a streamed value is cut into units a consumer can act on: complete
+# sentences, lines, or JSON Lines records
+SEGMENTS = ("sentence", "line", "jsonl")
+
+_SEGMENT_END = {
+    "sentence": re.compile(r"[.!?]+[\"')\]]*\s+|\n+"),
+    "line": re.compile(r"\n"),
+    "jsonl": re.compile(r"\n"),
+}
+
+class ContextStream:
+    """A value that is still being produced, readable while it grows.
+
+    The producer appends pieces and closes the stream once the value is
+    complete; every reader iterates over all pieces from the first one, so
+    readers may start late or run side by side.
+    """
 
-class OptimizedContextManager:
     def __init__(self):
+        self.pieces: List[str] = []
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def append(self, piece: str) -> None:
+        if self.closed:
+            raise ValueError("Stream is closed")
+        self.pieces.append(piece)
+        self._notify()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._notify()
+
+    def _notify(self) -> None:
+        # Wake current readers; later ones wait on a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            while index < len(self.pieces):
+                yield self.pieces[index]
+                index += 1
+            if self.closed:
+                return
+            await self._changed.wait()
+
+class OptimizedContextManager:
+    def __init__(
+        self,
+        compression: Optional[CompressionPolicy] = DEFAULT_COMPRESSION,
+        spill_dir: Optional[str] = None
+    ):
         self.context: Dict[str, ContextItem] = {}
         self.dependency_graph: Dict[str, List[str]] = {}
+        # Reverse edges of dependency_graph and memoised transitive lineages
+        self._dependents: Dict[str, Set[str]] = {}
+        self._lineage: Dict[str, FrozenSet[str]] = {}
+        self.compression = compression
+        # Where spill() writes payloads; a temporary directory by default,
+        # removed again by close() or when the manager is collected
+        self.spill_dir = spill_dir
+        self._spill_cleanup: Optional[weakref.finalize] = None
+        # Bytes of payload currently held in memory across all keys
+        self.resident_bytes = 0
+        self._dictionaries: List[Any] = []
+        self._samples: List[bytes] = []
+        if compression is not None and compression.dictionary is not None:
+            self._dictionaries.append(self._load_dictionary(compression.dictionary))
+        # key -> (stored item, decompressed copy); the stored item guards
+        # against stale entries
+        self._decoded: "OrderedDict[str, Tuple[ContextItem, ContextItem]]" = (
+            OrderedDict()
+        )
+        self.decompressions = 0
+        self.decoded_cache_hits = 0
+        # Values still being produced (see open_stream)
+        self._streams: Dict[str, ContextStream] = {}
 
     def add_context(
         self,
         key: str,
         data: Any,
-        dependencies: List[str] = [],
-        compress: bool = True
+        dependencies: Sequence[str] = (),
+        compress: bool = True,
+        fingerprint: Optional[str] = None
     ):
         # Store only dependency chain
-        self.dependency_graph[key] = dependencies
-        
-        # Compress large data payloads
-        if compress and isinstance(data, (str, bytes)):
-            self.context[key] = ContextItem(
-                data=msgpack.packb(data),
-                dependencies=dependencies,
-                compressed=True
-            )
-        else:
-            self.context[key] = ContextItem(
-                data=data,
-                dependencies=dependencies,
-                compressed=False
-            )
+        self._set_dependencies(key, dependencies)
+        self._discard(key)
+
+        item = None
+        if compress and self.compression is not None:
+            item = self._compress(data, dependencies)
+        # Everything else is kept as-is and shared by reference
+        item = item or ContextItem(data, dependencies)
+        item.fingerprint = fingerprint
+        self.context[key] = item
+        self.resident_bytes += item.stored_bytes
+
+    def get_fingerprint(self, key: str) -> Optional[str]:
+        """Fingerprint stored with a value, if it has one"""
+        item = self.context.get(key)
+        return item.fingerprint if item is not None else None
 
     def get_context(self, key: str) -> Any:
         item = self.context.get(key)
-        if not item:
+        if item is None:
             return None
-            
-        # Decompress if needed
         if item.compressed:
-            return msgpack.unpackb(item.data)
+            return self._decode(key, item).data
+        if item.spill_path is not None:
+            item = self._load_spilled(item)
         return item.data
 
-    def get_chain(self, keys: List[str]) -> Dict[str, Any]:
-        """Get minimal context needed for a set of keys"""
-        required = set()
-        for key in keys:
-            required.update(self.dependency_graph.get(key, []))
-            required.add(key)
-            
-        return {k: self.get_context(k) for k in required}
\ No newline at end of file
+    def detach(self, key: str) -> Optional[ContextItem]:
+        """Take a value out of the context as stored, keeping its lineage.
+
+        The item stays compressed until ``read_item`` decodes it.
+        """
+        self._decoded.pop(key, None)
+        item = self.context.pop(key, None)
+        if item is None:
+            return None
+        self.resident_bytes -= item.stored_bytes
+        if item.spill_path is not None:
+            spilled, item = item.spill_path, self._load_spilled(item)
+            os.remove(spilled)
+        return item
+
+    def read_item(self, item: ContextItem) -> Any:
+        """The value of an item taken out with ``detach``"""
+        return self._decompress_item(item).data if item.compressed else item.data
+
+    def open_stream(self, key: str) -> ContextStream:
+        """Announce a value that will arrive in pieces before add_context"""
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = ContextStream()
+        return stream
+
+    def get_stream(self, key: str) -> Optional[ContextStream]:
+        """The stream of a value still being produced, if any"""
+        return self._streams.get(key)
+
+    def append_stream(self, key: str, piece: str) -> None:
+        self._streams[key].append(piece)
+
+    def close_stream(self, key: str) -> None:
+        """Mark a streamed value complete; readers already holding it finish"""
+        stream = self._streams.pop(key, None)
+        if stream is not None:
+            stream.close()
+
+    def remove(self, key: str) -> None:
+        """Drop a value; its lineage in dependency_graph is kept"""
+        self._discard(key)
+
+    def spill(self, key: str) -> bool:
+        """Move a value's payload to disk, reloading it on demand.
+
+        Returns False when the value isn't present or msgpack can't represent
+        it, in which case it stays in memory.
+        """
+        item = self.context.get(key)
+        if item is None or item.spill_path is not None:
+            return False
+        try:
+            packed = msgpack.packb(item.data)
+        except TypeError:
+            return False
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="scriptchain-spill-")
+            self._spill_cleanup = weakref.finalize(
+                self, shutil.rmtree, self.spill_dir, ignore_errors=True
+            )
+        path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.msgpack")
+        with open(path, "wb") as f:
+            f.write(packed)
+
+        self.resident_bytes -= item.stored_bytes
+        self._decoded.pop(key, None)
+        # Size is measured lazily, so pin it before the payload leaves memory
+        item._nbytes = item.nbytes
+        item.data = None
+        item._buffer = None
+        item.spill_path = path
+        return True
+
+    def close(self) -> None:
+        """Delete spilled payloads, and the spill directory if it was created
+        here; spilled values can't be read afterwards"""
+        for item in self.context.values():
+            if item.spill_path is not None and os.path.exists(item.spill_path):
+                os.remove(item.spill_path)
+        if self._spill_cleanup is not None:
+            self._spill_cleanup()
+            self._spill_cleanup = None
+            self.spill_dir = None
+
+    def _discard(self, key: str) -> None:
+        self._decoded.pop(key, None)
+        item = self.context.pop(key, None)
+        if item is None:
+            return
+        self.resident_bytes -= item.stored_bytes
+        if item.spill_path is not None and os.path.exists(item.spill_path):
+            os.remove(item.spill_path)
+
+    def _load_spilled(self, item: ContextItem) -> ContextItem:
+        with open(item.spill_path, "rb") as f:
+            data = msgpack.unpackb(f.read())
+        return ContextItem(
+            data,
+            item.dependencies,
+            compressed=item.compressed,
+            codec=item.codec,
+            dictionary_id=item.dictionary_id,
+            raw_size=item.raw_size,
+            is_text=item.is_text,
+            fingerprint=item.fingerprint
+        )
+
+    def get_view(self, key: str) -> Optional[memoryview]:
+        """Read-only byte view of a str/bytes value without copying it"""
+        item = self.context.get(key)
+        if item is None:
+            return None
+        if item.compressed:
+            return self._decode(key, item).view()
+        if item.spill_path is not None:
+            item = self._load_spilled(item)
+        return item.view()
+
+    def get_chain(self, keys: List[str]) -> ContextView:
+        """Get the context needed for a set of keys, following every
+        transitive dependency. Values are only read when looked up."""
+        lineages = [self.lineage(key) for key in keys]
+        if len(lineages) == 1:
+            return ContextView(self, lineages[0])
+        return ContextView(self, frozenset().union(*lineages))
+
+    def lineage(self, key: str) -> FrozenSet[str]:
+        """``key`` and every key it transitively depends on (cached)"""
+        cached = self._lineage.get(key)
+        if cached is not None:
+            return cached
+
+        seen = {key}
+        stack = [key]
+        while stack:
+            current = stack.pop()
+            for dep in self.dependency_graph.get(current, ()):
+                if dep in seen:
+                    continue
+                known = self._lineage.get(dep)
+                if known is not None:
+                    # Already closed over, no need to walk below it
+                    seen |= known
+                else:
+                    seen.add(dep)
+                    stack.append(dep)
+        result = frozenset(seen)
+        self._lineage[key] = result
+        return result
+
+    def _set_dependencies(self, key: str, dependencies: Sequence[str]) -> None:
+        """Update both edge directions and drop lineages that included key"""
+        for dep in self.dependency_graph.get(key, ()):
+            dependents = self._dependents.get(dep)
+            if dependents is not None:
+                dependents.discard(key)
+        self.dependency_graph[key] = list(dependencies)
+        for dep in dependencies:
+            self._dependents.setdefault(dep, set()).add(key)
+
+        stack = [key]
+        invalidated = {key}
+        while stack:
+            current = stack.pop()
+            self._lineage.pop(current, None)
+            for dependent in self._dependents.get(current, ()):
+                if dependent not in invalidated:
+                    invalidated.add(dependent)
+                    stack.append(dependent)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Raw versus stored payload sizes, per key and in total"""
+        keys = {
+            key: {
+                "raw_bytes": item.nbytes,
+                "stored_bytes": item.stored_bytes,
+                "compressed": item.compressed,
+                "codec": item.codec,
+                "spilled": item.spill_path is not None
+            }
+            for key, item in self.context.items()
+        }
+        return {
+            "keys": keys,
+            "raw_bytes": sum(stats["raw_bytes"] for stats in keys.values()),
+            "stored_bytes": sum(stats["stored_bytes"] for stats in keys.values()),
+            "resident_bytes": self.resident_bytes,
+            "decompressions": self.decompressions,
+            "decoded_cache_hits": self.decoded_cache_hits,
+            "dictionaries": len(self._dictionaries)
+        }
+
+    def export_item(self, key: str) -> Optional[Dict[str, Any]]:
+        """A stored value as plain data, for checkpointing.
+
+        Compressed payloads are returned as stored, so they are neither
+        decompressed nor recompressed on the way to disk and back.
+        """
+        item = self.context.get(key)
+        if item is None:
+            return None
+        if item.spill_path is not None:
+            item = self._load_spilled(item)
+        return {
+            "data": item.data,
+            "dependencies": list(item.dependencies),
+            "compressed": item.compressed,
+            "codec": item.codec,
+            "dictionary_id": item.dictionary_id,
+            "raw_size": item.raw_size,
+            "is_text": item.is_text,
+            "fingerprint": item.fingerprint
+        }
+
+    def import_item(self, key: str, record: Dict[str, Any]) -> None:
+        """Store a value produced by export_item; a dictionary it was
+        compressed with must already be loaded under ``dictionary_id``"""
+        self._set_dependencies(key, record["dependencies"])
+        self._discard(key)
+        item = ContextItem(
+            record["data"],
+            record["dependencies"],
+            compressed=record["compressed"],
+            codec=record["codec"],
+            dictionary_id=record["dictionary_id"],
+            raw_size=record["raw_size"],
+            is_text=record["is_text"],
+            fingerprint=record.get("fingerprint")
+        )
+        self.context[key] = item
+        self.resident_bytes += item.stored_bytes
+
+    def dictionaries(self) -> List[bytes]:
+        """Every compression dictionary in use, indexed by dictionary_id"""
+        return [
+            dictionary if isinstance(dictionary, bytes) else dictionary.as_bytes()
+            for dictionary in self._dictionaries
+        ]
+
+    def add_dictionary(self, dictionary: bytes, codec: str) -> int:
+        """Load a dictionary unless an identical one is loaded; returns its id"""
+        for index, existing in enumerate(self.dictionaries()):
+            if existing == dictionary:
+                return index
+        self._dictionaries.append(self._load_dictionary(dictionary, codec))
+        return len(self._dictionaries) - 1
+
+    def export_dictionary(self) -> Optional[bytes]:
+        """Latest trained dictionary, to seed CompressionPolicy(dictionary=...)"""
+        if not self._dictionaries:
+            return None
+        dictionary = self._dictionaries[-1]
+        return dictionary if isinstance(dictionary, bytes) else dictionary.as_bytes()
+
+    def _compress(self, data: Any, dependencies: Sequence[str]) -> Optional[ContextItem]:
+        policy = self.compression
+        is_text = isinstance(data, str)
+        if is_text:
+            # UTF-8 is never shorter than the character count
+            if len(data) < policy.threshold:
+                return None
+            raw = data.encode("utf-8")
+        elif isinstance(data, (bytes, bytearray, memoryview)):
+            raw = bytes(data)
+        else:
+            return None
+
+        level = policy.level_for(len(raw))
+        if level is None:
+            return None
+        dictionary_id = len(self._dictionaries) - 1 if self._dictionaries else None
+        dictionary = self._dictionaries[-1] if self._dictionaries else None
+        payload = _compress(policy.codec, level, raw, dictionary)
+        self._observe(raw)
+        if len(payload) >= len(raw):
+            return None
+        return ContextItem(
+            payload,
+            dependencies,
+            compressed=True,
+            codec=policy.codec,
+            dictionary_id=dictionary_id,
+            raw_size=len(raw),
+            is_text=is_text
+        )
+
+    def _decode(self, key: str, item: ContextItem) -> ContextItem:
+        """Decompressed copy of the compressed item stored under ``key``.
+
+        Copies are cached per stored item, so both the value and its byte
+        view are reused until the key is replaced.
+        """
+        cached = self._decoded.get(key)
+        if cached is not None and cached[0] is item:
+            self._decoded.move_to_end(key)
+            self.decoded_cache_hits += 1
+            return cached[1]
+
+        stored = item
+        if item.spill_path is not None:
+            item = self._load_spilled(item)
+        decoded = self._decompress_item(item)
+        cache_size = self.compression.decoded_cache_size if self.compression else 0
+        if cache_size > 0:
+            self._decoded[key] = (stored, decoded)
+            while len(self._decoded) > cache_size:
+                self._decoded.popitem(last=False)
+        return decoded
+
+    def _decompress_item(self, item: ContextItem) -> ContextItem:
+        dictionary = None
+        if item.dictionary_id is not None:
+            dictionary = self._dictionaries[item.dictionary_id]
+        raw = _decompress(item.codec, item.data, dictionary)
+        self.decompressions += 1
+        if not item.is_text:
+            return ContextItem(raw, item.dependencies, fingerprint=item.fingerprint)
+        decoded = ContextItem(
+            raw.decode("utf-8"), item.dependencies, fingerprint=item.fingerprint
+        )
+        # The decompressed bytes already are the text's UTF-8 view
+        decoded._buffer = raw
+        return decoded
+
+    def _observe(self, raw: bytes) -> None:
+        """Collect samples and train the shared dictionary once enough exist"""
+        policy = self.compression
+        if not policy.dictionary_size or self._dictionaries:
+            return
+        self._samples.append(raw[:policy.dictionary_size])
+        if len(self._samples) >= policy.dictionary_samples:
+            self._dictionaries.append(self._train_dictionary(self._samples))
+            self._samples = []
+
+    def _train_dictionary(self, samples: List[bytes]) -> Any:
+        size = self.compression.dictionary_size
+        if self.compression.codec == "zstd":
+            try:
+                return zstandard.train_dictionary(size, samples)
+            except zstandard.ZstdError:
+                # Too little sample data to train on; use it verbatim
+                pass
+        # zlib dictionaries are raw content, most useful material last
+        return self._load_dictionary(b"".join(samples)[-size:])
+
+    def _load_dictionary(self, dictionary: bytes, codec: Optional[str] = None) -> Any:
+        if (codec or self.compression.codec) == "zstd":
+            return zstandard.ZstdCompressionDict(
+                dictionary, dict_type=zstandard.DICT_TYPE_AUTO
+            )
+        return dictionary
+
+def _compress(codec: str, level: int, raw: bytes, dictionary: Any) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level, dict_data=dictionary).compress(raw)
+    if dictionary is None:
+        return zlib.compress(raw, level)
+    compressor = zlib.compressobj(level, zdict=dictionary)
+    return compressor.compress(raw) + compressor.flush()
+
+def _decompress(codec: str, payload: bytes, dictionary: Any) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(payload)
+    if dictionary is None:
+        return zlib.decompress(payload)
+    decompressor = zlib.decompressobj(zdict=dictionary)
+    return decompressor.decompress(payload) + decompressor.flush()
+
+async def iter_segments(
+    pieces: AsyncIterable[str],
+    segment: str = "sentence"
+) -> AsyncIterator[str]:
+    """Re-cut streamed text into complete segments, each yielded as soon as
+    its end arrives; surrounding whitespace and blank segments are dropped"""
+    if segment not in SEGMENTS:
+        raise ValueError(f"Unknown segment '{segment}', expected one of {SEGMENTS}")
+    boundary = _SEGMENT_END[segment]
+    buffer = ""
+    async for piece in pieces:
+        buffer += piece
+        start = 0
+        for match in boundary.finditer(buffer):
+            # A boundary at the very end may still grow ("..." or more space)
+            if match.end() == len(buffer) and segment == "sentence":
+                break
+            text = buffer[start:match.end()].strip()
+            start = match.end()
+            if text:
+                yield _check_segment(text, segment)
+        buffer = buffer[start:]
+    text = buffer.strip()
+    if text:
+        yield _check_segment(text, segment)
+
+def _check_segment(text: str, segment: str) -> str:
+    if segment == "jsonl":
+        try:
+            json.loads(text)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON Lines record: {text[:80]!r}") from e
+    return text
@@ -1,54 +1,650 @@
-from .context import OptimizedContextManager
+from ..utils.rate_limit import RateLimiter
+from ..utils.retry import DeadlineExceeded, RetryPolicy, remaining_time, run_deadline
+from ..utils.serialization import Checkpoint
+from .context import ContextItem, OptimizedContextManager
 from .prompts import EnhancedPromptTemplate, FewShotExample
-from .nodes import BaseNode
+from .nodes import BaseNode, IncrementalNode, check_overflow_strategy
 from .token_tracker import TokenTracker
-from typing import Dict, List, Any
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import (
+    Any, AsyncGenerator, AsyncIterable, AsyncIterator, Callable, Container, Dict,
+    FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple, Union
+)
 import asyncio
+import heapq
+import uuid
+
+# "pipelined" schedules like "dag", but an IncrementalNode starts as soon as
+# the node producing its stream_key starts, consuming that output as it grows
+EXECUTION_MODES = ("linear", "dag", "pipelined")
+
+@dataclass
+class RunStats:
+    """Measurements of a single chain execution"""
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    peak_context_bytes: int = 0
+    evicted: List[str] = field(default_factory=list)
+    spilled: List[str] = field(default_factory=list)
+    # Nodes whose output was reused from a checkpoint or an unchanged input
+    skipped: List[str] = field(default_factory=list)
+
+@dataclass
+class StreamEvent:
+    """One step of a streamed execution (see ChainEngine.stream).
+
+    ``type`` is "node_start", "token", "node_end" or "chain_end".
+    """
+    type: str
+    node_id: Optional[str] = None
+    data: Any = None
+
+class ExecutionPlan:
+    """The node graph of a chain, resolved once and shared by every run.
+
+    Holds the nodes in dependency order (insertion order wherever the
+    dependencies allow it), each node's input keys and the nodes producing
+    them, the keys the chain needs as inputs and how many nodes read each
+    key. Building a plan raises ValueError if two nodes produce the same key
+    or the nodes depend on each other in a cycle.
+    """
+
+    def __init__(self, nodes: Sequence[BaseNode]):
+        self.nodes: Tuple[BaseNode, ...] = tuple(nodes)
+        self.producers: Dict[str, BaseNode] = {}
+        for node in self.nodes:
+            if node.output_key in self.producers:
+                raise ValueError(
+                    f"Output key '{node.output_key}' is produced by both "
+                    f"'{self.producers[node.output_key].id}' and '{node.id}'"
+                )
+            self.producers[node.output_key] = node
+        self.output_keys: Tuple[str, ...] = tuple(self.producers)
+        self.inputs: Dict[BaseNode, Tuple[str, ...]] = {
+            node: tuple(node.input_keys) for node in self.nodes
+        }
+        # Keys no node produces; every run must be given them
+        self.required_inputs: Tuple[str, ...] = tuple(dict.fromkeys(
+            key for node in self.nodes for key in node.input_keys
+            if key not in self.producers
+        ))
+        self.consumers = Counter(key for node in self.nodes for key in node.input_keys)
+
+        self.dependencies: Dict[BaseNode, Tuple[BaseNode, ...]] = {}
+        # In pipelined mode an IncrementalNode doesn't wait for its stream
+        self.pipelined_dependencies: Dict[BaseNode, Tuple[BaseNode, ...]] = {}
+        for node in self.nodes:
+            deps = tuple(dict.fromkeys(
+                self.producers[key] for key in node.input_keys
+                if key in self.producers and self.producers[key] is not node
+            ))
+            self.dependencies[node] = deps
+            if isinstance(node, IncrementalNode):
+                deps = tuple(
+                    dep for dep in deps if dep.output_key != node.stream_key
+                )
+            self.pipelined_dependencies[node] = deps
+        self.order: Tuple[BaseNode, ...] = self._topological_order()
+
+    def _topological_order(self) -> Tuple[BaseNode, ...]:
+        # Kahn's algorithm, taking the earliest added ready node first;
+        # anything left unvisited sits on a cycle
+        position = {node: index for index, node in enumerate(self.nodes)}
+        pending = {node: len(deps) for node, deps in self.dependencies.items()}
+        dependents: Dict[BaseNode, List[BaseNode]] = {node: [] for node in self.nodes}
+        for node, deps in self.dependencies.items():
+            for dep in deps:
+                dependents[dep].append(node)
+        ready = [position[node] for node, count in pending.items() if count == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            current = self.nodes[heapq.heappop(ready)]
+            order.append(current)
+            for child in dependents[current]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    heapq.heappush(ready, position[child])
+        if len(order) != len(self.nodes):
+            cyclic = [node.id for node, count in pending.items() if count > 0]
+            raise ValueError(f"Dependency cycle between nodes: {cyclic}")
+        return tuple(order)
+
+    def missing_inputs(self, available: Container[str]) -> List[str]:
+        """Required inputs not among ``available``"""
+        return [key for key in self.required_inputs if key not in available]
+
+class _Run:
+    """State threaded through one execution of the chain.
+
+    Keys are reference-counted by the nodes still due to read them and
+    released as soon as the count drops to zero: evicted, or spilled to disk
+    when ``keep_intermediates`` is set. When the caller names the ``outputs``
+    it wants, every other key is released. Otherwise every value is
+    returned, so only intermediate node outputs are released, and evicted
+    ones are held aside as stored until the result is built. ``keep_values``
+    releases nothing without ``outputs``, for incremental engines that reuse
+    earlier outputs.
+    """
+
+    def __init__(
+        self,
+        plan: ExecutionPlan,
+        context: OptimizedContextManager,
+        enable_few_shot: bool,
+        outputs: Optional[List[str]] = None,
+        keep_intermediates: bool = False,
+        emit: Optional[Callable[[StreamEvent], None]] = None,
+        deadline: Optional[float] = None,
+        checkpoint: Optional[Checkpoint] = None,
+        restored: FrozenSet[str] = frozenset(),
+        keep_values: bool = False
+    ):
+        self.plan = plan
+        self.context = context
+        self.enable_few_shot = enable_few_shot
+        self.outputs = outputs
+        self.keep_intermediates = keep_intermediates
+        self.emit = emit
+        self.deadline = deadline
+        self.checkpoint = checkpoint
+        # Keys loaded from a checkpoint; nodes producing them are skipped
+        self.restored = restored
+        self.stats = RunStats()
+        self.consumers: Optional[Counter] = None
+        if outputs is not None or not keep_values:
+            self.consumers = plan.consumers.copy()
+        # Values evicted from the context that the result still returns
+        self.held: Dict[str, ContextItem] = {}
+        self._held_bytes = 0
+
+    def record(self, key: str) -> None:
+        """Append a new value to the checkpoint before it can be released"""
+        if self.checkpoint is not None:
+            self.checkpoint.record(self.context, key)
+
+    def stored(self, key: str) -> None:
+        """Record a new value; release it at once if nothing will read it"""
+        self.stats.peak_context_bytes = max(
+            self.stats.peak_context_bytes,
+            self.context.resident_bytes + self._held_bytes
+        )
+        if (
+            self.outputs is not None
+            and self.consumers is not None
+            and self.consumers[key] == 0
+        ):
+            self._release(key)
+
+    def consumed(self, node: BaseNode) -> None:
+        """Drop the node's claim on its inputs"""
+        if self.consumers is None:
+            return
+        for key in self.plan.inputs[node]:
+            self.consumers[key] -= 1
+            if self.consumers[key] == 0:
+                self._release(key)
+
+    def value(self, key: str) -> Any:
+        """A value of this run, whether in the context or held aside"""
+        item = self.held.get(key)
+        if item is not None:
+            return self.context.read_item(item)
+        return self.context.get_context(key)
+
+    def _release(self, key: str) -> None:
+        if key not in self.context.context:
+            return
+        if self.outputs is None:
+            if key not in self.plan.producers:
+                return
+        elif key in self.outputs:
+            return
+        if self.keep_intermediates:
+            if self.context.spill(key):
+                self.stats.spilled.append(key)
+            return
+        if self.outputs is None:
+            item = self.context.detach(key)
+            if item is not None:
+                self.held[key] = item
+                self._held_bytes += item.stored_bytes
+        else:
+            self.context.remove(key)
+        self.stats.evicted.append(key)
 
 class ChainEngine:
-    def __init__(self, mode: str = "linear"):
+    def __init__(
+        self,
+        mode: str = "linear",
+        overflow_strategy: Optional[str] = None,
+        rate_limiters: Optional[Dict[str, RateLimiter]] = None,
+        retry_policies: Optional[Dict[str, RetryPolicy]] = None,
+        incremental: bool = False
+    ):
+        if mode not in EXECUTION_MODES:
+            raise ValueError(
+                f"Unknown execution mode '{mode}', expected one of {EXECUTION_MODES}"
+            )
+        check_overflow_strategy(overflow_strategy)
         self.mode = mode
+        # Applied to nodes with a max_prompt_tokens budget but no strategy
+        self.overflow_strategy = overflow_strategy
+        # One limiter and retry policy per LLM backend, shared by every node
+        # calling it
+        self.rate_limiters = rate_limiters or {}
+        self.retry_policies = retry_policies or {}
+        # Outputs are stored with a fingerprint of the node and its inputs;
+        # when set, a node whose fingerprint is unchanged isn't run again
+        self.incremental = incremental
         self.nodes: List[BaseNode] = []
+        self._producers: Dict[str, BaseNode] = {}
+        self._plan: Optional[ExecutionPlan] = None
         self.context = OptimizedContextManager()
         self.token_tracker = TokenTracker()
-        
+        self.last_run_stats: Optional[RunStats] = None
+
     def add_node(self, node: BaseNode):
         """Add a node to the execution chain"""
+        if node.rate_limiter is None:
+            node.rate_limiter = self.rate_limiters.get(node.backend)
+        if node.retry_policy is None:
+            node.retry_policy = self.retry_policies.get(node.backend)
+        existing = self._producers.get(node.output_key)
+        if existing is not None:
+            raise ValueError(
+                f"Output key '{node.output_key}' is already produced by "
+                f"'{existing.id}'"
+            )
+        self._producers[node.output_key] = node
         self.nodes.append(node)
-        
+        self._plan = None
+
+    def compile(self) -> ExecutionPlan:
+        """Resolve and validate the node graph.
+
+        The plan is cached and reused by every run until the next
+        ``add_node``; call this after building the chain to surface cycles
+        early. Nodes changed in place (their keys) need ``add_node`` or a
+        fresh engine to be picked up.
+        """
+        if self._plan is None:
+            self._plan = ExecutionPlan(self.nodes)
+        return self._plan
+
     async def execute(
         self,
         initial_inputs: Dict[str, Any],
-        enable_few_shot: bool = True
+        enable_few_shot: bool = True,
+        outputs: Optional[List[str]] = None,
+        keep_intermediates: bool = False,
+        deadline: Optional[float] = None,
+        checkpoint: Optional[Checkpoint] = None
+    ) -> Dict[str, Any]:
+        """Run the chain against the engine's context.
+
+        By default every input and node output is returned, and node outputs
+        that other nodes read leave the context once the last of them is done
+        (incremental engines keep them to reuse). Naming the wanted
+        ``outputs`` returns just those and frees every other value once no
+        remaining node reads it. With ``keep_intermediates`` freed values are
+        spilled to disk instead of dropped. A run still going after
+        ``deadline`` seconds is cancelled with DeadlineExceeded, and retries
+        inside it give up as soon as they can't finish in time. With a
+        ``checkpoint`` every input and node output is appended to it as soon
+        as it is stored, so the run can be continued with ``resume``.
+        """
+        run = _Run(
+            self.compile(), self.context, enable_few_shot, outputs, keep_intermediates,
+            deadline=deadline, checkpoint=checkpoint, keep_values=self.incremental
+        )
+        self.last_run_stats = run.stats
+        return await self._execute_run(run, initial_inputs)
+
+    async def resume(
+        self,
+        checkpoint: Checkpoint,
+        initial_inputs: Optional[Dict[str, Any]] = None,
+        enable_few_shot: bool = True,
+        outputs: Optional[List[str]] = None,
+        keep_intermediates: bool = False,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Continue a run that was checkpointed by ``execute``.
+
+        Values in the checkpoint are loaded into the engine's context and
+        nodes whose output is among them are skipped; the rest run as usual
+        and are appended to the same checkpoint. ``initial_inputs`` is only
+        needed for inputs the checkpoint lacks.
+        """
+        checkpoint.load(self.context)
+        run = _Run(
+            self.compile(), self.context, enable_few_shot, outputs, keep_intermediates,
+            deadline=deadline, checkpoint=checkpoint,
+            restored=frozenset(checkpoint.keys), keep_values=self.incremental
+        )
+        self.last_run_stats = run.stats
+        return await self._execute_run(run, initial_inputs or {})
+
+    async def stream(
+        self,
+        initial_inputs: Dict[str, Any],
+        enable_few_shot: bool = True,
+        outputs: Optional[List[str]] = None,
+        keep_intermediates: bool = False,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[StreamEvent]:
+        """Run the chain like ``execute``, yielding events while it runs.
+
+        Every node emits "node_start", then "token" events carrying pieces of
+        its response, then "node_end" carrying its output. Nodes with a
+        ``_stream_llm`` emit tokens as the LLM produces them; others emit the
+        whole response as one token. The last event is "chain_end" with the
+        result ``execute`` would have returned. Closing the generator early
+        cancels the run.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        run = _Run(
+            self.compile(), self.context, enable_few_shot, outputs, keep_intermediates,
+            emit=queue.put_nowait,
+            deadline=deadline,
+            keep_values=self.incremental
+        )
+        self.last_run_stats = run.stats
+        task = asyncio.ensure_future(self._execute_run(run, initial_inputs))
+        # Queued after every event the run emitted
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+            result = task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        yield StreamEvent("chain_end", data=result)
+
+    async def execute_many(
+        self,
+        inputs: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+        max_concurrency: int = 8,
+        enable_few_shot: bool = True,
+        return_exceptions: bool = False,
+        outputs: Optional[List[str]] = None,
+        deadline: Optional[float] = None,
+        run_stats: Optional[Dict[int, RunStats]] = None
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """Run the chain over many inputs, yielding (index, result) as runs finish.
+
+        Every run gets its own context, so runs never see each other's values.
+        At most ``max_concurrency`` runs are in flight and the next input is only
+        pulled once a slot frees up, so a slow consumer throttles the producer.
+        With ``return_exceptions`` a failed run yields its exception instead of
+        aborting the whole batch. ``outputs`` works as in ``execute``, and
+        ``deadline`` bounds each run separately. Pass a dict as ``run_stats`` to
+        collect each run's RunStats under its index, failed runs included; an
+        entry is in place before its result is yielded.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        plan = self.compile()
+
+        async def run_one(index: int, initial_inputs: Dict[str, Any]) -> Tuple[int, Any]:
+            run = _Run(
+                plan, OptimizedContextManager(), enable_few_shot, outputs,
+                deadline=deadline
+            )
+            if run_stats is not None:
+                run_stats[index] = run.stats
+            try:
+                result = await self._execute_run(run, initial_inputs)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return index, e
+            return index, result
+
+        source = _aiter_inputs(inputs)
+        pending: Set[asyncio.Task] = set()
+        ready: List[asyncio.Task] = []
+        index = 0
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < max_concurrency:
+                    try:
+                        initial_inputs = await source.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.create_task(run_one(index, initial_inputs)))
+                    index += 1
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                ready = list(done)
+                while ready:
+                    yield ready.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
+            # Also retrieve finished runs that were never yielded, such as a
+            # second failure in the same batch, so their errors aren't lost
+            await asyncio.gather(*ready, *pending, return_exceptions=True)
+            await source.aclose()
+
+    async def _execute_run(
+        self,
+        run: _Run,
+        initial_inputs: Dict[str, Any]
     ) -> Dict[str, Any]:
+        if run.deadline is None:
+            return await self._run_chain(run, initial_inputs)
+        # Retry policies read the deadline from the context of every task
+        # the run starts
+        with run_deadline(run.deadline):
+            try:
+                return await asyncio.wait_for(
+                    self._run_chain(run, initial_inputs), run.deadline
+                )
+            except DeadlineExceeded:
+                raise
+            except asyncio.TimeoutError as e:
+                if remaining_time() > 0:
+                    raise
+                raise DeadlineExceeded(
+                    f"Run {run.stats.run_id} exceeded its {run.deadline}s deadline"
+                ) from e
+
+    async def _run_chain(
+        self,
+        run: _Run,
+        initial_inputs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        context = run.context
+        plan = run.plan
         # Initialize context with input data
         for key, value in initial_inputs.items():
-            self.context.add_context(key, value)
-        
-        for node in self.nodes:
-            # Get minimal required context
-            required_context = {}
-            for key in node.input_keys:
-                required_context[key] = self.context.get_context(key)
-            
-            # Execute with few-shot learning
-            result = await node.execute(
-                context=required_context,
-                enable_few_shot=enable_few_shot
-            )
-            
-            # Store optimized context
-            self.context.add_context(
-                key=node.output_key,
-                data=result[node.output_key],
-                dependencies=node.input_keys,
-                compress=node.compress_output
-            )
-            
+            context.add_context(key, value)
+            run.record(key)
+            run.stored(key)
+        input_keys = list(initial_inputs)
+        for key in run.restored:
+            if key not in plan.producers and key not in initial_inputs:
+                input_keys.append(key)
+                run.stored(key)
+        # Values kept from earlier runs on this context count as given
+        missing = plan.missing_inputs(context.context)
+        if missing:
+            raise ValueError(f"Missing chain inputs: {missing}")
+
+        if self.mode in ("dag", "pipelined"):
+            await self._execute_dag(run)
+        else:
+            for node in plan.order:
+                await self._run_node(node, run)
+
+        if run.outputs is not None:
+            return {key: context.get_context(key) for key in run.outputs}
+
         # Return all node outputs
         result = {}
-        for key in initial_inputs:
-            result[key] = self.context.get_context(key)
-        for node in self.nodes:
-            result[node.output_key] = self.context.get_context(node.output_key)
-        return result
\ No newline at end of file
+        for key in input_keys:
+            result[key] = run.value(key)
+        for key in plan.output_keys:
+            result[key] = run.value(key)
+        return result
+
+    async def _run_node(self, node: BaseNode, run: _Run) -> None:
+        """Execute a single node against the context and store its output"""
+        context = run.context
+        if node.output_key in run.restored:
+            self._reuse_output(node, run)
+            return
+        options: Dict[str, Any] = {}
+        # Read an upstream output that is still being generated as a stream
+        stream = None
+        if isinstance(node, IncrementalNode):
+            stream = context.get_stream(node.stream_key)
+            if stream is not None:
+                options["stream"] = stream
+
+        # Get minimal required context
+        required_context = {}
+        for key in run.plan.inputs[node]:
+            if stream is not None and key == node.stream_key:
+                continue
+            required_context[key] = context.get_context(key)
+
+        # Inputs still streaming in can't be fingerprinted up front
+        fingerprint = None
+        if stream is None:
+            fingerprint = node.fingerprint(required_context, run.enable_few_shot)
+            if (
+                self.incremental
+                and context.get_fingerprint(node.output_key) == fingerprint
+            ):
+                self._reuse_output(node, run)
+                return
+
+        # Execute with few-shot learning
+        output_stream = context.get_stream(node.output_key)
+        if run.emit is not None:
+            run.emit(StreamEvent("node_start", node.id))
+        if run.emit is not None or output_stream is not None:
+            def on_token(token: str) -> None:
+                if output_stream is not None:
+                    output_stream.append(token)
+                if run.emit is not None:
+                    run.emit(StreamEvent("token", node.id, token))
+            options["on_token"] = on_token
+        result = await node.execute(
+            context=required_context,
+            enable_few_shot=run.enable_few_shot,
+            overflow_strategy=self.overflow_strategy,
+            **options
+        )
+
+        usage = result.get("_metadata", {}).get("usage")
+        if usage is not None:
+            self.token_tracker.add_usage(
+                usage["prompt_tokens"],
+                usage["completion_tokens"],
+                node_id=node.id,
+                model=usage["model"],
+                run_id=run.stats.run_id,
+                cached=usage["cached"],
+                coalesced=usage["coalesced"],
+                latency=usage["latency"]
+            )
+
+        # Store optimized context
+        context.add_context(
+            key=node.output_key,
+            data=result[node.output_key],
+            dependencies=node.input_keys,
+            compress=node.compress_output,
+            fingerprint=fingerprint
+        )
+        _finish_stream(context, node.output_key, result[node.output_key])
+        run.record(node.output_key)
+        run.stored(node.output_key)
+        run.consumed(node)
+        if run.emit is not None:
+            run.emit(StreamEvent("node_end", node.id, result[node.output_key]))
+
+    def _reuse_output(self, node: BaseNode, run: _Run) -> None:
+        """Keep the node's stored output instead of running it"""
+        context = run.context
+        run.stats.skipped.append(node.id)
+        value = context.get_context(node.output_key)
+        _finish_stream(context, node.output_key, value)
+        run.stored(node.output_key)
+        run.consumed(node)
+        if run.emit is not None:
+            run.emit(StreamEvent("node_end", node.id, value))
+
+    async def _execute_dag(self, run: _Run) -> None:
+        """Run nodes concurrently, starting each one once its inputs exist"""
+        plan = run.plan
+        loop = asyncio.get_running_loop()
+        finished = {node: loop.create_future() for node in plan.nodes}
+        pipelined = self.mode == "pipelined"
+        graph = plan.pipelined_dependencies if pipelined else plan.dependencies
+        if pipelined:
+            for key in plan.output_keys:
+                run.context.open_stream(key)
+
+        async def run_when_ready(node: BaseNode) -> None:
+            deps = graph[node]
+            if deps:
+                await asyncio.gather(*(finished[dep] for dep in deps))
+            await self._run_node(node, run)
+            finished[node].set_result(None)
+
+        tasks = [asyncio.create_task(run_when_ready(node)) for node in plan.order]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Dependents of a failed node would otherwise wait forever
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            if pipelined:
+                for key in plan.output_keys:
+                    run.context.close_stream(key)
+
+def _finish_stream(context: OptimizedContextManager, key: str, value: Any) -> None:
+    """Close the stream of a finished output, sending the whole value to
+    readers if nothing was streamed (reused or non-text outputs)"""
+    stream = context.get_stream(key)
+    if stream is None:
+        return
+    if not stream.pieces and value is not None:
+        stream.append(value if isinstance(value, str) else str(value))
+    context.close_stream(key)
+
+async def _aiter_inputs(
+    inputs: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Present sync and async input sources as one async iterator"""
+    if hasattr(inputs, "__aiter__"):
+        source = inputs.__aiter__()
+        try:
+            async for item in source:
+                yield item
+        finally:
+            # Closing this iterator early closes the caller's as well
+            if hasattr(source, "aclose"):
+                await source.aclose()
+    else:
+        for item in inputs:
+            yield item
@@ -0,0 +1,182 @@
+from typing import Callable, List, Optional, Tuple
+import hashlib
+import re
+import zlib
+import numpy as np
+from .prompts import FewShotExample, render_example
+from .tokenizer import get_token_counter
+
+_WORD = re.compile(r"\w+")
+
+class SimilarityExampleSelector:
+    """Pick the few-shot examples most similar to the current input.
+
+    Example inputs are indexed once into an L2-normalised TF-IDF matrix over
+    hashed word n-grams, stored column-major (CSC) so a query only touches the
+    postings of its own n-grams. Each call greedily takes the best ``k``
+    examples whose rendered size fits within ``token_budget``, so prompt size
+    stays flat however large the bank grows.
+    """
+
+    def __init__(
+        self,
+        examples: List[FewShotExample],
+        k: int = 4,
+        token_budget: Optional[int] = None,
+        ngram_range: Tuple[int, int] = (1, 2),
+        n_features: int = 2 ** 12,
+        token_counter: Optional[Callable[[str], int]] = None
+    ):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.k = k
+        self.token_budget = token_budget
+        self.ngram_range = ngram_range
+        self.n_features = n_features
+        # Costs are only needed under a budget; resolved on first use
+        self._token_counter = token_counter
+        self.examples: List[FewShotExample] = []
+        self._rendered: List[str] = []
+        self._costs: Optional[np.ndarray] = None
+        self._grams: List[np.ndarray] = []
+        self._document_frequency = np.zeros(n_features, dtype=np.int64)
+        self._fingerprint: Optional[str] = None
+        self.add_examples(examples)
+
+    def add_examples(self, examples: List[FewShotExample]) -> None:
+        """Index more examples; IDF weights are recomputed for the whole bank"""
+        examples = list(examples)
+        rendered = [render_example(ex) for ex in examples]
+        for example in examples:
+            grams = self._hash_ngrams(example.input)
+            self._grams.append(grams)
+            self._document_frequency[np.unique(grams)] += 1
+
+        self.examples.extend(examples)
+        self._rendered.extend(rendered)
+        self._fingerprint = None
+        self._reindex()
+
+    @property
+    def token_counter(self) -> Callable[[str], int]:
+        if self._token_counter is None:
+            self._token_counter = get_token_counter().count
+        return self._token_counter
+
+    @token_counter.setter
+    def token_counter(self, token_counter: Optional[Callable[[str], int]]) -> None:
+        self._token_counter = token_counter
+        self._costs = None
+
+    def _example_costs(self) -> np.ndarray:
+        """Token count of every rendered example, measured when first needed"""
+        known = self._costs if self._costs is not None else np.zeros(0, dtype=np.int64)
+        if len(known) < len(self._rendered):
+            new = [self.token_counter(text) for text in self._rendered[len(known):]]
+            known = np.concatenate([known, np.array(new, dtype=np.int64)])
+        self._costs = known
+        return known
+
+    def fingerprint(self) -> str:
+        """Digest of the example bank and selection settings"""
+        if self._fingerprint is None:
+            digest = hashlib.sha256(
+                repr((self.k, self.token_budget, self.ngram_range, self.n_features))
+                .encode("utf-8")
+            )
+            for rendered in self._rendered:
+                digest.update(rendered.encode("utf-8"))
+                digest.update(b"\0")
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def _reindex(self) -> None:
+        n_docs = len(self._grams)
+        n_features = self.n_features
+        self._idf = (
+            np.log((1.0 + n_docs) / (1.0 + self._document_frequency)) + 1.0
+        ).astype(np.float32)
+
+        # Collapse (row, n-gram) occurrences into term counts
+        rows = np.repeat(
+            np.arange(n_docs, dtype=np.int64), [len(g) for g in self._grams]
+        )
+        cols = np.concatenate(self._grams) if n_docs else np.zeros(0, np.int64)
+        cells, counts = np.unique(rows * n_features + cols, return_counts=True)
+        rows, cols = np.divmod(cells, n_features)
+
+        weights = counts.astype(np.float32) * self._idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n_docs))
+        norms[norms == 0] = 1.0
+        weights /= norms[rows].astype(np.float32)
+
+        order = np.argsort(cols, kind="stable")
+        self._doc_ids = rows[order]
+        self._weights = weights[order]
+        self._indptr = np.zeros(n_features + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=n_features), out=self._indptr[1:])
+
+    def _scores(self, query: str) -> np.ndarray:
+        """Cosine similarity of the query against every indexed example"""
+        scores = np.zeros(len(self.examples), dtype=np.float32)
+        cols, counts = np.unique(self._hash_ngrams(query), return_counts=True)
+        if not len(cols):
+            return scores
+        query_weights = counts.astype(np.float32) * self._idf[cols]
+        query_weights /= np.linalg.norm(query_weights)
+        for col, weight in zip(cols, query_weights):
+            start, end = self._indptr[col], self._indptr[col + 1]
+            scores[self._doc_ids[start:end]] += weight * self._weights[start:end]
+        return scores
+
+    def _hash_ngrams(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        low, high = self.ngram_range
+        buckets = []
+        for n in range(low, high + 1):
+            for i in range(len(words) - n + 1):
+                gram = " ".join(words[i:i + n])
+                buckets.append(zlib.crc32(gram.encode("utf-8")) % self.n_features)
+        return np.array(buckets, dtype=np.int64)
+
+    def select_indices(self, query: str) -> List[int]:
+        """Indices of the chosen examples, most similar first"""
+        n_examples = len(self.examples)
+        if n_examples == 0:
+            return []
+        scores = self._scores(query)
+
+        # Only rank a shortlist; fall back to the full ordering when the
+        # budget rejects too many of the shortlisted examples
+        shortlist = min(n_examples, max(4 * self.k, 32))
+        if shortlist < n_examples:
+            candidates = np.argpartition(-scores, shortlist - 1)[:shortlist]
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        else:
+            order = np.argsort(-scores, kind="stable")
+
+        chosen = self._fill_budget(order)
+        if len(chosen) < self.k and len(order) < n_examples:
+            chosen = self._fill_budget(np.argsort(-scores, kind="stable"))
+        return chosen
+
+    def _fill_budget(self, order: np.ndarray) -> List[int]:
+        chosen: List[int] = []
+        remaining = self.token_budget
+        costs = self._example_costs() if remaining is not None else None
+        for index in order:
+            if remaining is not None:
+                cost = int(costs[index])
+                if cost > remaining:
+                    continue
+                remaining -= cost
+            chosen.append(int(index))
+            if len(chosen) == self.k:
+                break
+        return chosen
+
+    def select(self, query: str) -> List[FewShotExample]:
+        return [self.examples[i] for i in self.select_indices(query)]
+
+    def select_rendered(self, query: str) -> List[str]:
+        return [self._rendered[i] for i in self.select_indices(query)]
@@ -1,127 +1,324 @@
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
-import networkx as nx
+from typing import Dict, FrozenSet, Hashable, Iterable, Iterator, List, Optional, Any, Tuple, Union
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from itertools import repeat
+from numbers import Real
+import gc
+import sys
 from datetime import datetime
+import numpy as np
+from .adjacency import CSRAdjacency, DictAdjacency, Edge, Node
 
-@dataclass
-class Node:
-    id: str
-    type: str
-    content: Any
-    metadata: Dict[str, Any]
-    created_at: datetime
-    updated_at: datetime
-
-@dataclass
-class Edge:
-    source: str
-    target: str
-    type: str
-    metadata: Dict[str, Any]
-    created_at: datetime
+# "networkx" keeps dict adjacency with a networkx view in ``graph``; "csr"
+# keeps NumPy CSR arrays for large, traversal-heavy graphs
+BACKENDS = ("networkx", "csr")
 
 class KnowledgeGraph:
-    def __init__(self):
-        self.graph = nx.DiGraph()
+    """Typed nodes and edges with indexed lookups.
+
+    Nodes are indexed by type. Metadata keys named in ``indexed_keys`` (or
+    added later with ``create_index``) get a hash index from value to nodes,
+    used by ``query`` and by the range and prefix queries. Metadata is
+    indexed as nodes are added; to change it, add the node again.
+
+    Each node and edge is stored once, as a slotted record, and the
+    ``backend`` keeps the adjacency between them (see adjacency.py). With the
+    default "networkx" backend ``graph`` is a read-only networkx view over
+    that storage; with "csr" it is None.
+    """
+
+    def __init__(self, indexed_keys: Iterable[str] = (), backend: str = "networkx"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
         self.nodes: Dict[str, Node] = {}
+        if backend == "csr":
+            self._adjacency = CSRAdjacency()
+        else:
+            self._adjacency = DictAdjacency(self.nodes)
+        self.graph = self._adjacency.graph
         self.edge_types = set()
-        
+        # Type -> node ids, and metadata key -> value -> node ids; dicts
+        # keep ids in insertion order like self.nodes
+        self._by_type: Dict[str, Dict[str, None]] = {}
+        self._indexes: Dict[str, Dict[Hashable, Dict[str, None]]] = {}
+        # Node id -> the (key, value) pairs it was indexed under, so it can
+        # be unindexed after its metadata dict has been changed in place
+        self._indexed_values: Dict[str, Tuple[Tuple[str, Hashable], ...]] = {}
+        # (key, kind) -> sorted distinct values, built on first range or
+        # prefix query and kept sorted afterwards
+        self._sorted: Dict[Tuple[str, str], List[Any]] = {}
+        for key in indexed_keys:
+            self.create_index(key)
+
+    def create_index(self, key: str) -> None:
+        """Index the metadata ``key`` of existing and future nodes."""
+        if key in self._indexes:
+            return
+        self._indexes[key] = {}
+        for node in self.nodes.values():
+            self._index_value(key, node)
+
+    def _index(self, node: Node) -> None:
+        self._by_type.setdefault(node.type, {})[node.id] = None
+        for key in self._indexes:
+            self._index_value(key, node)
+
+    def _index_value(self, key: str, node: Node) -> None:
+        if key not in node.metadata:
+            return
+        value = node.metadata[key]
+        if not _hashable(value):
+            return
+        postings = self._indexes[key].get(value)
+        if postings is None:
+            postings = self._indexes[key][value] = {}
+            values = self._sorted.get((key, _kind(value)))
+            if values is not None:
+                insort(values, value)
+        postings[node.id] = None
+        self._indexed_values[node.id] = self._indexed_values.get(node.id, ()) + ((key, value),)
+
+    def _unindex(self, node: Node) -> None:
+        ids = self._by_type[node.type]
+        del ids[node.id]
+        if not ids:
+            del self._by_type[node.type]
+        for key, value in self._indexed_values.pop(node.id, ()):
+            index = self._indexes[key]
+            postings = index[value]
+            del postings[node.id]
+            if not postings:
+                del index[value]
+                values = self._sorted.get((key, _kind(value)))
+                if values is not None:
+                    values.pop(bisect_left(values, value))
+
     def add_node(self, node_id: str, node_type: str, content: Any, metadata: Optional[Dict[str, Any]] = None) -> None:
         """Add a node to the knowledge graph."""
         now = datetime.now()
         node = Node(
             id=node_id,
-            type=node_type,
+            type=sys.intern(node_type),
             content=content,
             metadata=metadata or {},
             created_at=now,
             updated_at=now
         )
-        self.nodes[node_id] = node
-        self.graph.add_node(node_id, **{
-            'type': node_type,
-            'content': content,
-            'metadata': metadata or {},
-            'created_at': now,
-            'updated_at': now
-        })
-        
+        if self._store_node(node):
+            self._adjacency.add_node(node_id)
+
+    def _store_node(self, node: Node) -> bool:
+        """Store and index ``node``; True if its id is new"""
+        previous = self.nodes.get(node.id)
+        if previous is not None:
+            self._unindex(previous)
+        self.nodes[node.id] = node
+        self._index(node)
+        return previous is None
+
+    def add_nodes_bulk(
+        self,
+        node_ids: Iterable[str],
+        node_types: Union[str, Iterable[str]],
+        contents: Optional[Iterable[Any]] = None,
+        metadata: Optional[Iterable[Optional[Dict[str, Any]]]] = None
+    ) -> None:
+        """Add many nodes at once, given as columns.
+
+        Each column is any iterable or NumPy array with one value per node;
+        ``node_types`` may also be one type for every node, and ``contents``
+        and ``metadata`` default to None and empty. The whole batch shares
+        one timestamp, and ids are added to the adjacency in one step. Later
+        duplicates replace earlier ones, as with ``add_node``.
+        """
+        node_ids = _column(node_ids)
+        count = len(node_ids)
+        types = _types_column(node_types, count)
+        types = repeat(types, count) if isinstance(types, str) else types
+        contents = repeat(None, count) if contents is None else _column(contents, count)
+        metadata = repeat(None, count) if metadata is None else _column(metadata, count)
+        now = datetime.now()
+        new_ids = []
+        with _gc_paused():
+            for node_id, node_type, content, meta in zip(node_ids, types, contents, metadata):
+                if self._store_node(Node(node_id, node_type, content, meta or {}, now, now)):
+                    new_ids.append(node_id)
+            self._adjacency.add_nodes(new_ids)
+
     def add_edge(self, source_id: str, target_id: str, edge_type: str, metadata: Optional[Dict[str, Any]] = None) -> None:
         """Add an edge between two nodes."""
         if source_id not in self.nodes or target_id not in self.nodes:
             raise ValueError("Source or target node does not exist")
-            
-        now = datetime.now()
+
+        # Reference the stored ids rather than keeping equal copies
+        source_id = self.nodes[source_id].id
+        target_id = self.nodes[target_id].id
         edge = Edge(
             source=source_id,
             target=target_id,
-            type=edge_type,
+            type=sys.intern(edge_type),
             metadata=metadata or {},
-            created_at=now
+            created_at=datetime.now()
         )
-        self.edge_types.add(edge_type)
-        self.graph.add_edge(source_id, target_id, **{
-            'type': edge_type,
-            'metadata': metadata or {},
-            'created_at': now
-        })
-        
+        self.edge_types.add(edge.type)
+        self._adjacency.add_edge(edge)
+
+    def add_edges_bulk(
+        self,
+        source_ids: Iterable[str],
+        target_ids: Iterable[str],
+        edge_types: Union[str, Iterable[str]],
+        metadata: Optional[Iterable[Optional[Dict[str, Any]]]] = None
+    ) -> None:
+        """Add many edges at once, given as columns like ``add_nodes_bulk``.
+
+        Every endpoint is checked before anything is added, so a batch with
+        a missing node raises ValueError and leaves the graph unchanged. The
+        batch shares one timestamp, and edges without metadata share one
+        read-only empty mapping.
+        """
+        source_ids = _column(source_ids)
+        count = len(source_ids)
+        target_ids = _column(target_ids, count)
+        types = _types_column(edge_types, count)
+        metadata = None if metadata is None else _column(metadata, count)
+        with _gc_paused():
+            self._adjacency.add_edges(source_ids, target_ids, types, metadata, datetime.now())
+        if count:
+            self.edge_types.update((types,) if isinstance(types, str) else types)
+
+    def get_edge(self, source_id: str, target_id: str) -> Optional[Edge]:
+        """Retrieve the edge from ``source_id`` to ``target_id``."""
+        return self._adjacency.get_edge(source_id, target_id)
+
+    def iter_edges(self) -> Iterator[Edge]:
+        """Every edge in the graph."""
+        return self._adjacency.iter_edges()
+
     def get_node(self, node_id: str) -> Optional[Node]:
         """Retrieve a node by its ID."""
         return self.nodes.get(node_id)
         
     def get_connected_nodes(self, node_id: str, direction: str = 'both') -> List[Node]:
         """Get nodes connected to a given node."""
+        if node_id not in self.nodes:
+            raise ValueError(f"Node '{node_id}' does not exist")
         if direction == 'in':
-            connected_ids = list(self.graph.predecessors(node_id))
-        elif direction == 'out':
-            connected_ids = list(self.graph.successors(node_id))
-        else:  # both
-            connected_ids = list(self.graph.neighbors(node_id))
+            connected_ids = self._adjacency.predecessors(node_id)
+        else:  # 'out', and 'both' as networkx's DiGraph.neighbors
+            connected_ids = self._adjacency.successors(node_id)
         return [self.nodes[node_id] for node_id in connected_ids]
         
     def query(self, query_type: str, **kwargs) -> List[Node]:
         """Query nodes based on type and metadata."""
+        candidates = self._by_type.get(query_type, {})
+        # Start from the smallest index posting list; the other conditions
+        # are checked on its nodes only
+        for key, value in kwargs.items():
+            # A None condition also matches nodes lacking the key
+            if key in self._indexes and value is not None and _hashable(value):
+                postings = self._indexes[key].get(value, {})
+                if len(postings) < len(candidates):
+                    candidates = postings
         results = []
-        for node_id, node in self.nodes.items():
+        for node_id in candidates:
+            node = self.nodes[node_id]
             if node.type == query_type:
                 if all(node.metadata.get(k) == v for k, v in kwargs.items()):
                     results.append(node)
         return results
+
+    def query_range(
+        self,
+        key: str,
+        low: Any = None,
+        high: Any = None,
+        node_type: Optional[str] = None
+    ) -> List[Node]:
+        """Nodes whose indexed ``key`` lies in [low, high], in value order.
+
+        Either bound may be None for an open range. Only values of the same
+        kind as the bounds (numbers or strings) are considered.
+        """
+        if low is None and high is None:
+            raise ValueError("query_range needs a low or a high bound")
+        values = self._sorted_values(key, low if low is not None else high)
+        start = 0 if low is None else bisect_left(values, low)
+        end = len(values) if high is None else bisect_right(values, high)
+        return self._collect(key, values[start:end], node_type)
+
+    def query_prefix(self, key: str, prefix: str, node_type: Optional[str] = None) -> List[Node]:
+        """Nodes whose indexed string ``key`` starts with ``prefix``."""
+        values = self._sorted_values(key, prefix)
+        start = bisect_left(values, prefix)
+        end = start
+        while end < len(values) and values[end].startswith(prefix):
+            end += 1
+        return self._collect(key, values[start:end], node_type)
+
+    def _sorted_values(self, key: str, bound: Any) -> List[Any]:
+        if key not in self._indexes:
+            raise ValueError(f"Metadata key '{key}' is not indexed; call create_index first")
+        kind = _kind(bound)
+        if kind is None:
+            raise ValueError("Range and prefix bounds must be numbers or strings")
+        values = self._sorted.get((key, kind))
+        if values is None:
+            values = self._sorted[(key, kind)] = sorted(
+                value for value in self._indexes[key] if _kind(value) == kind
+            )
+        return values
+
+    def _collect(self, key: str, values: List[Any], node_type: Optional[str]) -> List[Node]:
+        index = self._indexes[key]
+        results = []
+        for value in values:
+            for node_id in index[value]:
+                node = self.nodes[node_id]
+                if node_type is None or node.type == node_type:
+                    results.append(node)
+        return results
         
     def get_path(self, source_id: str, target_id: str) -> Optional[List[Node]]:
         """Find the shortest path between two nodes."""
-        try:
-            path = nx.shortest_path(self.graph, source_id, target_id)
-            return [self.nodes[node_id] for node_id in path]
-        except nx.NetworkXNoPath:
+        if source_id not in self.nodes or target_id not in self.nodes:
+            raise ValueError("Source or target node does not exist")
+        path = self._adjacency.shortest_path(source_id, target_id)
+        if path is None:
             return None
+        return [self.nodes[node_id] for node_id in path]
             
-    def get_subgraph(self, node_ids: List[str]) -> 'KnowledgeGraph':
-        """Create a subgraph containing only the specified nodes."""
-        subgraph = KnowledgeGraph()
-        for node_id in node_ids:
-            if node_id in self.nodes:
-                node = self.nodes[node_id]
-                subgraph.add_node(
-                    node_id=node.id,
-                    node_type=node.type,
-                    content=node.content,
-                    metadata=node.metadata
-                )
-                
-        # Add edges between nodes in the subgraph
-        for source_id in node_ids:
-            for target_id in node_ids:
-                if self.graph.has_edge(source_id, target_id):
-                    edge_data = self.graph.get_edge_data(source_id, target_id)
-                    subgraph.add_edge(
-                        source_id=source_id,
-                        target_id=target_id,
-                        edge_type=edge_data['type'],
-                        metadata=edge_data['metadata']
-                    )
-                    
+    def get_subgraph(
+        self,
+        node_ids: Iterable[str],
+        view: bool = False
+    ) -> Union['KnowledgeGraph', 'SubgraphView']:
+        """Create a subgraph containing only the specified nodes.
+
+        Only the out-edges of the selected nodes are scanned, and the copy
+        is filled through the bulk methods with the same backend and
+        indexed keys. With ``view=True`` nothing is copied: the returned
+        SubgraphView reads through to this graph.
+        """
+        selected = list(dict.fromkeys(node_id for node_id in node_ids if node_id in self.nodes))
+        if view:
+            return SubgraphView(self, frozenset(selected))
+        subgraph = KnowledgeGraph(indexed_keys=self._indexes, backend=self.backend)
+        nodes = [self.nodes[node_id] for node_id in selected]
+        subgraph.add_nodes_bulk(
+            selected,
+            [node.type for node in nodes],
+            [node.content for node in nodes],
+            [node.metadata for node in nodes]
+        )
+        edges = list(self._adjacency.subgraph_edges(selected))
+        subgraph.add_edges_bulk(
+            [edge.source for edge in edges],
+            [edge.target for edge in edges],
+            [edge.type for edge in edges],
+            [edge.metadata for edge in edges]
+        )
         return subgraph
         
     def merge(self, other: 'KnowledgeGraph') -> None:
@@ -135,12 +332,131 @@ class KnowledgeGraph:
                     metadata=node.metadata
                 )
                 
-        for edge in other.graph.edges(data=True):
-            source_id, target_id = edge[0], edge[1]
-            if not self.graph.has_edge(source_id, target_id):
+        for edge in other.iter_edges():
+            if self.get_edge(edge.source, edge.target) is None:
                 self.add_edge(
-                    source_id=source_id,
-                    target_id=target_id,
-                    edge_type=edge[2]['type'],
-                    metadata=edge[2]['metadata']
-                ) 
\ No newline at end of file
+                    source_id=edge.source,
+                    target_id=edge.target,
+                    edge_type=edge.type,
+                    metadata=edge.metadata
+                )
+
+class SubgraphView:
+    """Read-only view of a KnowledgeGraph restricted to a set of node ids.
+
+    Nodes and edges are read from the parent graph on each access, so the
+    view costs nothing to build and reflects later changes to the parent.
+    Use ``copy`` for an independent KnowledgeGraph.
+    """
+
+    __slots__ = ("_graph", "_ids")
+
+    def __init__(self, graph: KnowledgeGraph, node_ids: FrozenSet[str]):
+        self._graph = graph
+        self._ids = node_ids
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __repr__(self) -> str:
+        return f"SubgraphView({len(self._ids)} nodes)"
+
+    def get_node(self, node_id: str) -> Optional[Node]:
+        """Retrieve a node of the view by its ID."""
+        return self._graph.get_node(node_id) if node_id in self._ids else None
+
+    def get_edge(self, source_id: str, target_id: str) -> Optional[Edge]:
+        """Retrieve the edge from ``source_id`` to ``target_id``."""
+        if source_id not in self._ids or target_id not in self._ids:
+            return None
+        return self._graph.get_edge(source_id, target_id)
+
+    def iter_edges(self) -> Iterator[Edge]:
+        """Every edge between nodes of the view."""
+        return self._graph._adjacency.subgraph_edges(self._ids)
+
+    def get_connected_nodes(self, node_id: str, direction: str = 'both') -> List[Node]:
+        """Get nodes of the view connected to a given node."""
+        if node_id not in self._ids:
+            raise ValueError(f"Node '{node_id}' is not in the view")
+        return [
+            node for node in self._graph.get_connected_nodes(node_id, direction)
+            if node.id in self._ids
+        ]
+
+    def query(self, query_type: str, **kwargs) -> List[Node]:
+        """Query nodes of the view based on type and metadata."""
+        return [node for node in self._graph.query(query_type, **kwargs) if node.id in self._ids]
+
+    def get_path(self, source_id: str, target_id: str) -> Optional[List[Node]]:
+        """Find the shortest path between two nodes within the view."""
+        if source_id not in self._ids or target_id not in self._ids:
+            raise ValueError("Source or target node is not in the view")
+        successors = self._graph._adjacency.successors
+        parents = {source_id: None}
+        frontier = [source_id]
+        while frontier and target_id not in parents:
+            level = []
+            for node_id in frontier:
+                for neighbor in successors(node_id):
+                    if neighbor in self._ids and neighbor not in parents:
+                        parents[neighbor] = node_id
+                        level.append(neighbor)
+            frontier = level
+        if target_id not in parents:
+            return None
+        path = [target_id]
+        while parents[path[-1]] is not None:
+            path.append(parents[path[-1]])
+        return [self._graph.nodes[node_id] for node_id in reversed(path)]
+
+    def copy(self) -> KnowledgeGraph:
+        """The view's nodes and edges as an independent KnowledgeGraph."""
+        return self._graph.get_subgraph(self._ids)
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+def _kind(value: Any) -> Optional[str]:
+    """Which sorted value list ``value`` belongs to, if it is orderable"""
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, Real) and not isinstance(value, bool):
+        return "number"
+    return None
+
+def _column(values: Iterable[Any], count: Optional[int] = None) -> List[Any]:
+    """A bulk-load column as a list of Python values"""
+    # tolist() turns NumPy scalars (np.str_, np.int64) into str and int
+    column = values.tolist() if isinstance(values, np.ndarray) else list(values)
+    if count is not None and len(column) != count:
+        raise ValueError(f"Expected {count} values per column, got {len(column)}")
+    return column
+
+def _types_column(types: Union[str, Iterable[str]], count: int) -> Union[str, List[str]]:
+    """One interned type for every row, or an interned type per row"""
+    if isinstance(types, str):
+        return sys.intern(types)
+    return [sys.intern(t) for t in _column(types, count)]
+
+@contextmanager
+def _gc_paused():
+    """Pause the cyclic garbage collector, which bulk loads of millions of
+    acyclic records would otherwise trigger over and over"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
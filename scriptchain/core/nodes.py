@@ -1,42 +1,703 @@
-from typing import Dict, Any, List
+from dataclasses import dataclass, replace
+from typing import (
+    Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional,
+    Tuple, Union
+)
+import asyncio
+import hashlib
+import json
+import time
+import msgpack
+from ..utils.rate_limit import RateLimiter
+from ..utils.retry import RetryPolicy
+from .cache import ResponseCache, SingleFlight
+from .context import SEGMENTS, iter_segments
 from .prompts import EnhancedPromptTemplate
+from .tokenizer import PromptTooLargeError, TokenCounter, get_token_counter, iter_chunks
+
+_MISSING = object()
+
+# What to do when a prompt exceeds max_prompt_tokens: fail before sending it,
+# cut the tail of the largest text input, leave out the few-shot examples
+# (truncating as well if that isn't enough), or split the largest input and
+# call the LLM once per piece
+OVERFLOW_STRATEGIES = ("error", "truncate", "drop_examples", "chunk")
+
+def check_overflow_strategy(strategy: Optional[str]) -> None:
+    if strategy is not None and strategy not in OVERFLOW_STRATEGIES:
+        raise ValueError(
+            f"Unknown overflow strategy '{strategy}', "
+            f"expected one of {OVERFLOW_STRATEGIES}"
+        )
+
+@dataclass
+class LLMResponse:
+    """Return this from _call_llm instead of a bare value to report usage.
+
+    A node's ``_stream_llm`` may yield one as its last item to report usage
+    for the streamed response; its content is ignored there.
+    """
+    content: Any
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    model: Optional[str] = None
 
 class BaseNode:
+    """A single LLM step of a chain.
+
+    Subclasses implement ``async _call_llm(prompt)``. They may also implement
+    ``_stream_llm(prompt)`` as an async generator of text pieces, which is
+    used instead when the caller asks for tokens as they arrive.
+    """
+
     def __init__(
         self,
         node_id: str,
         prompt_template: EnhancedPromptTemplate,
         input_keys: List[str],
         output_key: str,
-        compress_output: bool = True
+        compress_output: bool = True,
+        cache: Optional[ResponseCache] = None,
+        model_params: Optional[Dict[str, Any]] = None,
+        coalesce_requests: bool = True,
+        max_prompt_tokens: Optional[int] = None,
+        overflow_strategy: Optional[str] = None,
+        token_counter: Optional[TokenCounter] = None,
+        backend: str = "default",
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None
     ):
+        check_overflow_strategy(overflow_strategy)
         self.id = node_id
         self.prompt_template = prompt_template
         self.input_keys = input_keys
         self.output_key = output_key
         self.compress_output = compress_output
-        
+        self.cache = cache
+        # Parameters that change the response for a given prompt (model,
+        # temperature, ...) and therefore belong in the cache key
+        self.model_params = model_params or {}
+        # Identical prompts issued concurrently share one LLM call
+        self.coalesce_requests = coalesce_requests
+        self._single_flight = SingleFlight()
+        # Prompts are measured locally before any call when a budget is set;
+        # a node-level strategy wins over the one the engine passes in
+        self.max_prompt_tokens = max_prompt_tokens
+        self.overflow_strategy = overflow_strategy
+        # Resolved on first use: only budgets, limiters and chunking count
+        self._token_counter = token_counter
+        # LLM calls share the limiter and retry policy of their backend;
+        # ChainEngine.add_node fills in whichever isn't given here
+        self.backend = backend
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+
+    @property
+    def token_counter(self) -> TokenCounter:
+        if self._token_counter is None:
+            self._token_counter = get_token_counter()
+        return self._token_counter
+
+    @token_counter.setter
+    def token_counter(self, token_counter: Optional[TokenCounter]) -> None:
+        self._token_counter = token_counter
+
     async def execute(
         self,
         context: Dict[str, Any],
-        enable_few_shot: bool
+        enable_few_shot: bool,
+        overflow_strategy: Optional[str] = None,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Any:
         # Prepare inputs
         inputs = {k: context.get(k) for k in self.input_keys}
-        
-        # Format prompt with few-shot examples
+
+        # Format prompt with few-shot examples, fitted to the token budget
+        prompts = self._prepare_prompts(inputs, enable_few_shot, overflow_strategy)
+
+        # Execute LLM call (pseudo-code)
+        if len(prompts) == 1:
+            result, usage = await self._generate(prompts[0], on_token)
+        else:
+            outputs = await asyncio.gather(*(self._generate(p) for p in prompts))
+            result = _combine_results([output for output, _ in outputs])
+            usage = _merge_usage([usage for _, usage in outputs])
+            # Concurrent chunks would interleave their tokens; emit the whole
+            if on_token is not None and isinstance(result, str):
+                on_token(result)
+
+        return {
+            self.output_key: result,
+            "_metadata": {
+                "compressed": self.compress_output,
+                "dependencies": self.input_keys,
+                "cached": usage["cached"],
+                "usage": usage
+            }
+        }
+
+    def _prepare_prompts(
+        self,
+        inputs: Dict[str, Any],
+        enable_few_shot: bool,
+        overflow_strategy: Optional[str] = None
+    ) -> List[str]:
+        """Render the prompt, applying the overflow strategy if it's too large"""
         if enable_few_shot:
-            prompt = self.prompt_template.format(**inputs)
+            examples, base = self.prompt_template.format_parts(**inputs)
         else:
-            prompt = self.prompt_template.base_template.format(**inputs)
-            
-        # Execute LLM call (pseudo-code)
-        result = await self._call_llm(prompt)
-        
+            examples, base = "", self.prompt_template.format_base(**inputs)
+        budget = self.max_prompt_tokens
+        if budget is None:
+            return [examples + base]
+
+        counter = self.token_counter
+        example_tokens = counter.count(examples)
+        base_tokens = counter.count(base)
+        if example_tokens + base_tokens <= budget:
+            return [examples + base]
+
+        strategy = self.overflow_strategy or overflow_strategy or "error"
+        if strategy == "drop_examples":
+            if base_tokens <= budget:
+                return [base]
+            examples, example_tokens = "", 0
+            strategy = "truncate"
+        if strategy == "error":
+            raise PromptTooLargeError(
+                f"Prompt for node '{self.id}' needs {example_tokens + base_tokens} "
+                f"tokens, budget is {budget}"
+            )
+
+        # Cut the largest text input down to whatever room the rest leaves
+        text_keys = [k for k in self.input_keys if isinstance(inputs.get(k), str)]
+        if not text_keys:
+            raise PromptTooLargeError(
+                f"Prompt for node '{self.id}' is over budget with no text input to cut"
+            )
+        key = max(text_keys, key=lambda k: len(inputs[k]))
+        value = inputs[key]
+        room = budget - (example_tokens + base_tokens - counter.count(value))
+        # Token boundaries shift when text is cut, so re-check and tighten
+        while room > 0:
+            if strategy == "truncate":
+                pieces = [counter.truncate(value, room)]
+            else:
+                pieces = counter.split(value, room)
+            prompts = [
+                examples + self.prompt_template.format_base(**{**inputs, key: piece})
+                for piece in pieces
+            ]
+            excess = max(counter.count(prompt) for prompt in prompts) - budget
+            if excess <= 0:
+                return prompts
+            room -= excess
+        raise PromptTooLargeError(
+            f"Prompt for node '{self.id}' exceeds its budget of {budget} tokens "
+            f"even with '{key}' removed"
+        )
+
+    def fingerprint(self, inputs: Dict[str, Any], enable_few_shot: bool) -> str:
+        """Digest of the node definition and its input values.
+
+        An output stored under the same fingerprint can be reused instead of
+        calling the LLM again (see ChainEngine's ``incremental`` option).
+        """
+        digest = hashlib.sha256()
+        for part in self._definition(enable_few_shot):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        for key in self.input_keys:
+            digest.update(key.encode("utf-8"))
+            digest.update(_value_digest(inputs.get(key)))
+        return digest.hexdigest()
+
+    def _definition(self, enable_few_shot: bool) -> List[str]:
+        """Everything besides the inputs that can change this node's output"""
+        return [
+            type(self).__qualname__,
+            self.prompt_template.fingerprint(enable_few_shot),
+            json.dumps(self.model_params, sort_keys=True, default=str),
+            repr((self.max_prompt_tokens, self.overflow_strategy))
+        ]
+
+    def _format_prompt(self, inputs: Dict[str, Any], enable_few_shot: bool) -> str:
+        if enable_few_shot:
+            return self.prompt_template.format(**inputs)
+        return self.prompt_template.format_base(**inputs)
+
+    def _new_usage(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "model": self.model_params.get("model"),
+            "latency": None,
+            "cached": False,
+            "coalesced": False
+        }
+
+    async def _map_prompts(
+        self,
+        prompts: Union[Iterable[str], AsyncIterable[str]],
+        max_concurrency: int,
+        on_result: Optional[Callable[[Any], None]] = None
+    ) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Generate responses for prompts as they are produced.
+
+        At most ``max_concurrency`` calls are in flight, and the next prompt
+        is only pulled once one finishes. Results come back in prompt order;
+        ``on_result`` sees each one as soon as every earlier one is done.
+        """
+        results: Dict[int, Tuple[Any, Dict[str, Any]]] = {}
+        pending: Dict[asyncio.Task, int] = {}
+        delivered = 0
+
+        async def collect(return_when: str) -> None:
+            nonlocal delivered
+            done, _ = await asyncio.wait(pending, return_when=return_when)
+            for task in done:
+                results[pending.pop(task)] = task.result()
+            while on_result is not None and delivered in results:
+                on_result(results[delivered][0])
+                delivered += 1
+
+        try:
+            index = 0
+            async for prompt in _aiter(prompts):
+                if len(pending) >= max_concurrency:
+                    await collect(asyncio.FIRST_COMPLETED)
+                pending[asyncio.ensure_future(self._generate(prompt))] = index
+                index += 1
+            while pending:
+                await collect(asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in pending:
+                task.cancel()
+            # Let cancelled calls unwind before the error leaves the node
+            await asyncio.gather(*pending, return_exceptions=True)
+        return [results[index] for index in range(len(results))]
+
+    async def _generate(
+        self,
+        prompt: str,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """Call the LLM unless the cache or an in-flight call already covers it.
+
+        Returns the response content together with its usage: token counts
+        and latency of the LLM call, and whether the response was served from
+        the cache or shared with a concurrent identical call. With
+        ``on_token``, a node that has ``_stream_llm`` reports each piece as it
+        arrives; otherwise the whole response is reported once it's known.
+        """
+        usage = self._new_usage()
+        key: Optional[str] = None
+        stream = getattr(self, "_stream_llm", None) if on_token is not None else None
+        streamed = False
+
+        async def invoke() -> Any:
+            # Timed per attempt, so waiting on the rate limiter isn't counted
+            start = time.perf_counter()
+            try:
+                if stream is not None:
+                    return await _consume_stream(stream(prompt), on_token)
+                return await self._call_llm(prompt)
+            finally:
+                usage["latency"] = time.perf_counter() - start
+
+        limiter = self.rate_limiter
+        estimate = 0
+        if limiter is not None:
+            estimate = (
+                self.token_counter.count(prompt) + self.model_params.get("max_tokens", 0)
+            )
+
+        async def attempt() -> Any:
+            # Every attempt and hedged duplicate takes its own limiter slot,
+            # and the policy's timeouts only start once it's held. The limiter
+            # owns throttle retries; the policy passes 429s up to it
+            return await self.retry_policy.call(
+                invoke,
+                # A duplicate of a streamed call would emit every token twice
+                hedge=stream is None,
+                passthrough=limiter.throttle_check if limiter is not None else None,
+                acquire=(lambda: limiter.acquire(estimate)) if limiter is not None else None
+            )
+
+        async def call() -> Any:
+            nonlocal streamed
+            if self.retry_policy is None:
+                response = await (
+                    limiter.call(invoke, estimate) if limiter is not None else invoke()
+                )
+            elif limiter is not None:
+                response = await limiter.retry_throttled(attempt)
+            else:
+                response = await attempt()
+            streamed = stream is not None
+            if isinstance(response, LLMResponse):
+                usage["prompt_tokens"] = response.prompt_tokens
+                usage["completion_tokens"] = response.completion_tokens
+                usage["model"] = response.model or usage["model"]
+                if limiter is not None:
+                    limiter.reconcile_tokens(
+                        estimate, response.prompt_tokens + response.completion_tokens
+                    )
+                response = response.content
+            if self.cache is not None:
+                self.cache.set(key, response)
+            return response
+
+        if self.cache is None and not self.coalesce_requests:
+            result = await call()
+        else:
+            key = ResponseCache.make_key(self.id, prompt, self.model_params)
+            result = _MISSING
+            if self.cache is not None:
+                result = await self.cache.aget(key, _MISSING)
+                usage["cached"] = result is not _MISSING
+            if result is _MISSING:
+                if self.coalesce_requests:
+                    result = await self._single_flight.do(key, call)
+                    # Only the caller that ran call() was timed and billed
+                    usage["coalesced"] = usage["latency"] is None
+                else:
+                    result = await call()
+
+        # Cached and shared responses arrive whole
+        if on_token is not None and not streamed and isinstance(result, str):
+            on_token(result)
+        return result, usage
+
+class MapReduceNode(BaseNode):
+    """Run a prompt over a document too large for one context window.
+
+    The ``chunk_key`` input is cut into overlapping chunks of ``chunk_tokens``
+    tokens; the node's prompt is mapped over them with at most
+    ``max_concurrency`` calls in flight, and ``reduce_template`` combines the
+    partial results (joined under ``reduce_key``) into the node's output.
+    Other inputs are passed unchanged to both templates. A document that fits
+    in a single chunk skips the reduce call.
+
+    Map prompts go through the node's overflow handling like any other
+    prompt. When the joined partial results would put the reduce prompt over
+    ``max_prompt_tokens``, they are reduced hierarchically: packed in order
+    into groups that fit, each group reduced, and the results combined again
+    until one prompt holds them all. A partial result too large for a reduce
+    prompt on its own fails under the "error" strategy and is truncated
+    under the others.
+    """
+
+    def __init__(
+        self,
+        node_id: str,
+        prompt_template: EnhancedPromptTemplate,
+        reduce_template: EnhancedPromptTemplate,
+        input_keys: List[str],
+        output_key: str,
+        chunk_key: Optional[str] = None,
+        chunk_tokens: int = 2000,
+        chunk_overlap: int = 200,
+        max_concurrency: int = 4,
+        reduce_key: str = "results",
+        **kwargs
+    ):
+        super().__init__(node_id, prompt_template, input_keys, output_key, **kwargs)
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if chunk_tokens <= chunk_overlap:
+            raise ValueError("chunk_tokens must be larger than chunk_overlap")
+        self.reduce_template = reduce_template
+        self.chunk_key = chunk_key or input_keys[0]
+        if self.chunk_key not in input_keys:
+            raise ValueError(f"chunk_key '{self.chunk_key}' is not an input key")
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.max_concurrency = max_concurrency
+        self.reduce_key = reduce_key
+
+    def _definition(self, enable_few_shot: bool) -> List[str]:
+        return super()._definition(enable_few_shot) + [
+            self.reduce_template.fingerprint(),
+            repr((self.chunk_key, self.chunk_tokens, self.chunk_overlap, self.reduce_key))
+        ]
+
+    async def execute(
+        self,
+        context: Dict[str, Any],
+        enable_few_shot: bool,
+        overflow_strategy: Optional[str] = None,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Any:
+        inputs = {k: context.get(k) for k in self.input_keys}
+        text = str(inputs[self.chunk_key] or "")
+        if text:
+            chunks = iter_chunks(
+                text, self.chunk_tokens, self.chunk_overlap, self.token_counter
+            )
+        else:
+            chunks = iter([""])
+        partials = await self._map(chunks, inputs, enable_few_shot, overflow_strategy)
+
+        # Only the final answer is streamed, never the partial results
+        if len(partials) == 1:
+            result, usage = partials[0]
+            if on_token is not None and isinstance(result, str):
+                on_token(result)
+        else:
+            rest = {k: v for k, v in inputs.items() if k != self.chunk_key}
+            usages = [usage for _, usage in partials]
+            # Each round waits on the one before; calls within a round overlap
+            latencies = [_merge_usage(usages)["latency"]]
+            prompts = self._reduce_prompts(
+                [output for output, _ in partials], rest, overflow_strategy
+            )
+            while len(prompts) > 1:
+                reduced = await self._map_prompts(prompts, self.max_concurrency)
+                round_usages = [usage for _, usage in reduced]
+                usages += round_usages
+                latencies.append(_merge_usage(round_usages)["latency"])
+                prompts = self._reduce_prompts(
+                    [output for output, _ in reduced], rest, overflow_strategy
+                )
+            result, reduce_usage = await self._generate(prompts[0], on_token)
+            usages.append(reduce_usage)
+            latencies.append(reduce_usage["latency"])
+
+            usage = _merge_usage(usages)
+            latencies = [latency for latency in latencies if latency is not None]
+            usage["latency"] = sum(latencies) if latencies else None
+        usage["chunks"] = len(partials)
+
         return {
             self.output_key: result,
             "_metadata": {
                 "compressed": self.compress_output,
-                "dependencies": self.input_keys
+                "dependencies": self.input_keys,
+                "cached": usage["cached"],
+                "usage": usage
             }
-        }
\ No newline at end of file
+        }
+
+    async def _map(
+        self,
+        chunks: Iterable[str],
+        inputs: Dict[str, Any],
+        enable_few_shot: bool,
+        overflow_strategy: Optional[str] = None
+    ) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Map the prompt over chunks as they are split, in chunk order"""
+        prompts = (
+            prompt
+            for chunk in chunks
+            for prompt in self._prepare_prompts(
+                {**inputs, self.chunk_key: chunk}, enable_few_shot, overflow_strategy
+            )
+        )
+        return await self._map_prompts(prompts, self.max_concurrency)
+
+    def _reduce_prompts(
+        self,
+        outputs: List[Any],
+        rest: Dict[str, Any],
+        overflow_strategy: Optional[str] = None
+    ) -> List[str]:
+        """Pack partial results, in order, into as few reduce prompts as fit"""
+        def render(group: List[str]) -> str:
+            return self.reduce_template.format(
+                **{**rest, self.reduce_key: "\n".join(group)}
+            )
+
+        texts = [str(output) for output in outputs]
+        budget = self.max_prompt_tokens
+        if budget is None:
+            return [render(texts)]
+
+        counter = self.token_counter
+        strategy = self.overflow_strategy or overflow_strategy or "error"
+        prompts: List[str] = []
+        group: List[str] = []
+        for text in texts:
+            if group and counter.count(render(group + [text])) <= budget:
+                group.append(text)
+                continue
+            if group:
+                prompts.append(render(group))
+            group = [self._fit_partial(text, render, budget, strategy)]
+        prompts.append(render(group))
+        # Another round would only reduce each partial on its own
+        if 1 < len(prompts) == len(texts):
+            raise PromptTooLargeError(
+                f"Reduce prompt for node '{self.id}' can't fit two partial "
+                f"results in its budget of {budget} tokens"
+            )
+        return prompts
+
+    def _fit_partial(
+        self,
+        text: str,
+        render: Callable[[List[str]], str],
+        budget: int,
+        strategy: str
+    ) -> str:
+        """Cut a partial result that overflows a reduce prompt on its own"""
+        counter = self.token_counter
+        if counter.count(render([text])) <= budget:
+            return text
+        if strategy == "error":
+            raise PromptTooLargeError(
+                f"Reduce prompt for node '{self.id}' needs "
+                f"{counter.count(render([text]))} tokens for one partial result, "
+                f"budget is {budget}"
+            )
+        room = budget - counter.count(render([""]))
+        # Token boundaries shift when text is cut, so re-check and tighten
+        while room > 0:
+            cut = counter.truncate(text, room)
+            excess = counter.count(render([cut])) - budget
+            if excess <= 0:
+                return cut
+            room -= excess
+        raise PromptTooLargeError(
+            f"Reduce prompt for node '{self.id}' exceeds its budget of {budget} "
+            f"tokens even with no partial result"
+        )
+
+class IncrementalNode(BaseNode):
+    """Run the prompt on each segment of one input as soon as it's complete.
+
+    The ``stream_key`` input is cut into segments (see ``SEGMENTS``) and the
+    prompt is applied to each, with at most ``max_concurrency`` calls in
+    flight; the output joins the per-segment results in order. In the
+    engine's "pipelined" mode the segments are read while the upstream node
+    is still generating, so the two nodes overlap instead of running back to
+    back; elsewhere the complete value is segmented.
+    """
+
+    def __init__(
+        self,
+        node_id: str,
+        prompt_template: EnhancedPromptTemplate,
+        input_keys: List[str],
+        output_key: str,
+        stream_key: Optional[str] = None,
+        segment: str = "sentence",
+        max_concurrency: int = 4,
+        **kwargs
+    ):
+        super().__init__(node_id, prompt_template, input_keys, output_key, **kwargs)
+        if segment not in SEGMENTS:
+            raise ValueError(f"Unknown segment '{segment}', expected one of {SEGMENTS}")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.stream_key = stream_key or input_keys[0]
+        if self.stream_key not in input_keys:
+            raise ValueError(f"stream_key '{self.stream_key}' is not an input key")
+        self.segment = segment
+        self.max_concurrency = max_concurrency
+
+    def _definition(self, enable_few_shot: bool) -> List[str]:
+        return super()._definition(enable_few_shot) + [
+            repr((self.stream_key, self.segment))
+        ]
+
+    async def execute(
+        self,
+        context: Dict[str, Any],
+        enable_few_shot: bool,
+        overflow_strategy: Optional[str] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        stream: Optional[AsyncIterable[str]] = None
+    ) -> Any:
+        inputs = {k: context.get(k) for k in self.input_keys if k != self.stream_key}
+        if stream is None:
+            value = context.get(self.stream_key)
+            stream = _aiter([] if value is None else [str(value)])
+
+        prompts = (
+            self._format_prompt({**inputs, self.stream_key: text}, enable_few_shot)
+            async for text in iter_segments(stream, self.segment)
+        )
+        emitted = 0
+
+        def on_result(result: Any) -> None:
+            # Tokens concatenate to the joined output
+            nonlocal emitted
+            if on_token is not None:
+                on_token(("\n" if emitted else "") + str(result))
+            emitted += 1
+
+        partials = await self._map_prompts(prompts, self.max_concurrency, on_result)
+        if partials:
+            result = _combine_results([output for output, _ in partials])
+            usage = _merge_usage([usage for _, usage in partials])
+        else:
+            result, usage = "", self._new_usage()
+        usage["segments"] = len(partials)
+
+        return {
+            self.output_key: result,
+            "_metadata": {
+                "compressed": self.compress_output,
+                "dependencies": self.input_keys,
+                "cached": usage["cached"],
+                "usage": usage
+            }
+        }
+
+async def _aiter(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    """Present sync and async sources as one async iterator"""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+def _value_digest(value: Any) -> bytes:
+    if isinstance(value, str):
+        digest = hashlib.sha256(b"s")
+        digest.update(value.encode("utf-8"))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        digest = hashlib.sha256(b"b")
+        digest.update(value)
+    else:
+        try:
+            digest = hashlib.sha256(b"m" + msgpack.packb(value))
+        except (TypeError, ValueError):
+            digest = hashlib.sha256(b"r" + repr(value).encode("utf-8"))
+    return digest.digest()
+
+async def _consume_stream(
+    stream: AsyncIterator[Any],
+    on_token: Callable[[str], None]
+) -> Any:
+    """Forward streamed pieces to ``on_token`` and assemble the response"""
+    pieces = []
+    final: Optional[LLMResponse] = None
+    async for item in stream:
+        if isinstance(item, LLMResponse):
+            final = item
+            continue
+        pieces.append(item)
+        on_token(item)
+    content = "".join(pieces)
+    return replace(final, content=content) if final is not None else content
+
+def _combine_results(results: List[Any]) -> Any:
+    """Join per-chunk responses back into one output"""
+    if all(isinstance(result, str) for result in results):
+        return "\n".join(results)
+    return results
+
+def _merge_usage(usages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = [u["latency"] for u in usages if u["latency"] is not None]
+    return {
+        "prompt_tokens": sum(u["prompt_tokens"] for u in usages),
+        "completion_tokens": sum(u["completion_tokens"] for u in usages),
+        "model": usages[0]["model"],
+        # Chunks run concurrently, so the slowest one bounds the node
+        "latency": max(latencies) if latencies else None,
+        "cached": all(u["cached"] for u in usages),
+        "coalesced": all(u["coalesced"] for u in usages)
+    }
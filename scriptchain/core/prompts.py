@@ -1,40 +1,140 @@
 from langchain.prompts import PromptTemplate
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from string import Formatter
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
 
 class FewShotExample(BaseModel):
     input: str
     output: str
     reasoning: str = ""
 
+def render_example(example: FewShotExample) -> str:
+    return (
+        f"Input: {example.input}\nOutput: {example.output}\n"
+        f"Reasoning: {example.reasoning}"
+    )
+
+def compile_template(template: str) -> Optional[List[Tuple[str, Optional[str]]]]:
+    """Split an f-string style template into (literal, field) segments.
+
+    Returns None when the template uses format specs, conversions or
+    attribute/index lookups, which only ``str.format`` knows how to apply.
+    """
+    segments = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        if field is not None and (spec or conversion or not field.isidentifier()):
+            return None
+        segments.append((literal, field))
+    return segments
+
 class EnhancedPromptTemplate:
     def __init__(
         self,
         template: str,
         input_variables: List[str],
         examples: List[FewShotExample] = None,
-        example_header: str = "Examples:"
+        example_header: str = "Examples:",
+        example_selector: Optional[Any] = None
     ):
         self.base_template = PromptTemplate(
             template=template,
             input_variables=input_variables
         )
+        # Compiled once here so format() never touches langchain's validation
+        self._segments = compile_template(template)
+        self._template = template
+        self._example_header = example_header
+        self._example_prefix: Optional[str] = None
         self.examples = examples or []
-        self.example_header = example_header
-        
+        # Picks examples per call (see SimilarityExampleSelector); when set it
+        # takes precedence over the static examples list
+        self.example_selector = example_selector
+
+    @property
+    def examples(self) -> List[FewShotExample]:
+        """The static examples, rendered once into the block that prefixes
+        every prompt. After changing this list or an example in place, call
+        ``refresh_examples``; assigning a new list refreshes by itself."""
+        return self._examples
+
+    @examples.setter
+    def examples(self, examples: List[FewShotExample]) -> None:
+        self.set_examples(examples)
+
+    def set_examples(self, examples: List[FewShotExample]) -> None:
+        self._examples = examples
+        self.refresh_examples()
+
+    @property
+    def example_header(self) -> str:
+        return self._example_header
+
+    @example_header.setter
+    def example_header(self, example_header: str) -> None:
+        self._example_header = example_header
+        self.refresh_examples()
+
+    def add_example(self, example: FewShotExample) -> None:
+        self._examples.append(example)
+        self.refresh_examples()
+
+    def refresh_examples(self) -> None:
+        """Re-render the example block on next use, picking up edits made
+        to the examples in place"""
+        self._example_prefix = None
+
+    def _example_block(self) -> str:
+        if self._example_prefix is None:
+            self._example_prefix = self._join_examples(
+                [render_example(ex) for ex in self._examples]
+            )
+        return self._example_prefix
+
+    def _join_examples(self, rendered: List[str]) -> str:
+        if not rendered:
+            return ""
+        example_str = "\n\n".join(rendered)
+        return f"{self._example_header}\n{example_str}\n\n"
+
+    def fingerprint(self, include_examples: bool = True) -> str:
+        """Digest of everything but the inputs that shapes the prompt"""
+        digest = hashlib.sha256(self._template.encode("utf-8"))
+        if include_examples:
+            digest.update(self._example_block().encode("utf-8"))
+            if self.example_selector is not None:
+                digest.update(self.example_selector.fingerprint().encode("utf-8"))
+        return digest.hexdigest()
+
+    def format_base(self, **kwargs) -> str:
+        """Fill the base template without any few-shot examples"""
+        segments = self._segments
+        if segments is None:
+            return self._template.format(**kwargs)
+        parts = []
+        for literal, field in segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(kwargs[field]))
+        return "".join(parts)
+
+    def format_parts(self, **kwargs) -> Tuple[str, str]:
+        """The few-shot example block and the filled base template.
+
+        ``format()`` is their concatenation; keeping them apart lets callers
+        measure or drop the examples without re-rendering the rest.
+        """
+        base_result = self.format_base(**kwargs)
+        if self.example_selector is not None:
+            query = " ".join(
+                str(kwargs[var]) for var in self.base_template.input_variables
+                if kwargs.get(var) is not None
+            )
+            rendered = self.example_selector.select_rendered(query)
+            return self._join_examples(rendered), base_result
+        # Examples are pre-rendered; only the base template varies per call
+        return self._example_block(), base_result
+
     def format(self, **kwargs) -> str:
-        # Format the base template first
-        base_result = self.base_template.format(**kwargs)
-        
-        # If there are no examples, just return the base result
-        if not self.examples:
-            return base_result
-            
-        # Format examples
-        example_str = "\n\n".join(
-            [f"Input: {ex.input}\nOutput: {ex.output}\nReasoning: {ex.reasoning}" 
-             for ex in self.examples]
-        )
-        
-        # Combine everything
-        return f"{self.example_header}\n{example_str}\n\n{base_result}"
\ No newline at end of file
+        examples, base_result = self.format_parts(**kwargs)
+        return examples + base_result
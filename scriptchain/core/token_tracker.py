@@ -1,17 +1,188 @@
-class TokenTracker:
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import json
+import math
+
+class LatencyHistogram:
+    """Fixed-memory latency histogram with logarithmic buckets.
+
+    Bucket bounds grow by ``growth`` from ``min_latency`` up to
+    ``max_latency`` seconds, so percentiles are accurate to within one
+    bucket (about 10% by default) however many samples are recorded.
+    """
+
+    def __init__(
+        self,
+        min_latency: float = 0.001,
+        max_latency: float = 600.0,
+        growth: float = 1.1
+    ):
+        self.min_latency = min_latency
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        span = math.log(max_latency / min_latency) / self._log_growth
+        self.counts = [0] * (int(math.ceil(span)) + 2)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, latency: float) -> None:
+        if latency <= self.min_latency:
+            index = 0
+        else:
+            index = int(math.log(latency / self.min_latency) / self._log_growth) + 1
+            index = min(index, len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += latency
+        self.min = latency if self.min is None else min(self.min, latency)
+        self.max = latency if self.max is None else max(self.max, latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile (0-100)"""
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(q / 100.0 * self.count)))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                upper = self.min_latency * self.growth ** index
+                return min(upper, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99)
+        }
+
+class UsageStats:
+    """Token and call counts for one slice of traffic (node, run or model)"""
+
+    __slots__ = (
+        "prompt_tokens", "completion_tokens", "calls", "cached_calls",
+        "coalesced_calls", "latency"
+    )
+
     def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+        self.cached_calls = 0
+        self.coalesced_calls = 0
+        # Only calls that reached the LLM are timed
+        self.latency = LatencyHistogram()
+
+    def add(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached: bool,
+        coalesced: bool,
+        latency: Optional[float]
+    ) -> None:
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.calls += 1
+        if cached:
+            self.cached_calls += 1
+        elif coalesced:
+            self.coalesced_calls += 1
+        elif latency is not None:
+            self.latency.record(latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "calls": self.calls,
+            "cached_calls": self.cached_calls,
+            "coalesced_calls": self.coalesced_calls,
+            "uncached_calls": self.calls - self.cached_calls - self.coalesced_calls,
+            "latency": self.latency.to_dict()
+        }
+
+class TokenTracker:
+    def __init__(self, max_runs: int = 1000):
         self.total_tokens = 0
         self.prompt_tokens = 0
         self.completion_tokens = 0
-        
-    def add_usage(self, prompt_tokens: int, completion_tokens: int):
+        self.totals = UsageStats()
+        self.nodes: Dict[str, UsageStats] = {}
+        self.models: Dict[str, UsageStats] = {}
+        # Bounded so a long-lived worker doesn't accumulate every run forever
+        self.max_runs = max_runs
+        self.runs: "OrderedDict[str, UsageStats]" = OrderedDict()
+
+    def add_usage(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        node_id: Optional[str] = None,
+        model: Optional[str] = None,
+        run_id: Optional[str] = None,
+        cached: bool = False,
+        coalesced: bool = False,
+        latency: Optional[float] = None
+    ):
         self.prompt_tokens += prompt_tokens
         self.completion_tokens += completion_tokens
         self.total_tokens = self.prompt_tokens + self.completion_tokens
-        
+
+        slices: List[UsageStats] = [self.totals]
+        if node_id is not None:
+            slices.append(self.nodes.setdefault(node_id, UsageStats()))
+        if model is not None:
+            slices.append(self.models.setdefault(model, UsageStats()))
+        if run_id is not None:
+            if run_id not in self.runs:
+                self.runs[run_id] = UsageStats()
+                while len(self.runs) > self.max_runs:
+                    self.runs.popitem(last=False)
+            slices.append(self.runs[run_id])
+        for stats in slices:
+            stats.add(prompt_tokens, completion_tokens, cached, coalesced, latency)
+
     def get_usage(self):
         return {
             "total_tokens": self.total_tokens,
             "prompt_tokens": self.prompt_tokens,
             "completion_tokens": self.completion_tokens
-        } 
\ No newline at end of file
+        }
+
+    def get_node_usage(self, node_id: str) -> Optional[Dict[str, Any]]:
+        stats = self.nodes.get(node_id)
+        return stats.to_dict() if stats is not None else None
+
+    def get_model_usage(self, model: str) -> Optional[Dict[str, Any]]:
+        stats = self.models.get(model)
+        return stats.to_dict() if stats is not None else None
+
+    def get_run_usage(self, run_id: str) -> Optional[Dict[str, Any]]:
+        stats = self.runs.get(run_id)
+        return stats.to_dict() if stats is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Every breakdown as plain, JSON-serialisable data"""
+        return {
+            "totals": self.totals.to_dict(),
+            "nodes": {key: stats.to_dict() for key, stats in self.nodes.items()},
+            "models": {key: stats.to_dict() for key, stats in self.models.items()},
+            "runs": {key: stats.to_dict() for key, stats in self.runs.items()}
+        }
+
+    def export_json(self, filepath: Optional[str] = None) -> str:
+        data = json.dumps(self.to_dict(), indent=2)
+        if filepath is not None:
+            with open(filepath, "w") as f:
+                f.write(data)
+        return data
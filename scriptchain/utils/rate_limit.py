@@ -0,0 +1,197 @@
+"""
+Rate limiting and adaptive concurrency for LLM backends
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from .retry import RetryPolicy
+
+def is_throttled(error: Exception) -> bool:
+    """Whether an error is the provider asking us to slow down (HTTP 429)"""
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+class TokenBucket:
+    """Paces a quantity (requests, tokens) to ``rate_per_minute``.
+
+    Up to ``capacity`` units (ten seconds' worth by default) may be spent in
+    a burst. Waiters are served first come, first served. A single request
+    larger than the capacity is let through once the bucket is full and
+    leaves it in debt, so it can't block forever.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        async with self._lock:
+            self._refill()
+            needed = min(amount, self.capacity)
+            if self.tokens < needed:
+                await asyncio.sleep((needed - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def reconcile(self, delta: float) -> None:
+        """Charge (or refund) the difference between estimated and actual use"""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight calls.
+
+    The limit grows by ``increase`` per limit-full of successful calls whose
+    latency stays within ``latency_tolerance`` times the running baseline, and
+    is multiplied by ``decrease`` when the backend throttles. Calls started
+    before a decrease can't trigger another one, so a burst of 429s from one
+    window only backs off once instead of collapsing the limit.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Expected 1 <= min_limit <= initial_limit <= max_limit")
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self._epoch = 0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self) -> int:
+        """Wait for a slot; returns the epoch to report the outcome against"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            return self._epoch
+
+    async def release(self) -> None:
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        baseline = self.baseline_latency
+        if baseline is None or latency <= self.latency_tolerance * baseline:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+        # Slow-moving average, so one outlier neither sets nor spoils it
+        if baseline is None:
+            self.baseline_latency = latency
+        else:
+            self.baseline_latency = baseline + 0.05 * (latency - baseline)
+
+    def on_throttle(self, epoch: int) -> None:
+        if epoch != self._epoch:
+            return
+        self._epoch += 1
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+
+class RateLimiter:
+    """Shared limits for every node calling the same LLM backend.
+
+    Each call takes a concurrency slot, one request from the
+    ``requests_per_minute`` bucket and its estimated tokens from the
+    ``tokens_per_minute`` bucket. Throttled calls shrink the concurrency limit
+    and are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        max_retries: int = 5,
+        retry_delay: float = 1.0,
+        retry_backoff: float = 2.0,
+        throttle_check: Callable[[Exception], bool] = is_throttled
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.throttle_check = throttle_check
+        self.calls = 0
+        self.throttled = 0
+        self._retry = RetryPolicy(
+            max_attempts=max_retries + 1,
+            delay=retry_delay,
+            backoff=retry_backoff,
+            retry_if=throttle_check
+        )
+
+    async def call(self, func: Callable[[], Awaitable[Any]], tokens: int = 0) -> Any:
+        """Run ``func`` within the limits, charging ``tokens`` up front"""
+        return await self.retry_throttled(self._attempt, func, tokens)
+
+    async def retry_throttled(self, func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Run ``func(*args)``, backing off and retrying while it's throttled.
+
+        For callers that take their own ``acquire`` slot per request, such
+        as a RetryPolicy that may send several.
+        """
+        return await self._retry.call(func, *args, hedge=False)
+
+    @asynccontextmanager
+    async def acquire(self, tokens: int = 0) -> AsyncIterator[None]:
+        """Hold a slot for one request, charging it and ``tokens`` up front.
+
+        A throttled error raised inside the block shrinks the concurrency
+        limit; a successful block feeds its latency to it.
+        """
+        epoch = await self.concurrency.acquire()
+        try:
+            if self.requests is not None:
+                await self.requests.acquire()
+            if self.tokens is not None and tokens:
+                await self.tokens.acquire(tokens)
+            self.calls += 1
+            start = time.monotonic()
+            try:
+                yield
+            except Exception as e:
+                if self.throttle_check(e):
+                    self.throttled += 1
+                    self.concurrency.on_throttle(epoch)
+                raise
+            self.concurrency.on_success(time.monotonic() - start)
+        finally:
+            await self.concurrency.release()
+
+    async def _attempt(self, func: Callable[[], Awaitable[Any]], tokens: int) -> Any:
+        async with self.acquire(tokens):
+            return await func()
+
+    def reconcile_tokens(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once a call's real usage is known"""
+        if self.tokens is not None:
+            self.tokens.reconcile(actual - estimated)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+            "calls": self.calls,
+            "throttled": self.throttled
+        }
@@ -3,32 +3,324 @@ Async retry logic for chain execution
 """
 
 import asyncio
-from typing import Any, Callable, Optional
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncContextManager, Awaitable, Callable, Iterator, Optional
 from functools import wraps
 
+# Absolute time.monotonic() by which the current run must finish
+_run_deadline: ContextVar[Optional[float]] = ContextVar("run_deadline", default=None)
+
+# HTTP statuses worth retrying: timeouts, conflicts, throttling, server errors
+TRANSIENT_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# Provider SDK errors (openai, anthropic, httpx) that don't carry a status
+TRANSIENT_ERROR_NAMES = frozenset({
+    "APIConnectionError", "APITimeoutError", "RateLimitError",
+    "InternalServerError", "ServiceUnavailableError", "ConnectError",
+    "ReadTimeout", "RemoteProtocolError"
+})
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The run's deadline passed before a successful attempt"""
+
+class CircuitOpenError(RuntimeError):
+    """A backend's circuit breaker is rejecting calls"""
+
+def is_transient(error: Exception) -> bool:
+    """Whether retrying ``error`` has a chance of succeeding"""
+    if isinstance(error, (DeadlineExceeded, CircuitOpenError)):
+        return False
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status in TRANSIENT_STATUSES:
+        return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+@contextmanager
+def run_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Bound every retry inside this block (and tasks it starts) to ``seconds``"""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _run_deadline.get()
+    token = _run_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _run_deadline.reset(token)
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current run's deadline, if it has one"""
+    deadline = _run_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+class CircuitBreaker:
+    """Stops calling a backend that keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast with CircuitOpenError. Once ``recovery_time`` seconds have
+    passed a single probe call is let through: success closes the circuit,
+    failure opens it for another ``recovery_time``.
+
+    ``before_call`` hands the probe a token; only that token can give the
+    probe slot back through ``release``, so calls that started before the
+    circuit opened can't let a second probe through.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        # Token of the half-open probe in flight, if any
+        self._probe: Optional[object] = None
+
+    def before_call(self) -> Optional[object]:
+        """Admit a call, returning a probe token if it's the half-open probe"""
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.recovery_time:
+                raise CircuitOpenError("Circuit is open; backend is failing")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe is not None:
+                raise CircuitOpenError("Circuit is half-open; probe in flight")
+            self._probe = object()
+            return self._probe
+        return None
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe = None
+
+    def release(self, probe: Optional[object]) -> None:
+        """Give up the probe slot of a call that ended without a verdict,
+        such as one cancelled by a deadline or an abandoned hedge. Only the
+        token ``before_call`` gave that call frees it."""
+        if probe is not None and probe is self._probe:
+            self._probe = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probe = None
+
+class RetryPolicy:
+    """Retries, timeouts, circuit breaking and hedging around one async call.
+
+    Failed attempts accepted by ``retry_if`` (transient errors by default)
+    are retried up to ``max_attempts`` in total, sleeping a full-jitter
+    exponential backoff in between. Each attempt is bounded by
+    ``attempt_timeout`` and everything by the run deadline (see
+    ``run_deadline``). With ``hedge_percentile`` set, an attempt still running
+    after that percentile of recent attempt latencies gets a duplicate, and
+    whichever finishes first wins. Share one policy between the nodes of a
+    backend so its circuit breaker and latency window see all their calls.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        delay: float = 1.0,
+        backoff: float = 2.0,
+        max_delay: float = 30.0,
+        jitter: bool = True,
+        exceptions: tuple = (Exception,),
+        retry_if: Optional[Callable[[Exception], bool]] = is_transient,
+        attempt_timeout: Optional[float] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.exceptions = exceptions
+        self.retry_if = retry_if
+        self.attempt_timeout = attempt_timeout
+        self.circuit_breaker = circuit_breaker
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies: deque = deque(maxlen=latency_window)
+        self.retries = 0
+        self.hedges = 0
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Sleep before retry number ``attempt`` (0-based)"""
+        ceiling = min(self.max_delay, self.delay * self.backoff ** attempt)
+        return random.uniform(0, ceiling) if self.jitter else ceiling
+
+    def hedge_threshold(self) -> Optional[float]:
+        if self.hedge_percentile is None or len(self.latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        index = int(len(ordered) * self.hedge_percentile / 100.0)
+        return ordered[min(index, len(ordered) - 1)]
+
+    async def call(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        hedge: bool = True,
+        passthrough: Optional[Callable[[Exception], bool]] = None,
+        acquire: Optional[Callable[[], AsyncContextManager[Any]]] = None,
+        **kwargs: Any
+    ) -> Any:
+        """Run ``func(*args, **kwargs)`` under the policy.
+
+        Pass ``hedge=False`` for calls with side effects that must not be
+        duplicated, such as streaming to a consumer. Errors accepted by
+        ``passthrough`` are raised without a retry, for an outer layer that
+        owns them (a RateLimiter retrying throttles). ``acquire`` is entered
+        around every attempt and hedged duplicate, e.g. a RateLimiter slot,
+        so each request sent is charged; timeouts start once it's held.
+        """
+        for attempt in range(self.max_attempts):
+            _check_deadline()
+            probe = None
+            if self.circuit_breaker is not None:
+                probe = self.circuit_breaker.before_call()
+            try:
+                if hedge:
+                    result = await self._hedged(func, args, kwargs, acquire)
+                else:
+                    result = await self._attempt(func, args, kwargs, acquire)
+            except self.exceptions as e:
+                retryable = (
+                    (self.retry_if is None or self.retry_if(e))
+                    and not (passthrough is not None and passthrough(e))
+                )
+                if self.circuit_breaker is not None:
+                    # A non-transient error still means the backend answered
+                    if retryable:
+                        self.circuit_breaker.record_failure()
+                    else:
+                        self.circuit_breaker.record_success()
+                if not retryable or attempt == self.max_attempts - 1:
+                    raise
+                pause = self.backoff_delay(attempt)
+                remaining = remaining_time()
+                if remaining is not None and pause >= remaining:
+                    raise DeadlineExceeded("Run deadline reached while retrying") from e
+                self.retries += 1
+                await asyncio.sleep(pause)
+                continue
+            except BaseException:
+                # Cancellation, or an error this policy doesn't handle, says
+                # nothing about the backend; let the next call probe it
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.release(probe)
+                raise
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            return result
+
+    async def _attempt(
+        self, func: Callable[..., Awaitable[Any]], args, kwargs, acquire=None
+    ) -> Any:
+        if acquire is not None:
+            async with acquire():
+                return await self._attempt(func, args, kwargs)
+        timeout = self.attempt_timeout
+        remaining = remaining_time()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        start = time.monotonic()
+        if timeout is None:
+            result = await func(*args, **kwargs)
+        else:
+            try:
+                result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+            except asyncio.TimeoutError:
+                _check_deadline()
+                raise
+        self.latencies.append(time.monotonic() - start)
+        return result
+
+    async def _hedged(
+        self, func: Callable[..., Awaitable[Any]], args, kwargs, acquire=None
+    ) -> Any:
+        threshold = self.hedge_threshold()
+        if threshold is None:
+            return await self._attempt(func, args, kwargs, acquire)
+
+        first = asyncio.ensure_future(self._attempt(func, args, kwargs, acquire))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=threshold)
+            if not done:
+                self.hedges += 1
+                pending.add(
+                    asyncio.ensure_future(self._attempt(func, args, kwargs, acquire))
+                )
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+def _check_deadline() -> None:
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Run deadline exceeded")
+
 def async_retry(
     max_retries: int = 3,
     delay: float = 1.0,
     backoff: float = 2.0,
-    exceptions: tuple = (Exception,)
+    exceptions: Optional[tuple] = None,
+    retry_if: Optional[Callable[[Exception], bool]] = None,
+    jitter: bool = True,
+    max_delay: float = 30.0,
+    attempt_timeout: Optional[float] = None,
+    circuit_breaker: Optional[CircuitBreaker] = None
 ):
-    """Decorator for async retry logic with exponential backoff"""
-    
+    """Decorator for async retry logic with exponential backoff
+
+    Makes up to ``max_retries`` attempts. By default only transient errors
+    (see ``is_transient``) are retried; passing ``exceptions`` retries those
+    instead, and ``retry_if`` narrows either further. See RetryPolicy for the
+    remaining options.
+    """
+    if exceptions is None and retry_if is None:
+        retry_if = is_transient
+    policy = RetryPolicy(
+        max_attempts=max_retries,
+        delay=delay,
+        backoff=backoff,
+        max_delay=max_delay,
+        jitter=jitter,
+        exceptions=exceptions or (Exception,),
+        retry_if=retry_if,
+        attempt_timeout=attempt_timeout,
+        circuit_breaker=circuit_breaker
+    )
+
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def wrapper(*args: Any, **kwargs: Any) -> Any:
-            last_exception = None
-            current_delay = delay
-            
-            for attempt in range(max_retries):
-                try:
-                    return await func(*args, **kwargs)
-                except exceptions as e:
-                    last_exception = e
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(current_delay)
-                        current_delay *= backoff
-            
-            raise last_exception
+            return await policy.call(func, *args, hedge=False, **kwargs)
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
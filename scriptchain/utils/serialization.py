@@ -1,29 +1,172 @@
 """
-Lightweight context serialization utilities
+Binary context serialization and checkpointing
 """
 
-import json
-from typing import Any, Dict
-from ..core.context import ChainContext
+import os
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Set, Tuple
+import msgpack
+from ..core.context import OptimizedContextManager
 
-def serialize_context(context: ChainContext) -> str:
-    """Serialize a chain context to JSON"""
-    data = {
-        'state': context._state,
-        'results': context._results
-    }
-    return json.dumps(data)
+FORMAT_VERSION = 1
 
-def deserialize_context(json_str: str) -> Dict[str, Any]:
-    """Deserialize a JSON string back into a context dictionary"""
-    return json.loads(json_str)
+def _pack_item(manager: OptimizedContextManager, key: str) -> Optional[bytes]:
+    """One context value as a msgpack record; None if it can't be packed"""
+    record = manager.export_item(key)
+    if record is None:
+        return None
+    record["type"] = "item"
+    record["key"] = key
+    try:
+        return msgpack.packb(record)
+    except (TypeError, ValueError):
+        return None
 
-def save_context(context: ChainContext, filepath: str) -> None:
+def _pack_dictionaries(
+    manager: OptimizedContextManager,
+    start: int = 0
+) -> Iterable[bytes]:
+    codec = manager.compression.codec if manager.compression else "zlib"
+    for index, dictionary in enumerate(manager.dictionaries()[start:], start):
+        yield msgpack.packb({
+            "type": "dictionary", "id": index, "codec": codec, "data": dictionary
+        })
+
+def serialize_context(context: OptimizedContextManager) -> bytes:
+    """Serialize a context manager to msgpack records.
+
+    Values msgpack can't represent (arbitrary Python objects) are left out.
+    """
+    parts = [msgpack.packb({"type": "header", "version": FORMAT_VERSION})]
+    parts.extend(_pack_dictionaries(context))
+    for key in context.context:
+        packed = _pack_item(context, key)
+        if packed is not None:
+            parts.append(packed)
+    return b"".join(parts)
+
+def deserialize_context(
+    data: bytes,
+    context: Optional[OptimizedContextManager] = None
+) -> OptimizedContextManager:
+    """Load records into ``context`` (a new manager by default)"""
+    context = context if context is not None else OptimizedContextManager()
+    _replay(data, context)
+    return context
+
+def save_context(context: OptimizedContextManager, filepath: str) -> None:
     """Save a context to a file"""
-    with open(filepath, 'w') as f:
+    with open(filepath, "wb") as f:
         f.write(serialize_context(context))
 
-def load_context(filepath: str) -> Dict[str, Any]:
+def load_context(
+    filepath: str,
+    context: Optional[OptimizedContextManager] = None
+) -> OptimizedContextManager:
     """Load a context from a file"""
-    with open(filepath, 'r') as f:
-        return deserialize_context(f.read()) 
\ No newline at end of file
+    with open(filepath, "rb") as f:
+        return deserialize_context(f.read(), context)
+
+def _replay(data: bytes, context: OptimizedContextManager) -> Tuple[Set[str], int]:
+    """Apply records in order; returns the keys loaded and the offset just
+    past the last complete record"""
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(data)
+    loaded: Set[str] = set()
+    end = 0
+    # Record dictionary ids -> ids in the manager being loaded into; a later
+    # dictionary record may redefine an id for the records after it
+    dictionary_ids: Dict[int, int] = {}
+    try:
+        for record in unpacker:
+            kind = record.get("type")
+            if kind == "header" and record["version"] > FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported checkpoint version {record['version']}"
+                )
+            if kind == "dictionary":
+                dictionary_ids[record["id"]] = context.add_dictionary(
+                    record["data"], record["codec"]
+                )
+            elif kind == "item":
+                if record["dictionary_id"] is not None:
+                    record["dictionary_id"] = dictionary_ids[record["dictionary_id"]]
+                context.import_item(record["key"], record)
+                loaded.add(record["key"])
+            end = unpacker.tell()
+    except msgpack.UnpackException:
+        # A record torn by a crash mid-write ends the log
+        pass
+    return loaded, end
+
+class Checkpoint:
+    """Append-only msgpack log of a run's context, for ChainEngine.resume.
+
+    The engine appends each value as soon as it is stored, with compressed
+    payloads written as they are held in memory, and flushes (and by default
+    fsyncs) after every record. A crash therefore costs at most the node
+    that was running; a record torn by the crash is ignored on load. Values
+    msgpack can't represent aren't checkpointed, so their nodes run again.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._file: Optional[BinaryIO] = None
+        self._dictionaries_written = 0
+        self.keys: Set[str] = set()
+
+    def _open(self) -> BinaryIO:
+        if self._file is None:
+            exists = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+            self._file = open(self.path, "ab")
+            if not exists:
+                self._file.write(
+                    msgpack.packb({"type": "header", "version": FORMAT_VERSION})
+                )
+        return self._file
+
+    def record(self, context: OptimizedContextManager, key: str) -> bool:
+        """Append the current value of ``key``; False if it couldn't be"""
+        packed = _pack_item(context, key)
+        if packed is None:
+            return False
+        f = self._open()
+        # Dictionaries go first so every item's dictionary precedes it
+        for dictionary in _pack_dictionaries(context, self._dictionaries_written):
+            f.write(dictionary)
+            self._dictionaries_written += 1
+        f.write(packed)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        self.keys.add(key)
+        return True
+
+    def load(
+        self,
+        context: Optional[OptimizedContextManager] = None
+    ) -> OptimizedContextManager:
+        """Replay the log into ``context`` (a new manager by default)"""
+        context = context if context is not None else OptimizedContextManager()
+        if os.path.exists(self.path):
+            self.close()
+            with open(self.path, "r+b") as f:
+                loaded, end = _replay(f.read(), context)
+                # Drop a torn tail so new records aren't appended after it
+                f.truncate(end)
+            self.keys |= loaded
+        # Dictionary ids may differ in this manager, so the next record
+        # restates the whole table in its numbering
+        self._dictionaries_written = 0
+        return context
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
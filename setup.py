@@ -31,9 +31,16 @@ setup(
         "python-dotenv>=0.19.0",
         "openai>=1.0.0",
         "networkx>=3.0",
+        "numpy>=1.24.0",
         "click>=8.0.0",
     ],
     extras_require={
+        "zstd": [
+            "zstandard>=0.21.0",
+        ],
+        "tokenizer": [
+            "tiktoken>=0.5.0",
+        ],
         "dev": [
             "pytest>=7.0.0",
             "pytest-asyncio>=0.18.0",
@@ -1,11 +1,21 @@
 import pytest
 import asyncio
+import gc
 import os
 from dotenv import load_dotenv
-from core.engine import ChainEngine
-from core.nodes import BaseNode
-from core.prompts import EnhancedPromptTemplate, FewShotExample
-from core.context import OptimizedContextManager
+from scriptchain.core.engine import ChainEngine
+from scriptchain.core.nodes import BaseNode, IncrementalNode, LLMResponse, MapReduceNode
+from scriptchain.core.prompts import EnhancedPromptTemplate, FewShotExample
+from scriptchain.core.context import OptimizedContextManager, CompressionPolicy
+from scriptchain.core.cache import ResponseCache
+from scriptchain.core.example_selector import SimilarityExampleSelector
+from scriptchain.core.token_tracker import LatencyHistogram
+from scriptchain.core.tokenizer import PromptTooLargeError, TokenCounter, iter_chunks
+from scriptchain.utils.rate_limit import AdaptiveConcurrency, RateLimiter, TokenBucket
+from scriptchain.utils.serialization import Checkpoint, load_context, save_context
+from scriptchain.utils.retry import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryPolicy
+)
 
 # Load environment variables for testing
 load_dotenv()
@@ -81,4 +91,1245 @@ async def test_context_management(engine, mock_node):
 @pytest.mark.asyncio
 async def test_api_key_loaded():
     # Verify API key is loaded
-    assert os.getenv("OPENAI_API_KEY") is not None 
\ No newline at end of file
+    assert os.getenv("OPENAI_API_KEY") is not None 
+
+class SlowMockNode(BaseNode):
+    async def _call_llm(self, prompt: str) -> str:
+        await asyncio.sleep(0.05)
+        return f"Processed: {prompt}"
+
+def make_slow_node(node_id, input_keys, output_key):
+    template = EnhancedPromptTemplate(
+        template=" ".join(f"{{{key}}}" for key in input_keys),
+        input_variables=input_keys
+    )
+    return SlowMockNode(
+        node_id=node_id,
+        prompt_template=template,
+        input_keys=input_keys,
+        output_key=output_key
+    )
+
+@pytest.mark.asyncio
+async def test_dag_mode_runs_independent_nodes_concurrently():
+    engine = ChainEngine(mode="dag")
+    engine.add_node(make_slow_node("topics", ["text"], "topics"))
+    engine.add_node(make_slow_node("sentiment", ["text"], "sentiment"))
+    engine.add_node(make_slow_node("summary", ["text"], "summary"))
+    engine.add_node(make_slow_node("report", ["topics", "summary"], "report"))
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await engine.execute({"text": "hello"})
+    elapsed = loop.time() - start
+
+    # Critical path is two nodes deep, not four
+    assert elapsed < 0.15
+    assert result["topics"] == "Processed: hello"
+    assert result["report"] == "Processed: Processed: hello Processed: hello"
+
+@pytest.mark.asyncio
+async def test_engine_compiles_plan_once_and_validates_chain():
+    engine = ChainEngine(mode="linear")
+    # Added out of order; linear runs still follow the dependencies
+    engine.add_node(make_slow_node("report", ["summary"], "report"))
+    engine.add_node(make_slow_node("summary", ["text"], "summary"))
+
+    plan = engine.compile()
+    assert [node.id for node in plan.order] == ["summary", "report"]
+    assert plan.required_inputs == ("text",)
+    assert plan.consumers["summary"] == 1
+
+    result = await engine.execute({"text": "hello"})
+    assert result["report"] == "Processed: Processed: hello"
+    assert engine.compile() is plan
+
+    calls = []
+    fresh = ChainEngine(mode="dag")
+    fresh.add_node(make_slow_node("summary", ["text"], "summary"))
+    fresh.nodes[0]._call_llm = lambda prompt: calls.append(prompt)
+    with pytest.raises(ValueError, match="Missing chain inputs"):
+        await fresh.execute({})
+    assert calls == []
+
+    with pytest.raises(ValueError, match="already produced"):
+        engine.add_node(make_slow_node("other", ["text"], "summary"))
+
+    engine.add_node(make_slow_node("title", ["text"], "title"))
+    assert engine.compile() is not plan
+
+def test_dag_mode_rejects_cycles():
+    engine = ChainEngine(mode="dag")
+    engine.add_node(make_slow_node("a", ["b_out"], "a_out"))
+    engine.add_node(make_slow_node("b", ["a_out"], "b_out"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(engine.execute({}))
+
+@pytest.mark.asyncio
+async def test_execute_many_isolates_runs_and_bounds_concurrency():
+    in_flight = 0
+    peak = 0
+
+    class CountingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return prompt.upper()
+
+    engine = ChainEngine()
+    engine.add_node(CountingNode(
+        node_id="upper",
+        prompt_template=EnhancedPromptTemplate(
+            template="{text}", input_variables=["text"]
+        ),
+        input_keys=["text"],
+        output_key="upper"
+    ))
+
+    inputs = ({"text": f"doc {i}"} for i in range(20))
+    results = {}
+    stats = {}
+    async for index, result in engine.execute_many(
+        inputs, max_concurrency=4, run_stats=stats
+    ):
+        assert index in stats
+        results[index] = result
+
+    assert peak <= 4
+    assert len(results) == 20
+    assert all(results[i]["upper"] == f"DOC {i}" for i in range(20))
+    # Every run reports its own stats
+    assert len({stats[i].run_id for i in range(20)}) == 20
+    assert all(stats[i].peak_context_bytes > 0 for i in range(20))
+    # Batch runs never touch the engine's shared context
+    assert engine.context.get_context("upper") is None
+
+@pytest.mark.asyncio
+async def test_execute_many_return_exceptions():
+    class FailingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            if prompt == "bad":
+                raise RuntimeError("boom")
+            return prompt
+
+    engine = ChainEngine()
+    engine.add_node(FailingNode(
+        node_id="echo",
+        prompt_template=EnhancedPromptTemplate(
+            template="{text}", input_variables=["text"]
+        ),
+        input_keys=["text"],
+        output_key="echo"
+    ))
+
+    inputs = [{"text": "good"}, {"text": "bad"}]
+    stats = {}
+    results = dict([
+        item async for item in engine.execute_many(
+            inputs, return_exceptions=True, run_stats=stats
+        )
+    ])
+    assert results[0]["echo"] == "good"
+    assert isinstance(results[1], RuntimeError)
+    assert sorted(stats) == [0, 1]
+
+@pytest.mark.asyncio
+async def test_execute_many_retrieves_simultaneous_failures_and_closes_inputs():
+    class FailingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            if prompt.startswith("bad"):
+                raise RuntimeError(prompt)
+            return prompt
+
+    engine = ChainEngine()
+    engine.add_node(FailingNode(
+        node_id="echo",
+        prompt_template=EnhancedPromptTemplate(
+            template="{text}", input_variables=["text"]
+        ),
+        input_keys=["text"],
+        output_key="echo"
+    ))
+
+    unretrieved = []
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda _, context: unretrieved.append(context))
+    try:
+        with pytest.raises(RuntimeError):
+            async for _ in engine.execute_many([{"text": "bad 1"}, {"text": "bad 2"}]):
+                pass
+        gc.collect()
+        await asyncio.sleep(0)
+    finally:
+        loop.set_exception_handler(None)
+    assert unretrieved == []
+
+    # A consumer that stops early closes the input source
+    closed = []
+
+    async def produce():
+        try:
+            for i in range(100):
+                yield {"text": f"good {i}"}
+        finally:
+            closed.append(True)
+
+    batch = engine.execute_many(produce(), max_concurrency=2)
+    async for _ in batch:
+        break
+    await batch.aclose()
+    assert closed == [True]
+
+def test_response_cache_lru_ttl_and_disk_tier(tmp_path):
+    cache = ResponseCache(max_size=2, path=str(tmp_path / "responses.db"))
+    keys = [ResponseCache.make_key("node", f"prompt {i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.set(key, f"response {i}")
+
+    # Oldest entry left memory but is still served from disk
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert cache.get(keys[0]) == "response 0"
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get("unknown") is None
+    assert cache.misses == 1
+    cache.close()
+
+    reopened = ResponseCache(path=str(tmp_path / "responses.db"))
+    assert reopened.get(keys[2]) == "response 2"
+    reopened.close()
+
+    expiring = ResponseCache(ttl=0)
+    expiring.set(keys[0], "stale")
+    assert expiring.get(keys[0]) is None
+
+@pytest.mark.asyncio
+async def test_response_cache_disk_tier_is_bounded_and_off_loop(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "responses.db")
+    keys = [ResponseCache.make_key("node", f"prompt {i}") for i in range(5)]
+    cache = ResponseCache(max_size=1, path=path, disk_max_size=3)
+    for i, key in enumerate(keys):
+        cache.set(key, f"response {i}")
+    # Queued writes are served before they are committed
+    assert await cache.aget(keys[3]) == "response 3"
+    cache.flush()
+
+    # The disk keeps the newest entries, and lookups promote into memory
+    assert await cache.aget(keys[0]) is None
+    assert await cache.aget(keys[2]) == "response 2"
+    assert cache.disk_evictions == 2
+    assert cache.stats()["disk_hits"] == 2
+    assert len(cache) == 1
+    cache.close()
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 3
+
+    # Expired entries are deleted from disk, not just skipped
+    expiring = ResponseCache(ttl=0.05, path=path)
+    await asyncio.sleep(0.1)
+    expiring.set(keys[0], "fresh")
+    expiring.close()
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT key FROM responses").fetchall() == [(keys[0],)]
+
+@pytest.mark.asyncio
+async def test_node_cache_skips_repeated_llm_calls():
+    calls = []
+
+    class RecordingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            calls.append(prompt)
+            return prompt[::-1]
+
+    cache = ResponseCache()
+    node = RecordingNode(
+        node_id="reverse",
+        prompt_template=EnhancedPromptTemplate(
+            template="{text}", input_variables=["text"]
+        ),
+        input_keys=["text"],
+        output_key="reversed",
+        cache=cache,
+        model_params={"temperature": 0}
+    )
+
+    first = await node.execute({"text": "abc"}, enable_few_shot=True)
+    second = await node.execute({"text": "abc"}, enable_few_shot=True)
+
+    assert calls == ["abc"]
+    assert first["reversed"] == second["reversed"] == "cba"
+    assert second["_metadata"]["cached"] is True
+    assert cache.stats()["hit_rate"] == 0.5
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_prompts_share_one_llm_call():
+    calls = []
+
+    class SlowRecordingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            calls.append(prompt)
+            await asyncio.sleep(0.02)
+            return prompt.upper()
+
+    node = SlowRecordingNode(
+        node_id="upper",
+        prompt_template=EnhancedPromptTemplate(
+            template="{text}", input_variables=["text"]
+        ),
+        input_keys=["text"],
+        output_key="upper"
+    )
+
+    results = await asyncio.gather(
+        node.execute({"text": "same"}, enable_few_shot=True),
+        node.execute({"text": "same"}, enable_few_shot=True),
+        node.execute({"text": "other"}, enable_few_shot=True)
+    )
+
+    assert sorted(calls) == ["other", "same"]
+    assert [r["upper"] for r in results] == ["SAME", "SAME", "OTHER"]
+    assert node._single_flight.coalesced == 1
+    assert len(node._single_flight) == 0
+
+    # Cancelling the caller that started a shared call leaves the others
+    # waiting on it; cancelling every caller cancels the call
+    first = asyncio.ensure_future(node.execute({"text": "again"}, enable_few_shot=True))
+    second = asyncio.ensure_future(node.execute({"text": "again"}, enable_few_shot=True))
+    await asyncio.sleep(0.005)
+    first.cancel()
+    assert (await second)["upper"] == "AGAIN"
+    assert first.cancelled()
+    assert calls.count("again") == 1
+
+    lone = asyncio.ensure_future(node.execute({"text": "dropped"}, enable_few_shot=True))
+    await asyncio.sleep(0.005)
+    lone.cancel()
+    await asyncio.sleep(0)
+    assert len(node._single_flight) == 0
+
+def test_prompt_template_precompiled_rendering_and_invalidation():
+    template = EnhancedPromptTemplate(
+        template="Reply as JSON {{\"answer\": ...}} to: {question} ({lang})",
+        input_variables=["question", "lang"],
+        examples=[FewShotExample(input="2+2", output="4", reasoning="sum")]
+    )
+    inputs = {"question": "3+3", "lang": "en"}
+
+    base = template.base_template.format(**inputs)
+    assert template.format_base(**inputs) == base
+    assert template.format(**inputs) == (
+        "Examples:\nInput: 2+2\nOutput: 4\nReasoning: sum\n\n" + base
+    )
+
+    template.examples = []
+    assert template.format(**inputs) == base
+    template.add_example(FewShotExample(input="1+1", output="2"))
+    assert template.format(**inputs).startswith("Examples:\nInput: 1+1\n")
+
+    # Edits made in place show up once the template is refreshed, in both
+    # the prompt and the fingerprint
+    fingerprint = template.fingerprint()
+    template.examples.append(FewShotExample(input="5+5", output="10"))
+    template.refresh_examples()
+    assert "Input: 5+5" in template.format(**inputs)
+    assert template.fingerprint() != fingerprint
+    template.examples[0].input = "9+9"
+    template.examples.sort(key=lambda ex: ex.input, reverse=True)
+    template.refresh_examples()
+    assert template.format(**inputs).startswith("Examples:\nInput: 9+9\n")
+    template.set_examples([])
+    assert template.format(**inputs) == base
+
+    with pytest.raises(KeyError):
+        template.format(question="missing lang")
+
+def test_similarity_selector_picks_relevant_examples_within_budget():
+    bank = [
+        FewShotExample(input="password reset link expired", output="account"),
+        FewShotExample(input="refund for a damaged parcel", output="billing"),
+        FewShotExample(input="cannot login after password change", output="account"),
+        FewShotExample(input="invoice shows the wrong amount", output="billing"),
+    ]
+    selector = SimilarityExampleSelector(bank, k=2)
+    assert {ex.output for ex in selector.select("my password reset fails")} == {"account"}
+
+    one_fits = SimilarityExampleSelector(
+        bank, k=2, token_budget=15, token_counter=lambda text: len(text) // 4
+    )
+    assert len(one_fits.select("password reset")) == 1
+
+    template = EnhancedPromptTemplate(
+        template="Classify: {ticket}",
+        input_variables=["ticket"],
+        example_selector=selector
+    )
+    prompt = template.format(ticket="refund my damaged order")
+    assert prompt.startswith("Examples:\nInput: refund for a damaged parcel\n")
+    assert prompt.endswith("Classify: refund my damaged order")
+    assert prompt.count("Input: ") == 2
+
+def test_context_store_shares_payloads_without_copying():
+    manager = OptimizedContextManager(compression=None)
+    document = "x" * (1 << 20)
+    blob = bytes(1 << 20)
+    buffer = bytearray(b"mutable")
+    manager.add_context("document", document)
+    manager.add_context("blob", blob, dependencies=["document"])
+    manager.add_context("buffer", buffer)
+
+    assert manager.get_context("document") is document
+    assert manager.get_view("blob").obj is blob
+    view = manager.get_view("document")
+    assert view.readonly and len(view) == len(document)
+    # Strings are encoded once, later views share the buffer
+    assert manager.get_view("document").obj is view.obj
+
+    buffer[0:1] = b"M"
+    assert manager.get_context("buffer") == b"mutable"
+    assert manager.context["blob"].dependencies == ("document",)
+    assert manager.get_context("missing") is None
+
+def test_context_compression_tiers_and_lazy_decoding():
+    manager = OptimizedContextManager(
+        compression=CompressionPolicy(codec="zlib", tiers=[(1024, 6)])
+    )
+    document = "The quarterly report shows steady growth. " * 2000
+    manager.add_context("small", "tiny value")
+    manager.add_context("document", document)
+    manager.add_context("raw", document, compress=False)
+
+    stats = manager.get_stats()
+    assert stats["keys"]["small"]["compressed"] is False
+    assert stats["keys"]["raw"]["compressed"] is False
+    doc_stats = stats["keys"]["document"]
+    assert doc_stats["compressed"] is True
+    assert doc_stats["raw_bytes"] == len(document)
+    assert doc_stats["stored_bytes"] < len(document) // 10
+
+    # Stays compressed until read, then decoded once
+    assert manager.decompressions == 0
+    assert manager.get_context("document") == document
+    assert manager.get_context("document") == document
+    assert manager.decompressions == 1
+    assert manager.decoded_cache_hits == 1
+    assert bytes(manager.get_view("document")) == document.encode()
+    # Views of a hot item share one decoded buffer instead of re-encoding
+    view = manager.get_view("document")
+    assert view.obj is manager.get_view("document").obj
+    assert manager.decompressions == 1
+
+    # Spilled payloads are cached too, until the key is replaced
+    assert manager.spill("document")
+    assert manager.get_context("document") == document
+    assert bytes(manager.get_view("document")) == document.encode()
+    assert manager.decompressions == 2
+    manager.add_context("document", document.upper())
+    assert manager.get_context("document") == document.upper()
+    assert manager.decompressions == 3
+    manager.close()
+
+def test_context_compression_trains_shared_dictionary():
+    policy = CompressionPolicy(
+        codec="zlib", tiers=[(256, 6)], dictionary_size=4096, dictionary_samples=2
+    )
+    manager = OptimizedContextManager(compression=policy)
+    outputs = [
+        f"Summary {i}: the customer reported a billing issue with invoice {i}. " * 8
+        for i in range(4)
+    ]
+    for i, output in enumerate(outputs):
+        manager.add_context(f"out{i}", output)
+
+    assert manager.get_stats()["dictionaries"] == 1
+    assert manager.context["out3"].dictionary_id == 0
+    assert [manager.get_context(f"out{i}") for i in range(4)] == outputs
+
+    seeded = OptimizedContextManager(compression=CompressionPolicy(
+        codec="zlib", tiers=[(256, 6)], dictionary=manager.export_dictionary()
+    ))
+    seeded.add_context("out", outputs[0])
+    assert seeded.get_context("out") == outputs[0]
+
+@pytest.mark.asyncio
+async def test_execute_frees_values_without_remaining_consumers():
+    engine = ChainEngine(mode="dag")
+    engine.add_node(make_slow_node("topics", ["text"], "topics"))
+    engine.add_node(make_slow_node("summary", ["text"], "summary"))
+    engine.add_node(make_slow_node("report", ["topics", "summary"], "report"))
+
+    result = await engine.execute({"text": "hello"}, outputs=["report"])
+
+    assert result == {"report": "Processed: Processed: hello Processed: hello"}
+    stats = engine.last_run_stats
+    assert sorted(stats.evicted) == ["summary", "text", "topics"]
+    assert stats.peak_context_bytes > 0
+    assert set(engine.context.context) == {"report"}
+    # Lineage survives eviction
+    assert engine.context.dependency_graph["report"] == ["topics", "summary"]
+
+    # Without outputs everything is returned, but intermediates still leave
+    # the context after their last reader; inputs and final outputs stay
+    engine = ChainEngine(mode="dag")
+    engine.context = OptimizedContextManager(
+        compression=CompressionPolicy(codec="zlib", tiers=[(64, 6)])
+    )
+    engine.add_node(make_slow_node("topics", ["text"], "topics"))
+    engine.add_node(make_slow_node("summary", ["text"], "summary"))
+    engine.add_node(make_slow_node("report", ["topics", "summary"], "report"))
+    text = "hello " * 50
+    result = await engine.execute({"text": text})
+    assert result == {
+        "text": text,
+        "topics": f"Processed: {text}",
+        "summary": f"Processed: {text}",
+        "report": f"Processed: Processed: {text} Processed: {text}"
+    }
+    assert sorted(engine.last_run_stats.evicted) == ["summary", "topics"]
+    assert set(engine.context.context) == {"text", "report"}
+    assert engine.context.get_stats()["keys"]["report"]["compressed"]
+
+    engine = ChainEngine(incremental=True)
+    engine.add_node(make_slow_node("summary", ["text"], "summary"))
+    engine.add_node(make_slow_node("report", ["summary"], "report"))
+    await engine.execute({"text": "hello"})
+    assert engine.last_run_stats.evicted == []
+    assert set(engine.context.context) == {"text", "summary", "report"}
+
+@pytest.mark.asyncio
+async def test_execute_spills_intermediates_when_asked(tmp_path):
+    engine = ChainEngine()
+    engine.context = OptimizedContextManager(spill_dir=str(tmp_path))
+    engine.add_node(make_slow_node("summary", ["text"], "summary"))
+    engine.add_node(make_slow_node("report", ["summary"], "report"))
+
+    await engine.execute({"text": "hello"}, outputs=["report"], keep_intermediates=True)
+
+    assert sorted(engine.last_run_stats.spilled) == ["summary", "text"]
+    assert engine.context.get_stats()["keys"]["summary"]["spilled"] is True
+    assert engine.context.get_context("summary") == "Processed: hello"
+    assert len(list(tmp_path.iterdir())) == 2
+    engine.context.close()
+    assert list(tmp_path.iterdir()) == []
+
+    # A temporary spill directory is removed on close, or once the context
+    # is collected
+    for closing in (True, False):
+        context = OptimizedContextManager()
+        context.add_context("text", "hello")
+        assert context.spill("text")
+        spill_dir = context.spill_dir
+        assert os.path.isdir(spill_dir)
+        if closing:
+            context.close()
+        else:
+            del context
+            gc.collect()
+        assert not os.path.exists(spill_dir)
+
+def test_get_chain_follows_transitive_dependencies_lazily():
+    manager = OptimizedContextManager(compression=None)
+    manager.add_context("text", "raw text")
+    manager.add_context("summary", "short", dependencies=["text"])
+    manager.add_context("topics", "a, b", dependencies=["summary"])
+    manager.add_context("report", "final", dependencies=["topics", "text"])
+    manager.add_context("unrelated", "x")
+
+    reads = []
+    original = manager.get_context
+    manager.get_context = lambda key: reads.append(key) or original(key)
+
+    chain = manager.get_chain(["report"])
+    assert set(chain) == {"report", "topics", "summary", "text"}
+    assert reads == []
+    assert chain["summary"] == "short"
+    assert reads == ["summary"]
+    assert "unrelated" not in chain
+
+    # Redefining a key invalidates every lineage that passed through it
+    manager.add_context("summary", "short", dependencies=["notes"])
+    assert manager.lineage("report") == {"report", "topics", "summary", "notes", "text"}
+    assert manager.lineage("summary") == {"summary", "notes"}
+
+@pytest.mark.asyncio
+async def test_engine_records_usage_per_node_run_and_model():
+    class BillingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> LLMResponse:
+            return LLMResponse(
+                content=prompt.upper(),
+                prompt_tokens=len(prompt.split()),
+                completion_tokens=2,
+                model="gpt-test"
+            )
+
+    engine = ChainEngine()
+    engine.add_node(BillingNode(
+        node_id="shout",
+        prompt_template=EnhancedPromptTemplate(
+            template="say {text}", input_variables=["text"]
+        ),
+        input_keys=["text"],
+        output_key="shout",
+        cache=ResponseCache()
+    ))
+
+    first = await engine.execute({"text": "hello world"})
+    first_run = engine.last_run_stats.run_id
+    await engine.execute({"text": "hello world"})
+
+    assert first["shout"] == "SAY HELLO WORLD"
+    assert engine.token_tracker.get_usage() == {
+        "total_tokens": 5, "prompt_tokens": 3, "completion_tokens": 2
+    }
+    node_usage = engine.token_tracker.get_node_usage("shout")
+    assert node_usage["calls"] == 2
+    assert node_usage["cached_calls"] == 1
+    assert node_usage["uncached_calls"] == 1
+    assert node_usage["latency"]["count"] == 1
+    assert engine.token_tracker.get_model_usage("gpt-test")["total_tokens"] == 5
+    assert engine.token_tracker.get_run_usage(first_run)["total_tokens"] == 5
+    assert '"shout"' in engine.token_tracker.export_json()
+
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    assert 0.045 <= histogram.percentile(50) <= 0.056
+    assert 0.090 <= histogram.percentile(95) <= 0.1
+
+def test_token_counter_truncates_and_splits_locally():
+    counter = TokenCounter(encoding_name=None)
+    text = "one two six ten red big top low"
+    assert counter.count(text) == 8
+    assert counter.count("Summarize:") == 4
+    assert counter.truncate(text, 3) == "one two six"
+    assert counter.split(text, 4, overlap=1) == [
+        "one two six ten ", "ten red big top ", "top low"
+    ]
+
+@pytest.mark.asyncio
+async def test_token_counter_is_only_resolved_when_needed(monkeypatch):
+    import scriptchain.core.example_selector as example_selector
+    import scriptchain.core.nodes as nodes
+
+    def unexpected(*args):
+        raise AssertionError("token counter resolved without a budget")
+
+    monkeypatch.setattr(nodes, "get_token_counter", unexpected)
+    monkeypatch.setattr(example_selector, "get_token_counter", unexpected)
+    selector = SimilarityExampleSelector([FewShotExample(input="hi", output="hello")], k=1)
+    node = MockLLMNode(
+        node_id="plain",
+        prompt_template=EnhancedPromptTemplate(
+            "{text}", ["text"], example_selector=selector
+        ),
+        input_keys=["text"],
+        output_key="out"
+    )
+    result = await node.execute({"text": "hi"}, enable_few_shot=True)
+    assert result["out"].endswith("hi")
+
+    # Encodings are loaded on the first count, not on construction
+    import scriptchain.core.tokenizer as tokenizer
+    monkeypatch.setattr(tokenizer, "_load_encoding", unexpected)
+    TokenCounter()
+    monkeypatch.undo()
+    selector.token_budget = 100
+    assert selector.select("hi") == selector.examples
+
+@pytest.mark.asyncio
+async def test_overflow_strategies_fit_prompt_before_calling_llm():
+    prompts = []
+
+    class RecordingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            prompts.append(prompt)
+            return f"part {len(prompts)}"
+
+    def make_node(strategy):
+        return RecordingNode(
+            node_id="summarize",
+            prompt_template=EnhancedPromptTemplate(
+                template="Summarize: {text}",
+                input_variables=["text"],
+                examples=[FewShotExample(input="a b c", output="abc")]
+            ),
+            input_keys=["text"],
+            output_key="summary",
+            max_prompt_tokens=12,
+            overflow_strategy=strategy,
+            token_counter=TokenCounter(encoding_name=None)
+        )
+
+    document = {"text": " ".join(f"w{i}" for i in range(20))}
+    counter = TokenCounter(encoding_name=None)
+
+    with pytest.raises(PromptTooLargeError):
+        await make_node("error").execute(document, enable_few_shot=True)
+    assert prompts == []
+
+    await make_node("truncate").execute(document, enable_few_shot=False)
+    assert prompts[-1] == "Summarize: w0 w1 w2 w3 w4 w5 w6 w7"
+
+    result = await make_node("chunk").execute(document, enable_few_shot=False)
+    assert result["summary"] == "part 2\npart 3\npart 4"
+    assert all(counter.count(p) <= 12 for p in prompts)
+
+    engine = ChainEngine(overflow_strategy="drop_examples")
+    engine.add_node(make_node(None))
+    await engine.execute({"text": "short text"})
+    assert prompts[-1] == "Summarize: short text"
+
+@pytest.mark.asyncio
+async def test_map_reduce_node_maps_overlapping_chunks_under_a_cap():
+    counter = TokenCounter(encoding_name=None)
+    document = " ".join(f"Line {i} ends." for i in range(12))
+    chunks = list(iter_chunks(document, 12, overlap=4, counter=counter))
+    assert all(counter.count(chunk) <= 12 for chunk in chunks)
+    # Each chunk repeats the last sentence of the one before
+    assert chunks[1].startswith("Line 2 ends.")
+
+    active = peak = 0
+    prompts = []
+
+    class SummaryNode(MapReduceNode):
+        async def _call_llm(self, prompt: str) -> str:
+            nonlocal active, peak
+            prompts.append(prompt)
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return f"<{len(prompt)}>"
+
+    node = SummaryNode(
+        node_id="summarize",
+        prompt_template=EnhancedPromptTemplate(
+            template="Summarize for {audience}: {text}",
+            input_variables=["audience", "text"]
+        ),
+        reduce_template=EnhancedPromptTemplate(
+            template="Combine for {audience}: {results}",
+            input_variables=["audience", "results"]
+        ),
+        input_keys=["text", "audience"],
+        output_key="summary",
+        chunk_key="text",
+        chunk_tokens=12,
+        chunk_overlap=4,
+        max_concurrency=2,
+        token_counter=counter
+    )
+    result = await node.execute(
+        {"text": document, "audience": "kids"}, enable_few_shot=False
+    )
+
+    assert prompts[:len(chunks)] == [
+        f"Summarize for kids: {chunk}" for chunk in chunks
+    ]
+    assert peak == 2
+    assert prompts[-1].startswith("Combine for kids: <")
+    assert result["summary"] == f"<{len(prompts[-1])}>"
+    assert result["_metadata"]["usage"]["chunks"] == len(chunks)
+
+@pytest.mark.asyncio
+async def test_map_reduce_node_reduces_hierarchically_within_budget():
+    counter = TokenCounter(encoding_name=None)
+    prompts = []
+
+    class SummaryNode(MapReduceNode):
+        async def _call_llm(self, prompt: str) -> str:
+            prompts.append(prompt)
+            if prompt.startswith("Summarize"):
+                return "partial summary of one chunk"
+            return "merged summary"
+
+    def make_node(**kwargs):
+        return SummaryNode(
+            node_id="summarize",
+            prompt_template=EnhancedPromptTemplate(
+                template="Summarize: {text}", input_variables=["text"]
+            ),
+            reduce_template=EnhancedPromptTemplate(
+                template="Combine: {results}", input_variables=["results"]
+            ),
+            input_keys=["text"],
+            output_key="summary",
+            chunk_tokens=12,
+            chunk_overlap=0,
+            token_counter=counter,
+            **kwargs
+        )
+
+    document = " ".join(f"Line {i} ends." for i in range(24))
+    node = make_node(max_prompt_tokens=40)
+    result = await node.execute({"text": document}, enable_few_shot=False)
+
+    maps = [p for p in prompts if p.startswith("Summarize")]
+    reduces = [p for p in prompts if p.startswith("Combine")]
+    assert all(counter.count(prompt) <= 40 for prompt in prompts)
+    # The partials didn't fit one reduce prompt, so they were reduced in rounds
+    assert len(reduces) > 1
+    assert "partial summary" not in reduces[-1]
+    assert result["summary"] == "merged summary"
+    assert result["_metadata"]["usage"]["chunks"] == len(maps)
+
+    # Two partials that can't share a reduce prompt would never converge
+    with pytest.raises(PromptTooLargeError):
+        await make_node(max_prompt_tokens=14, overflow_strategy="truncate").execute(
+            {"text": document}, enable_few_shot=False
+        )
+
+@pytest.mark.asyncio
+async def test_map_reduce_node_awaits_cancelled_chunks_on_failure():
+    unwound = []
+
+    class FailingNode(MapReduceNode):
+        async def _call_llm(self, prompt: str) -> str:
+            if "Line 0" in prompt:
+                raise ValueError("bad chunk")
+            try:
+                await asyncio.sleep(10)
+            finally:
+                unwound.append(prompt)
+            return prompt
+
+    counter = TokenCounter(encoding_name=None)
+    node = FailingNode(
+        node_id="summarize",
+        prompt_template=EnhancedPromptTemplate(
+            template="Summarize: {text}", input_variables=["text"]
+        ),
+        reduce_template=EnhancedPromptTemplate(
+            template="Combine: {results}", input_variables=["results"]
+        ),
+        input_keys=["text"],
+        output_key="summary",
+        chunk_tokens=6,
+        chunk_overlap=0,
+        max_concurrency=3,
+        token_counter=counter
+    )
+    document = " ".join(f"Line {i} ends." for i in range(3))
+    with pytest.raises(ValueError):
+        await node.execute({"text": document}, enable_few_shot=False)
+    # The other chunks were cancelled and finished before the error surfaced
+    assert len(unwound) == 2
+
+@pytest.mark.asyncio
+async def test_stream_surfaces_node_events_and_tokens_early():
+    class StreamingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            raise AssertionError("streaming nodes are not called whole")
+
+        async def _stream_llm(self, prompt: str):
+            for word in ("draft", " of", " answer"):
+                await asyncio.sleep(0)
+                yield word
+            yield LLMResponse(content=None, prompt_tokens=3, completion_tokens=3)
+
+    engine = ChainEngine()
+    engine.add_node(StreamingNode(
+        node_id="draft",
+        prompt_template=EnhancedPromptTemplate("{question}", ["question"]),
+        input_keys=["question"],
+        output_key="draft"
+    ))
+    engine.add_node(make_slow_node("polish", ["draft"], "final"))
+
+    events = []
+    async for event in engine.stream({"question": "why?"}, outputs=["final"]):
+        events.append(event)
+        if len(events) == 2:
+            # Tokens of the first node arrive while the chain is still running
+            assert event.type == "token" and event.data == "draft"
+            assert engine.token_tracker.get_usage()["total_tokens"] == 0
+
+    assert [(e.type, e.node_id) for e in events] == [
+        ("node_start", "draft"),
+        ("token", "draft"), ("token", "draft"), ("token", "draft"),
+        ("node_end", "draft"),
+        ("node_start", "polish"),
+        ("token", "polish"),
+        ("node_end", "polish"),
+        ("chain_end", None)
+    ]
+    assert events[4].data == "draft of answer"
+    assert events[6].data == events[7].data
+    assert events[-1].data == {"final": events[7].data}
+    assert engine.token_tracker.get_node_usage("draft")["total_tokens"] == 6
+
+@pytest.mark.asyncio
+async def test_pipelined_mode_overlaps_incremental_downstream_node():
+    timeline = []
+
+    class Summarizer(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            return "".join([piece async for piece in self._stream_llm(prompt)])
+
+        async def _stream_llm(self, prompt: str):
+            for sentence in ("Cats purr. ", "Dogs bark. ", "Fish swim."):
+                await asyncio.sleep(0.02)
+                timeline.append(("summary", sentence.strip()))
+                yield sentence
+
+    class Classifier(IncrementalNode):
+        async def _call_llm(self, prompt: str) -> str:
+            timeline.append(("classify", prompt))
+            return prompt.upper()
+
+    def build(mode):
+        engine = ChainEngine(mode=mode)
+        engine.add_node(Summarizer(
+            node_id="summarize",
+            prompt_template=EnhancedPromptTemplate("{text}", ["text"]),
+            input_keys=["text"],
+            output_key="summary"
+        ))
+        engine.add_node(Classifier(
+            node_id="classify",
+            prompt_template=EnhancedPromptTemplate("{summary}", ["summary"]),
+            input_keys=["summary"],
+            output_key="labels"
+        ))
+        return engine
+
+    result = await build("pipelined").execute({"text": "animals"})
+    assert result["labels"] == "CATS PURR.\nDOGS BARK.\nFISH SWIM."
+    # The first sentence is classified before the summary is finished
+    assert timeline.index(("classify", "Cats purr.")) < timeline.index(
+        ("summary", "Fish swim.")
+    )
+
+    timeline.clear()
+    result = await build("linear").execute({"text": "animals"})
+    assert result["labels"] == "CATS PURR.\nDOGS BARK.\nFISH SWIM."
+    assert [step for step, _ in timeline] == ["summary"] * 3 + ["classify"] * 3
+
+@pytest.mark.asyncio
+async def test_rate_limiter_paces_and_backs_off_once_per_throttle_burst():
+    bucket = TokenBucket(rate_per_minute=6000, capacity=1)
+    start = asyncio.get_running_loop().time()
+    for _ in range(5):
+        await bucket.acquire()
+    assert asyncio.get_running_loop().time() - start >= 0.035
+
+    class Throttled(Exception):
+        status_code = 429
+
+    active = peak = 0
+    failures = {"left": 4}
+    limits = []
+
+    class LimitedNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            limits.append(limiter.concurrency.limit)
+            await asyncio.sleep(0.01)
+            active -= 1
+            if failures["left"] > 0:
+                failures["left"] -= 1
+                raise Throttled()
+            return prompt
+
+    limiter = RateLimiter(
+        concurrency=AdaptiveConcurrency(initial_limit=4, max_limit=4),
+        retry_delay=0.001
+    )
+    engine = ChainEngine(rate_limiters={"openai": limiter})
+    for name in ("first", "second"):
+        engine.add_node(LimitedNode(
+            node_id=name,
+            prompt_template=EnhancedPromptTemplate(
+                f"{name} {{text}}", ["text"]
+            ),
+            input_keys=["text"],
+            output_key=name,
+            backend="openai"
+        ))
+    assert all(node.rate_limiter is limiter for node in engine.nodes)
+
+    results = [
+        result async for _, result in engine.execute_many(
+            [{"text": str(i)} for i in range(6)], outputs=["second"]
+        )
+    ]
+    assert sorted(r["second"] for r in results) == [f"second {i}" for i in range(6)]
+    assert peak <= 4
+    # Four concurrent 429s from one window halve the limit only once, and
+    # healthy calls grow it back afterwards
+    assert limiter.throttled == 4
+    assert min(limits) == 2
+    assert limiter.stats()["concurrency_limit"] > 2
+
+@pytest.mark.asyncio
+async def test_retry_policy_jitter_breaker_hedging_and_deadlines():
+    calls = []
+
+    async def flaky(error):
+        calls.append(error)
+        raise error
+
+    # Only transient errors are retried, with jitter under the backoff ceiling
+    policy = RetryPolicy(max_attempts=3, delay=0.001)
+    with pytest.raises(ValueError):
+        await policy.call(flaky, ValueError("bad request"))
+    with pytest.raises(ConnectionError):
+        await policy.call(flaky, ConnectionError("reset"))
+    assert len(calls) == 4
+    assert all(0 <= policy.backoff_delay(3) <= 0.008 for _ in range(20))
+
+    breaker = CircuitBreaker(failure_threshold=2, recovery_time=60)
+    policy = RetryPolicy(max_attempts=1, circuit_breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await policy.call(flaky, ConnectionError("down"))
+    with pytest.raises(CircuitOpenError):
+        await policy.call(flaky, ConnectionError("down"))
+    assert len(calls) == 6
+
+    # A cancelled probe gives its slot back instead of blocking the backend
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=0)
+    policy = RetryPolicy(max_attempts=1, circuit_breaker=breaker)
+    with pytest.raises(ConnectionError):
+        await policy.call(flaky, ConnectionError("down"))
+    probe = asyncio.ensure_future(policy.call(asyncio.sleep, 10))
+    await asyncio.sleep(0)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    for _ in range(3):
+        assert await policy.call(asyncio.sleep, 0, "ok") == "ok"
+    assert breaker.state == "closed"
+
+    # Only the probe itself frees the slot; an older call ending doesn't
+    stale = asyncio.ensure_future(policy.call(asyncio.sleep, 10))
+    await asyncio.sleep(0)
+    with pytest.raises(ConnectionError):
+        await policy.call(flaky, ConnectionError("down"))
+    probe = asyncio.ensure_future(policy.call(asyncio.sleep, 10))
+    await asyncio.sleep(0)
+    stale.cancel()
+    await asyncio.gather(stale, return_exceptions=True)
+    with pytest.raises(CircuitOpenError):
+        await policy.call(asyncio.sleep, 0)
+    probe.cancel()
+    await asyncio.gather(probe, return_exceptions=True)
+    assert await policy.call(asyncio.sleep, 0, "ok") == "ok"
+
+    # A call slower than the p95 of recent latencies gets a duplicate
+    policy = RetryPolicy(hedge_percentile=95, hedge_min_samples=5)
+    policy.latencies.extend([0.01] * 5)
+    delays = [1.0, 0.0]
+
+    async def sometimes_slow():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    assert await policy.call(sometimes_slow) == 0.0
+    assert loop.time() - start < 0.5
+    assert policy.hedges == 1
+
+    class FailingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            raise ConnectionError("unreachable")
+
+    engine = ChainEngine(retry_policies={"default": RetryPolicy(delay=10.0, jitter=False)})
+    engine.add_node(FailingNode(
+        node_id="fail",
+        prompt_template=EnhancedPromptTemplate("{text}", ["text"]),
+        input_keys=["text"],
+        output_key="out"
+    ))
+    start = loop.time()
+    with pytest.raises(DeadlineExceeded):
+        await engine.execute({"text": "hi"}, deadline=0.2)
+    assert loop.time() - start < 1.0
+
+@pytest.mark.asyncio
+async def test_retry_policy_runs_inside_the_rate_limiter_slot():
+    class Throttled(Exception):
+        status_code = 429
+
+    calls = []
+
+    class BackendNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            calls.append(prompt)
+            if prompt.startswith("busy"):
+                raise Throttled()
+            await asyncio.sleep(0.03)
+            return prompt
+
+    limiter = RateLimiter(
+        concurrency=AdaptiveConcurrency(initial_limit=1, max_limit=1),
+        max_retries=2,
+        retry_delay=0.001
+    )
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=60)
+    node = BackendNode(
+        node_id="backend",
+        prompt_template=EnhancedPromptTemplate("{text}", ["text"]),
+        input_keys=["text"],
+        output_key="out",
+        rate_limiter=limiter,
+        retry_policy=RetryPolicy(
+            max_attempts=3, delay=0.001, attempt_timeout=0.05, circuit_breaker=breaker
+        )
+    )
+
+    # Queued behind one slot for longer than attempt_timeout, yet no
+    # attempt times out: only the LLM call itself is timed
+    results = await asyncio.gather(*(
+        node.execute({"text": f"q{i}"}, enable_few_shot=False) for i in range(3)
+    ))
+    assert [r["out"] for r in results] == ["q0", "q1", "q2"]
+    assert len(calls) == 3
+
+    # A persistent 429 is retried by the limiter alone, and doesn't count
+    # against the backend's circuit breaker
+    calls.clear()
+    with pytest.raises(Throttled):
+        await node.execute({"text": "busy"}, enable_few_shot=False)
+    assert len(calls) == 3
+    assert breaker.state == "closed"
+
+@pytest.mark.asyncio
+async def test_rate_limiter_charges_every_retry_and_hedge():
+    calls = []
+
+    class FlakyNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            calls.append(prompt)
+            if prompt == "flaky" and len(calls) < 3:
+                raise ConnectionError("reset")
+            if prompt == "slow" and len(calls) == 1:
+                await asyncio.sleep(1.0)
+            return prompt
+
+    def make_node(policy):
+        return FlakyNode(
+            node_id="flaky",
+            prompt_template=EnhancedPromptTemplate("{text}", ["text"]),
+            input_keys=["text"],
+            output_key="out",
+            rate_limiter=limiter,
+            retry_policy=policy
+        )
+
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=60_000)
+    node = make_node(RetryPolicy(max_attempts=3, delay=0.001))
+    assert (await node.execute({"text": "flaky"}, enable_few_shot=False))["out"] == "flaky"
+    assert len(calls) == 3
+    assert limiter.calls == 3
+    assert limiter.requests.capacity - limiter.requests.tokens == pytest.approx(3, abs=0.1)
+
+    # The hedged duplicate is a second request and pays for its own slot
+    calls.clear()
+    limiter = RateLimiter(requests_per_minute=600)
+    policy = RetryPolicy(hedge_percentile=95, hedge_min_samples=5)
+    policy.latencies.extend([0.01] * 5)
+    node = make_node(policy)
+    assert (await node.execute({"text": "slow"}, enable_few_shot=False))["out"] == "slow"
+    assert policy.hedges == 1
+    assert len(calls) == limiter.calls == 2
+    assert limiter.concurrency.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_resume_skips_checkpointed_nodes(tmp_path):
+    calls = []
+    crash = {"at": "c"}
+
+    class CountingNode(BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            calls.append(self.id)
+            if crash["at"] == self.id:
+                raise RuntimeError("worker died")
+            return prompt[:12] + " lorem" * 8000
+
+    def build():
+        engine = ChainEngine()
+        for node_id, source, target in (("a", "text", "x"), ("b", "x", "y"), ("c", "y", "z")):
+            engine.add_node(CountingNode(
+                node_id=node_id,
+                prompt_template=EnhancedPromptTemplate(f"{node_id}:{{{source}}}", [source]),
+                input_keys=[source],
+                output_key=target
+            ))
+        return engine
+
+    path = str(tmp_path / "run.ckpt")
+    with pytest.raises(RuntimeError):
+        with Checkpoint(path) as checkpoint:
+            await build().execute({"text": "go"}, checkpoint=checkpoint, outputs=["z"])
+    assert calls == ["a", "b", "c"]
+    # Compressed outputs are checkpointed as stored, not re-inflated
+    assert os.path.getsize(path) < 20_000
+
+    # A record torn by the crash is dropped rather than breaking the log
+    with open(path, "ab") as f:
+        f.write(b"\x85\xa4type\xa4it")
+
+    crash["at"] = None
+    calls.clear()
+    with Checkpoint(path) as checkpoint:
+        result = await build().resume(checkpoint)
+    assert calls == ["c"]
+    assert result["text"] == "go"
+    assert result["z"].startswith("c:b:a:go")
+
+    reloaded = load_context(path)
+    assert reloaded.get_context("z") == result["z"]
+    assert reloaded.context["x"].compressed
+    save_context(reloaded, str(tmp_path / "copy.ckpt"))
+    assert load_context(str(tmp_path / "copy.ckpt")).get_context("y") == result["y"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["linear", "pipelined"])
+async def test_incremental_engine_recomputes_only_the_changed_cone(mode):
+    calls = []
+
+    class RecordingNode(IncrementalNode if mode == "pipelined" else BaseNode):
+        async def _call_llm(self, prompt: str) -> str:
+            calls.append(self.id)
+            return prompt.upper()
+
+    def node(node_id, inputs, output, template):
+        return RecordingNode(
+            node_id=node_id,
+            prompt_template=EnhancedPromptTemplate(template, inputs),
+            input_keys=inputs,
+            output_key=output
+        )
+
+    engine = ChainEngine(mode=mode, incremental=True)
+    engine.add_node(node("title", ["topic"], "title", "Title: {topic}"))
+    engine.add_node(node("intro", ["audience"], "intro", "Intro: {audience}"))
+    engine.add_node(node("draft", ["title", "intro"], "draft", "{title} / {intro}"))
+
+    first = await engine.execute({"topic": "bees", "audience": "kids"})
+    assert sorted(calls) == ["draft", "intro", "title"]
+
+    calls.clear()
+    again = await engine.execute({"topic": "bees", "audience": "kids"})
+    assert calls == [] and again == first
+    assert sorted(engine.last_run_stats.skipped) == ["draft", "intro", "title"]
+
+    calls.clear()
+    changed = await engine.execute({"topic": "bees", "audience": "adults"})
+    assert sorted(calls) == ["draft", "intro"]
+    assert changed["draft"] == "TITLE: BEES / INTRO: ADULTS"
+
+    # Editing a template invalidates that node and everything downstream
+    calls.clear()
+    engine.nodes[0].prompt_template = EnhancedPromptTemplate("Name: {topic}", ["topic"])
+    await engine.execute({"topic": "bees", "audience": "adults"})
+    assert sorted(calls) == ["draft", "title"]
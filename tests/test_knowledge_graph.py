@@ -1,6 +1,6 @@
 import pytest
 from datetime import datetime
-from core.knowledge_graph import KnowledgeGraph, Node, Edge
+from scriptchain.core.knowledge_graph import KnowledgeGraph, Node, Edge
 
 @pytest.fixture
 def knowledge_graph():
@@ -52,6 +52,223 @@ def test_query(knowledge_graph):
     assert len(results) == 1
     assert results[0].id == "node1"
 
+def test_query_uses_type_and_metadata_indexes():
+    graph = KnowledgeGraph(indexed_keys=["year"])
+    graph.add_node("a", "paper", "A", {"year": 2019, "venue": "acl"})
+    graph.add_node("b", "paper", "B", {"year": 2021, "venue": "emnlp"})
+    graph.add_node("c", "person", "C", {"year": 2021, "name": "Ada"})
+    graph.add_node("d", "paper", "D", {"year": 2023, "venue": "acl"})
+    graph.create_index("name")
+
+    assert [n.id for n in graph.query("paper")] == ["a", "b", "d"]
+    assert [n.id for n in graph.query("paper", year=2021)] == ["b"]
+    assert [n.id for n in graph.query("paper", venue="acl", year=2023)] == ["d"]
+    assert graph.query("paper", year=1990) == []
+    assert [n.id for n in graph.query("person", venue=None)] == ["c"]
+
+    assert [n.id for n in graph.query_range("year", 2020, 2023)] == ["b", "c", "d"]
+    assert [n.id for n in graph.query_range("year", high=2020)] == ["a"]
+    assert [n.id for n in graph.query_range("year", 2020, node_type="paper")] == ["b", "d"]
+    assert [n.id for n in graph.query_prefix("name", "Ad")] == ["c"]
+
+    # Replacing a node moves it between index entries, sorted lists included
+    graph.add_node("a", "paper", "A", {"year": 2024, "venue": "acl"})
+    graph.add_node("e", "person", "E", {"name": "Adele"})
+    assert [n.id for n in graph.query_range("year", 2020)] == ["b", "c", "d", "a"]
+    assert graph.query("paper", year=2019) == []
+    assert [n.id for n in graph.query_prefix("name", "Ad")] == ["c", "e"]
+
+    with pytest.raises(ValueError):
+        graph.query_prefix("venue", "ac")
+
+    # Re-adding a node whose metadata was edited in place unindexes the
+    # values it was indexed under, not the edited ones
+    node = graph.get_node("b")
+    node.metadata["year"] = 2030
+    graph.add_node("b", "paper", "B", node.metadata)
+    assert [n.id for n in graph.query("paper", year=2030)] == ["b"]
+    assert graph.query("paper", year=2021) == []
+    assert [n.id for n in graph.query("paper")] == ["d", "a", "b"]
+    assert [n.id for n in graph.query_range("year", 2021, 2021)] == ["c"]
+
+def test_nodes_and_edges_are_stored_once(knowledge_graph):
+    knowledge_graph.add_node("node1", "text", "Content 1")
+    knowledge_graph.add_node("node2", "".join(["te", "xt"]), "Content 2")
+    knowledge_graph.add_node("node3", "text", "Content 3")
+    knowledge_graph.add_edge("node1", "node2", "relates_to", {"weight": 1})
+
+    node1, node2 = knowledge_graph.get_node("node1"), knowledge_graph.get_node("node2")
+    assert not hasattr(node1, "__dict__")
+    assert node1.type is node2.type
+
+    edge = knowledge_graph.get_edge("node1", "node2")
+    assert isinstance(edge, Edge) and edge.metadata == {"weight": 1}
+    assert list(knowledge_graph.iter_edges()) == [edge]
+    assert knowledge_graph.get_edge("node2", "node1") is None
+
+    # The networkx graph is a read-only view over the same records
+    graph = knowledge_graph.graph
+    assert graph.nodes["node1"] is node1
+    assert graph.edges["node1", "node2"] is edge
+    assert dict(graph.degree) == {"node1": 1, "node2": 1, "node3": 0}
+    with pytest.raises(Exception):
+        graph.add_edge("node3", "node1")
+
+def test_graph_view_supports_networkx_operations(knowledge_graph):
+    import copy
+    import pickle
+    import networkx as nx
+    for node_id in ("a", "b", "c", "d"):
+        knowledge_graph.add_node(node_id, "text", node_id.upper(), {"tag": node_id})
+    knowledge_graph.add_edge("a", "b", "next")
+    knowledge_graph.add_edge("b", "c", "next")
+    knowledge_graph.add_edge("a", "d", "aside")
+    graph = knowledge_graph.graph
+
+    # Records read like the attribute dicts the graph used to hold
+    assert graph.nodes["a"]["content"] == "A"
+    assert set(graph.nodes["a"]) == {"type", "content", "metadata", "created_at", "updated_at"}
+    assert ("a", "d", "aside") in graph.edges(data="type")
+    assert nx.shortest_path(graph, "a", "c", weight="weight") == ["a", "b", "c"]
+
+    sub = graph.subgraph(["a", "b", "c"])
+    assert sorted(sub.edges) == [("a", "b"), ("b", "c")]
+    assert sorted(nx.ego_graph(graph, "a").nodes) == ["a", "b", "d"]
+    assert sorted(graph.reverse(copy=False).edges) == [("b", "a"), ("c", "b"), ("d", "a")]
+
+    # Copies are plain mutable graphs with dict data
+    for other in (
+        graph.copy(), sub.copy(), graph.reverse(), graph.to_undirected(),
+        copy.deepcopy(graph), pickle.loads(pickle.dumps(graph))
+    ):
+        assert type(other) in (nx.DiGraph, nx.Graph)
+        assert type(other.nodes["a"]) is dict and other.nodes["a"]["metadata"] == {"tag": "a"}
+        other.add_edge("c", "a")
+    assert graph.number_of_edges() == 3
+    with pytest.raises(nx.NetworkXError):
+        graph.add_node("e")
+
+def test_csr_backend_matches_networkx_backend():
+    import random
+    rng = random.Random(7)
+    graphs = [KnowledgeGraph(), KnowledgeGraph(backend="csr")]
+    edges = [(f"n{rng.randrange(60)}", f"n{rng.randrange(60)}") for _ in range(150)]
+    for graph in graphs:
+        for i in range(60):
+            graph.add_node(f"n{i}", "entity", i)
+        for source, target in edges[:100]:
+            graph.add_edge(source, target, "rel")
+
+    def check():
+        dicts, csr = graphs
+        for i in range(60):
+            node_id = f"n{i}"
+            for direction in ("in", "out"):
+                assert sorted(n.id for n in dicts.get_connected_nodes(node_id, direction)) == \
+                    sorted(n.id for n in csr.get_connected_nodes(node_id, direction))
+            for target in ("n0", "n31", "n59"):
+                expected = dicts.get_path(node_id, target)
+                path = csr.get_path(node_id, target)
+                assert (path is None) == (expected is None)
+                if path is not None:
+                    assert len(path) == len(expected)
+                    assert all(csr.get_edge(a.id, b.id) for a, b in zip(path, path[1:]))
+        ids = [f"n{i}" for i in range(0, 60, 3)]
+        assert sorted(e.target for e in dicts.get_subgraph(ids).iter_edges()) == \
+            sorted(e.target for e in csr.get_subgraph(ids).iter_edges())
+
+    # Traversals read buffered edges without compacting them, both on their
+    # own and alongside compacted ones
+    check()
+    csr = graphs[1]._adjacency
+    assert csr._delta_size == len(set(edges[:100]))
+    csr.compact()
+    for graph in graphs:
+        graph.add_node("late", "entity", None)
+        for source, target in edges[100:]:
+            graph.add_edge(source, target, "rel")
+        graph.add_edge("late", "n0", "rel")
+        graph.add_edge(*edges[0], "replaced")
+    check()
+    assert csr._delta_size == len(set(edges[100:]) - set(edges[:100])) + 1
+    assert graphs[1].get_edge(*edges[0]).type == "replaced"
+    assert [n.id for n in graphs[1].get_path("late", "n0")] == ["late", "n0"]
+    assert graphs[1].graph is None
+
+@pytest.mark.parametrize("backend", ["networkx", "csr"])
+def test_bulk_ingestion_matches_single_adds(backend):
+    import numpy as np
+    ids = np.array([f"n{i}" for i in range(50)])
+    sources = [f"n{i}" for i in range(50)] + ["n0"]
+    targets = [f"n{(i * 7 + 1) % 50}" for i in range(50)] + ["n1"]
+    types = ["next"] * 50 + ["replaced"]
+
+    bulk = KnowledgeGraph(indexed_keys=["group"], backend=backend)
+    bulk.add_node("n0", "old", "stale")
+    bulk.add_nodes_bulk(
+        ids, "entity", contents=range(50), metadata=({"group": i % 5} for i in range(50))
+    )
+    bulk.add_edges_bulk(sources[:25], targets[:25], "next")
+    bulk.add_edges_bulk(sources[25:], targets[25:], types[25:])
+
+    single = KnowledgeGraph(indexed_keys=["group"], backend=backend)
+    for i in range(50):
+        single.add_node(f"n{i}", "entity", i, {"group": i % 5})
+    for source, target, edge_type in zip(sources, targets, types):
+        single.add_edge(source, target, edge_type)
+
+    assert bulk.get_node("n0").type == "entity" and bulk.get_node("n0").content == 0
+    assert isinstance(bulk.get_node("n3").id, str)
+    assert [n.id for n in bulk.query("entity", group=2)] == \
+        [n.id for n in single.query("entity", group=2)]
+    assert sorted((e.source, e.target, e.type) for e in bulk.iter_edges()) == \
+        sorted((e.source, e.target, e.type) for e in single.iter_edges())
+    assert bulk.get_edge("n0", "n1").type == "replaced"
+    assert bulk.edge_types == {"next", "replaced"}
+    assert [n.id for n in bulk.get_path("n0", "n7")] == \
+        [n.id for n in single.get_path("n0", "n7")]
+
+    bulk.add_edges_bulk(["n1"], ["n2"], "tagged", metadata=[{"weight": 1}])
+    assert bulk.get_edge("n1", "n2").metadata == {"weight": 1}
+    bulk.add_edges_bulk(np.array(["n1"]), np.array(["n2"]), "next")
+    assert bulk.get_edge("n1", "n2").metadata == {}
+
+    edge_count = len(list(bulk.iter_edges()))
+    with pytest.raises(ValueError, match="do not exist"):
+        bulk.add_edges_bulk(["n1", "n2"], ["n3", "missing"], "next")
+    assert len(list(bulk.iter_edges())) == edge_count
+    with pytest.raises(ValueError):
+        bulk.add_edges_bulk(["n1", "n2"], ["n3"], "next")
+
+def test_csr_merges_batches_into_sorted_rows():
+    import numpy as np
+    rng = np.random.default_rng(7)
+    graph = KnowledgeGraph(backend="csr")
+    graph.add_nodes_bulk([f"n{i}" for i in range(40)], "entity")
+    for batch in range(6):
+        # New nodes, buffered single adds and batches with repeats interleave
+        graph.add_nodes_bulk([f"b{batch}-{i}" for i in range(5)], "entity")
+        ids = [f"n{i}" for i in range(40)] + [f"b{batch}-{i}" for i in range(5)]
+        graph.add_edge(ids[batch], ids[-1], "single")
+        pairs = rng.integers(0, len(ids), size=(30, 2))
+        graph.add_edges_bulk(
+            [ids[i] for i in pairs[:, 0]], [ids[i] for i in pairs[:, 1]], "bulk"
+        )
+
+    csr = graph._adjacency
+    csr.compact()
+    count = len(csr._ids)
+    sources = csr._edge_sources[:csr._edge_count].astype(np.int64)
+    targets = csr._edge_targets[:csr._edge_count].astype(np.int64)
+    order = np.argsort(sources * count + targets)
+    assert csr._out_targets.tolist() == targets[order].tolist()
+    assert csr._out_edges.tolist() == order.tolist()
+    assert np.diff(csr._out_ptr).tolist() == np.bincount(sources, minlength=count).tolist()
+    order = np.argsort(targets * count + sources)
+    assert csr._in_sources.tolist() == sources[order].tolist()
+    assert csr._in_edges.tolist() == order.tolist()
+    assert len(set(zip(sources.tolist(), targets.tolist()))) == len(sources)
+
 def test_get_path(knowledge_graph):
     # Create a chain of nodes
     knowledge_graph.add_node("node1", "text", "Content 1")
@@ -86,6 +303,44 @@ def test_get_subgraph(knowledge_graph):
     assert "node2" in subgraph.nodes
     assert len(subgraph.graph.edges) == 1
 
+@pytest.mark.parametrize("backend", ["networkx", "csr"])
+def test_subgraph_copy_and_view(backend):
+    graph = KnowledgeGraph(indexed_keys=["topic"], backend=backend)
+    for i in range(6):
+        graph.add_node(f"n{i}", "doc", i, {"topic": "a" if i % 2 else "b"})
+    for i in range(5):
+        graph.add_edge(f"n{i}", f"n{i + 1}", "next", {"step": i})
+    graph.add_edge("n0", "n4", "skip")
+    selected = ["n0", "n1", "n2", "n4", "n4", "missing"]
+
+    subgraph = graph.get_subgraph(selected)
+    assert list(subgraph.nodes) == ["n0", "n1", "n2", "n4"]
+    assert sorted((e.source, e.target) for e in subgraph.iter_edges()) == \
+        [("n0", "n1"), ("n0", "n4"), ("n1", "n2")]
+    assert subgraph.get_edge("n1", "n2").metadata == {"step": 1}
+    assert [n.id for n in subgraph.query_prefix("topic", "a")] == ["n1"]
+
+    view = graph.get_subgraph(selected, view=True)
+    assert sorted(view) == ["n0", "n1", "n2", "n4"] and "n3" not in view
+    assert view.get_node("n3") is None
+    assert view.get_node("n4") is graph.get_node("n4")
+    assert view.get_edge("n2", "n3") is None
+    assert sorted((e.source, e.target) for e in view.iter_edges()) == \
+        sorted((e.source, e.target) for e in subgraph.iter_edges())
+    assert [n.id for n in view.get_connected_nodes("n0", "out")] == \
+        [n.id for n in graph.get_connected_nodes("n0", "out")]
+    assert [n.id for n in view.query("doc", topic="b")] == ["n0", "n2", "n4"]
+    # The path through n3 is outside the view; only the skip edge remains
+    assert [n.id for n in view.get_path("n0", "n4")] == ["n0", "n4"]
+    assert view.get_path("n2", "n4") is None
+    with pytest.raises(ValueError):
+        view.get_path("n0", "n3")
+    assert sorted(view.copy().nodes) == sorted(subgraph.nodes)
+
+    # The view reads through to later changes in the parent
+    graph.add_edge("n2", "n4", "late")
+    assert [n.id for n in view.get_path("n1", "n4")] == ["n1", "n2", "n4"]
+
 def test_merge(knowledge_graph):
     # Create two graphs
     graph1 = KnowledgeGraph()